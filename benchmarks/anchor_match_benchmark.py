@@ -0,0 +1,130 @@
+"""wisdom锚点匹配压测（金字塔匹配 vs 逐尺度全图匹配）
+
+在golden截图上分别运行逐尺度全图匹配和由粗到细的金字塔匹配，统计:
+    - 每张截图的匹配耗时和加速比
+    - 两种方法选出的网格左上角/右下角锚点是否一致（与期望位置的偏差）
+
+默认使用合成的golden截图（720p/1080p/1440p/4K，锚点位置已知），也可以传入录制的
+仓库截图，此时以逐尺度全图匹配的结果作为期望。
+
+用法:
+    python benchmarks/anchor_match_benchmark.py
+    python benchmarks/anchor_match_benchmark.py --repeat 3 --images shots/stash_1080p.png shots/stash_4k.png
+"""
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from core.process_modules.take_out_item import select_anchor_corners
+from core.vision.pyramid import pyramid_match, exhaustive_match
+from core.vision.peaks import match_pos
+from tools.sim_scenario import synthetic_trade_platform, WISDOM_TEMPLATE_PATH
+
+WISDOM_SCALES = np.linspace(0.2, 2.5, 35)
+WISDOM_THRESHOLD = 0.65
+
+# 合成golden截图: (名称, 窗口尺寸, wisdom尺度序号, 网格原点)
+GOLDEN_LAYOUTS = [
+    ("720p", (1280, 720), 3, (40, 60)),
+    ("1080p", (1920, 1080), 5, (60, 90)),
+    ("1440p", (2560, 1440), 8, (80, 120)),
+    ("4K", (3840, 2160), 13, (120, 180)),
+]
+
+
+def golden_screenshots(images=None):
+    """生成golden截图列表 [(名称, BGR截图, 期望的左上角锚点位置或None)]"""
+    if images:
+        shots = []
+        for path in images:
+            image = cv2.imread(path)
+            if image is None:
+                raise FileNotFoundError(f"无法加载截图: {path}")
+            shots.append((os.path.basename(path), image, None))
+        return shots
+
+    shots = []
+    for name, (width, height), index, origin in GOLDEN_LAYOUTS:
+        platform, _ = synthetic_trade_platform(window_rect=(0, 0, width, height),
+                                               wisdom_scale=WISDOM_SCALES[index], grid_origin=origin)
+        shots.append((name, platform.screens['stash'], origin))
+    return shots
+
+
+def _corners(matches, region_width, height):
+    corners = select_anchor_corners(matches, region_width, height)
+    if corners is None:
+        return None
+    return tuple(match_pos(marker) for marker in corners)
+
+
+def _timed(func, repeat):
+    """运行repeat次，返回 (最短耗时毫秒, 最后一次结果)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def run_benchmark(images=None, repeat=1):
+    """对每张golden截图比较两种匹配方法，返回结果列表"""
+    template = cv2.cvtColor(cv2.imread(WISDOM_TEMPLATE_PATH), cv2.COLOR_BGR2GRAY)
+    results = []
+    for name, image, expected_origin in golden_screenshots(images):
+        height, width = image.shape[:2]
+        gray_left = cv2.cvtColor(image[:, :width // 2], cv2.COLOR_BGR2GRAY)
+
+        full_ms, full = _timed(
+            lambda: exhaustive_match(gray_left, template, WISDOM_SCALES, WISDOM_THRESHOLD), repeat)
+        pyramid_ms, pyramid = _timed(
+            lambda: pyramid_match(gray_left, template, WISDOM_SCALES, WISDOM_THRESHOLD), repeat)
+
+        full_corners = _corners(full, width // 2, height)
+        pyramid_corners = _corners(pyramid, width // 2, height)
+        offset = None
+        if expected_origin and pyramid_corners:
+            offset = max(abs(pyramid_corners[0][0] - expected_origin[0]),
+                         abs(pyramid_corners[0][1] - expected_origin[1]))
+        results.append({
+            'name': name,
+            'size': (width, height),
+            'full_ms': full_ms,
+            'pyramid_ms': pyramid_ms,
+            'speedup': full_ms / pyramid_ms if pyramid_ms > 0 else 0.0,
+            'same_anchors': full_corners is not None and full_corners == pyramid_corners,
+            'anchors': pyramid_corners,
+            'origin_offset': offset
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="wisdom锚点匹配压测")
+    parser.add_argument('--images', nargs='+', help="录制的仓库截图，默认使用合成的golden截图")
+    parser.add_argument('--repeat', type=int, default=1, help="每种方法重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    # 识别模板使用相对路径
+    os.chdir(ROOT)
+
+    print(f"{'截图':<12}{'尺寸':>12}{'全图(ms)':>10}{'金字塔(ms)':>12}{'加速':>8}  锚点一致  锚点")
+    for result in run_benchmark(args.images, args.repeat):
+        size = f"{result['size'][0]}x{result['size'][1]}"
+        same = "是" if result['same_anchors'] else "否"
+        offset = f" (偏差{result['origin_offset']}px)" if result['origin_offset'] is not None else ""
+        print(f"{result['name']:<12}{size:>12}{result['full_ms']:>10.0f}{result['pyramid_ms']:>12.0f}"
+              f"{result['speedup']:>7.1f}x  {same:<8}{result['anchors']}{offset}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""截图转换路径压测
+
+对比两条把32位BGRX截图像素转换为OpenCV BGR图像的路径，统计每帧耗时和内存分配:
+    - 旧路径: GetBitmapBits 复制出bytes -> PIL frombuffer('BGRX') -> np.array -> cvtColor(RGB2BGR)
+    - 新路径: DIB section 上的numpy视图 -> 一次 cvtColor(BGRA2BGR)（可复用输出数组）
+
+默认在合成的像素缓冲区上测试转换本身，可在任何系统运行；PIL不可用时旧路径用等价的
+numpy操作模拟（同样的复制次数）。Windows下加 --live 同时测试真实的GDI截图。
+
+用法:
+    python benchmarks/capture_benchmark.py
+    python benchmarks/capture_benchmark.py --frames 50 --resolutions 1920x1080 3840x2160
+    python benchmarks/capture_benchmark.py --live
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from core.platforms.gdi_capture import bgrx_view, bgrx_to_bgr
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def legacy_convert(bits, width, height):
+    """旧路径：bytes -> PIL -> numpy -> RGB转BGR"""
+    if Image is not None:
+        img = Image.frombuffer('RGB', (width, height), bits, 'raw', 'BGRX', 0, 1)
+        return cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+    # 模拟PIL解码BGRX为RGB（一次复制）和np.array（一次复制）
+    rgb = np.frombuffer(bits, dtype=np.uint8).reshape(height, width, 4)[:, :, 2::-1].copy()
+    return cv2.cvtColor(np.array(rgb), cv2.COLOR_RGB2BGR)
+
+
+def _measure(func, frames):
+    """运行frames次，返回 (平均每帧毫秒, 平均每帧分配字节数)"""
+    func()  # 预热
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_allocated = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        func()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - start_allocated)
+        tracemalloc.reset_peak()
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return elapsed * 1000 / frames, peak
+
+
+def run_benchmark(width, height, frames=20, live=False):
+    """测试一个分辨率，返回 {路径名: (每帧毫秒, 每帧峰值分配字节数)}"""
+    rng = np.random.default_rng(0)
+    buffer = bytearray(rng.integers(0, 256, size=width * height * 4, dtype=np.uint8).tobytes())
+    view = bgrx_view(buffer, width, height)
+    out = np.empty((height, width, 3), dtype=np.uint8)
+
+    # 两条路径的结果必须一致
+    assert np.array_equal(legacy_convert(bytes(buffer), width, height), bgrx_to_bgr(view))
+
+    results = {
+        '旧路径(bytes+PIL+np.array)': _measure(lambda: legacy_convert(bytes(buffer), width, height), frames),
+        '新路径(视图+cvtColor)': _measure(lambda: bgrx_to_bgr(view), frames),
+        '新路径(复用输出数组)': _measure(lambda: bgrx_to_bgr(view, out), frames),
+    }
+
+    if live:
+        from core.platforms.gdi_capture import GdiCapture
+        capture = GdiCapture()
+        rect = (0, 0, width, height)
+        try:
+            results['GDI截图+转换'] = _measure(lambda: capture.grab(rect), frames)
+            results['GDI截图(仅视图)'] = _measure(lambda: capture.capture(rect), frames)
+        finally:
+            capture.close()
+    return results
+
+
+def _parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="截图转换路径压测")
+    parser.add_argument('--frames', type=int, default=20, help="每条路径的测试帧数")
+    parser.add_argument('--resolutions', nargs='+', default=['1920x1080', '3840x2160'],
+                        help="测试分辨率，如 1920x1080")
+    parser.add_argument('--live', action='store_true', help="同时测试真实的GDI截图（仅Windows）")
+    args = parser.parse_args()
+
+    if Image is None:
+        print("PIL不可用，旧路径使用等价的numpy复制模拟")
+    for resolution in args.resolutions:
+        width, height = _parse_resolution(resolution)
+        print(f"\n{width}x{height}")
+        print(f"{'路径':<28}{'每帧(ms)':>10}{'分配(MB)':>10}")
+        for name, (ms, allocated) in run_benchmark(width, height, args.frames, args.live).items():
+            print(f"{name:<28}{ms:>10.2f}{allocated / 1024 / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""仓库格子占用图压测（逐格Python循环 vs 向量化分块统计）
+
+在合成的仓库截图上对比两种计算全部格子占用情况的方式:
+    - 逐格方式: 在Python中循环每个格子，切片缩放后分别计算标准差和边缘能量
+    - 向量化方式: occupancy_map 把网格区域缩放为每格固定像素后reshape为块，一次性统计全部格子
+
+普通仓库12×12（144格）和四倍仓库24×24（576格），网格占窗口高度的80%。
+
+用法:
+    python benchmarks/occupancy_benchmark.py
+    python benchmarks/occupancy_benchmark.py --sizes 1920x1080 3840x2160 --grids 12 24 --repeat 20
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from core.vision.occupancy import occupancy_map, STD_THRESHOLD, EDGE_THRESHOLD
+from tools.sim_scenario import synthetic_trade_platform, WISDOM_TEMPLATE_PATH
+
+
+def stash_gray(width, height, grid_size, items=20, seed=0):
+    """合成仓库截图的灰度图，返回 (灰度图, 网格信息, 物品格子)"""
+    wisdom_w = cv2.imread(WISDOM_TEMPLATE_PATH).shape[1]
+    cell = int(height * 0.8 / grid_size)
+    rng = np.random.default_rng(seed)
+    cells = [(int(col), int(row)) for col, row in rng.integers(2, grid_size, size=(items, 2))]
+    platform, layout = synthetic_trade_platform(
+        window_rect=(0, 0, width, height), grid_origin=(height // 20, height // 10), grid_size=grid_size,
+        wisdom_scale=(cell + 0.5) / wisdom_w, items=cells)
+    gray = cv2.cvtColor(platform.screens['stash'], cv2.COLOR_BGR2GRAY)
+    cell = layout['cell']
+    grid = {'start': layout['grid_origin'], 'cell': (cell, cell), 'cols': grid_size, 'rows': grid_size}
+    return gray, grid, cells
+
+
+def per_cell_occupancy(gray, grid, block=16, margin=0.15):
+    """逐格方式：Python循环切片每个格子，同样缩放为block×block后统计"""
+    (x0, y0), (cell_w, cell_h) = grid['start'], grid['cell']
+    trim = int(block * margin)
+    occupied = np.zeros((grid['rows'], grid['cols']), dtype=bool)
+    for row in range(grid['rows']):
+        for col in range(grid['cols']):
+            x1, y1 = int(round(x0 + col * cell_w)), int(round(y0 + row * cell_h))
+            x2, y2 = int(round(x0 + (col + 1) * cell_w)), int(round(y0 + (row + 1) * cell_h))
+            resized = cv2.resize(gray[y1:y2, x1:x2], (block, block), interpolation=cv2.INTER_AREA)
+            inner = resized[trim:block - trim, trim:block - trim].astype(np.float32)
+            edge = (np.abs(np.diff(inner, axis=0)).mean() + np.abs(np.diff(inner, axis=1)).mean()) / 2
+            occupied[row, col] = inner.std() > STD_THRESHOLD or edge > EDGE_THRESHOLD
+    return occupied
+
+
+def _timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def run_benchmark(sizes=((1920, 1080), (3840, 2160)), grids=(12, 24), repeat=10):
+    """返回每种分辨率和网格的 {size, grid, loop_ms, vectorised_ms, speedup, agree, correct}"""
+    rows = []
+    for width, height in sizes:
+        for grid_size in grids:
+            gray, grid, cells = stash_gray(width, height, grid_size)
+            loop_ms, loop = _timed(lambda: per_cell_occupancy(gray, grid), repeat)
+            vectorised_ms, vectorised = _timed(lambda: occupancy_map(gray, grid), repeat)
+            expected = np.zeros_like(vectorised)
+            expected[0, 0] = expected[-1, -1] = True
+            for col, row in cells:
+                expected[row - 1, col - 1] = True
+            rows.append({
+                'size': f"{width}x{height}",
+                'grid': grid_size,
+                'loop_ms': loop_ms,
+                'vectorised_ms': vectorised_ms,
+                'speedup': loop_ms / vectorised_ms if vectorised_ms > 0 else 0.0,
+                'agree': bool(np.array_equal(loop, vectorised)),
+                'correct': bool(np.array_equal(vectorised, expected))
+            })
+    return rows
+
+
+def _parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="仓库格子占用图压测")
+    parser.add_argument('--sizes', nargs='+', default=['1920x1080', '3840x2160'], help="窗口尺寸，如 1920x1080")
+    parser.add_argument('--grids', type=int, nargs='+', default=[12, 24], help="网格边长（12为普通仓库，24为四倍仓库）")
+    parser.add_argument('--repeat', type=int, default=10, help="重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    print(f"{'窗口':>12}{'网格':>6}{'逐格(ms)':>12}{'向量化(ms)':>12}{'加速':>8}{'结果一致':>10}{'识别正确':>10}")
+    for row in run_benchmark([_parse_size(size) for size in args.sizes], args.grids, args.repeat):
+        print(f"{row['size']:>12}{row['grid']:>6}{row['loop_ms']:>12.2f}{row['vectorised_ms']:>12.2f}"
+              f"{row['speedup']:>7.1f}x{str(row['agree']):>10}{str(row['correct']):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""多尺度模板匹配并行压测（串行循环 vs 线程池）
+
+cv2.resize 和 cv2.matchTemplate 执行时释放GIL，各尺度可以在线程池中并行。在合成截图上对比
+不同线程数下的墙钟耗时:
+    - 仓库按钮: 20个尺度的整图匹配取最高分（OpenStashModule），含出现确定匹配即提前结束的版本
+    - wisdom锚点: 35个尺度的逐尺度全图匹配和金字塔匹配（TakeOutItemModule）
+
+每种配置都检查结果与串行循环一致。加速比取决于CPU核心数，OpenCV自身的线程数
+（cv2.getNumThreads）也会参与竞争，可用 --cv-threads 1 排除其影响。
+
+用法:
+    python benchmarks/parallel_match_benchmark.py
+    python benchmarks/parallel_match_benchmark.py --workers 1 2 4 8 --size 2560x1440 --repeat 5
+"""
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from core.process_modules.open_stash import stash_scales, CERTAIN_SCORE
+from core.process_modules.take_out_item import select_anchor_corners
+from core.vision.parallel_match import MultiScaleMatcher
+from core.vision.peaks import match_pos
+from core.vision.pyramid import pyramid_match, exhaustive_match
+from tools.sim_scenario import synthetic_trade_platform, STASH_TEMPLATE_PATH, WISDOM_TEMPLATE_PATH
+
+WISDOM_SCALES = np.linspace(0.2, 2.5, 35)
+WISDOM_THRESHOLD = 0.65
+
+
+def _timed(func, repeat):
+    """运行repeat次，返回 (最短耗时毫秒, 最后一次结果)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def _corners(matches, region_width, height):
+    corners = select_anchor_corners(matches, region_width, height)
+    return None if corners is None else tuple(match_pos(marker) for marker in corners)
+
+
+def run_benchmark(width, height, workers=(1, 2, 4, 8), repeat=3):
+    """返回 {任务名: [(线程数, 毫秒, 与串行一致)]}"""
+    stash_template = cv2.cvtColor(cv2.imread(STASH_TEMPLATE_PATH), cv2.COLOR_BGR2GRAY)
+    wisdom_template = cv2.cvtColor(cv2.imread(WISDOM_TEMPLATE_PATH), cv2.COLOR_BGR2GRAY)
+    scales = stash_scales(stash_template.shape[1], width)
+    platform, _ = synthetic_trade_platform(window_rect=(0, 0, width, height), stash_pos=(width * 2 // 3, height // 3),
+                                           stash_scale=scales[12], wisdom_scale=WISDOM_SCALES[8],
+                                           grid_origin=(width // 32, height // 12))
+    game = cv2.cvtColor(platform.screens['game'], cv2.COLOR_BGR2GRAY)
+    stash = platform.screens['stash']
+    stash_left = cv2.cvtColor(stash[:, :width // 2], cv2.COLOR_BGR2GRAY)
+
+    tasks = {
+        '仓库按钮': lambda matcher: matcher.best_match(game, stash_template, scales)[:3],
+        '仓库按钮(提前结束)': lambda matcher: matcher.best_match(game, stash_template, scales,
+                                                          certain=CERTAIN_SCORE)[1],
+        'wisdom全图': lambda matcher: _corners(exhaustive_match(stash_left, wisdom_template, WISDOM_SCALES,
+                                                               WISDOM_THRESHOLD, matcher=matcher),
+                                             width // 2, height),
+        'wisdom金字塔': lambda matcher: _corners(pyramid_match(stash_left, wisdom_template, WISDOM_SCALES,
+                                                             WISDOM_THRESHOLD, matcher=matcher),
+                                               width // 2, height),
+    }
+
+    results = {name: [] for name in tasks}
+    for count in workers:
+        matcher = MultiScaleMatcher(count)
+        try:
+            for name, task in tasks.items():
+                task(matcher)  # 预热线程池
+                ms, value = _timed(lambda: task(matcher), repeat)
+                results[name].append((count, ms, value))
+        finally:
+            matcher.shutdown()
+
+    # 以第一个配置（默认串行）的结果为准
+    return {name: [(count, ms, value == rows[0][2]) for count, ms, value in rows]
+            for name, rows in results.items()}
+
+
+def _parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多尺度模板匹配并行压测")
+    parser.add_argument('--size', default='1920x1080', help="截图尺寸，如 1920x1080")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="线程数，第一个作为基准")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数（取最短耗时）")
+    parser.add_argument('--cv-threads', type=int, help="OpenCV内部线程数，默认不修改")
+    args = parser.parse_args()
+
+    # 识别模板使用相对路径
+    os.chdir(ROOT)
+    if args.cv_threads is not None:
+        cv2.setNumThreads(args.cv_threads)
+
+    width, height = _parse_size(args.size)
+    print(f"CPU核心: {os.cpu_count()}, OpenCV线程: {cv2.getNumThreads()}, 截图: {width}x{height}")
+    print(f"{'任务':<16}{'线程':>6}{'耗时(ms)':>10}{'加速':>8}  结果一致")
+    for name, rows in run_benchmark(width, height, args.workers, args.repeat).items():
+        baseline = rows[0][1]
+        for count, ms, same in rows:
+            print(f"{name:<16}{count:>6}{ms:>10.1f}{baseline / ms:>7.2f}x  {'是' if same else '否'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""模板匹配候选提取压测（Python逐点遍历 vs 向量化提取+非极大值抑制）
+
+在合成的多尺度matchTemplate得分图上对比两种候选提取方式:
+    - 旧方式: 对 np.where(result >= 阈值) 的每个点在Python中循环，用 "x_y" 字符串键记录每个位置
+      的最佳尺度，最后再 split('_') 解析回坐标
+    - 新方式: extract_peaks 向量化提取每个尺度模板尺寸邻域内的局部极大值为结构化数组，
+      拼接各尺度后 non_max_suppression
+
+得分图中放置若干个峰值，阈值越低越接近真实截图中大片低分区域超过阈值的情况。
+
+用法:
+    python benchmarks/peak_extraction_benchmark.py
+    python benchmarks/peak_extraction_benchmark.py --size 960x1080 --scales 10 --thresholds 0.3 0.5 0.65
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from core.vision.peaks import extract_peaks, non_max_suppression
+
+PEAK_SIZE = 40
+
+
+def synthetic_results(width, height, scales, peaks=6, seed=0):
+    """生成每个尺度的得分图: 平滑噪声背景加上固定位置的峰值"""
+    rng = np.random.default_rng(seed)
+    centers = [(int(rng.integers(0, width - PEAK_SIZE)), int(rng.integers(0, height - PEAK_SIZE)))
+               for _ in range(peaks)]
+    ys, xs = np.mgrid[0:height, 0:width]
+    results = []
+    for index in range(scales):
+        noise = cv2.GaussianBlur(rng.random((height, width), dtype=np.float32), (0, 0), 6)
+        result = (noise - noise.mean()) * 4 + 0.3
+        for cx, cy in centers:
+            peak = 0.95 - 0.02 * abs(index - scales // 2)
+            result = np.maximum(result, peak * np.exp(-((xs - cx) ** 2 + (ys - cy) ** 2) / 200.0))
+        results.append(result.astype(np.float32))
+    return results
+
+
+def legacy_extract(results, scales, threshold):
+    """旧方式：Python循环 + 字符串键"""
+    best_scale_map = {}
+    for result, scale in zip(results, scales):
+        locations = np.where(result >= threshold)
+        for pt in zip(*locations[::-1]):
+            key = f"{pt[0]}_{pt[1]}"
+            value = result[pt[1], pt[0]]
+            if key not in best_scale_map or value > best_scale_map[key]['value']:
+                best_scale_map[key] = {'scale': scale, 'value': value}
+    matches = []
+    for key, info in best_scale_map.items():
+        x, y = map(int, key.split('_'))
+        matches.append({'pos': (x, y), 'scale': info['scale'], 'value': float(info['value'])})
+    return matches
+
+
+def vectorised_extract(results, scales, threshold):
+    """新方式：向量化提取 + 非极大值抑制"""
+    found = [extract_peaks(result, threshold, scale, (PEAK_SIZE, PEAK_SIZE), radius=PEAK_SIZE // 2)
+             for result, scale in zip(results, scales)]
+    return non_max_suppression(np.concatenate(found))
+
+
+def _timed(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def run_benchmark(width, height, scales=10, thresholds=(0.3, 0.5, 0.65), repeat=3):
+    """返回每个阈值的 {threshold, hits, legacy_ms, vectorised_ms, speedup, legacy_count, vectorised_count}"""
+    results = synthetic_results(width, height, scales)
+    scale_values = np.linspace(0.5, 1.5, scales)
+    rows = []
+    for threshold in thresholds:
+        hits = int(sum(np.count_nonzero(result >= threshold) for result in results))
+        legacy_ms, legacy = _timed(lambda: legacy_extract(results, scale_values, threshold), repeat)
+        vectorised_ms, vectorised = _timed(lambda: vectorised_extract(results, scale_values, threshold), repeat)
+        rows.append({
+            'threshold': threshold,
+            'hits': hits,
+            'legacy_ms': legacy_ms,
+            'vectorised_ms': vectorised_ms,
+            'speedup': legacy_ms / vectorised_ms if vectorised_ms > 0 else 0.0,
+            'legacy_count': len(legacy),
+            'vectorised_count': len(vectorised)
+        })
+    return rows
+
+
+def _parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模板匹配候选提取压测")
+    parser.add_argument('--size', default='960x1080', help="得分图尺寸，如 960x1080")
+    parser.add_argument('--scales', type=int, default=10, help="尺度数")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.3, 0.5, 0.65], help="匹配阈值")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数（取最短耗时）")
+    args = parser.parse_args()
+
+    width, height = _parse_size(args.size)
+    print(f"{'阈值':>6}{'候选点':>10}{'旧方式(ms)':>12}{'新方式(ms)':>12}{'加速':>8}{'旧结果数':>10}{'新结果数':>10}")
+    for row in run_benchmark(width, height, args.scales, args.thresholds, args.repeat):
+        print(f"{row['threshold']:>6.2f}{row['hits']:>10}{row['legacy_ms']:>12.1f}{row['vectorised_ms']:>12.1f}"
+              f"{row['speedup']:>7.1f}x{row['legacy_count']:>10}{row['vectorised_count']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""推送吞吐压测
+
+启动本地模拟推送服务器，以固定速率驱动推送分发器，统计:
+    - 实际投递吞吐（成功投递的渠道消息数/秒）
+    - 每条消息的分发延迟 p50/p99
+    - 重试放大系数（服务器收到的请求数 / 应发送的渠道消息数，包含熔断探测）
+
+用法:
+    python benchmarks/push_benchmark.py --rate 20 --duration 10 --latency-ms 30 --error-rate 0.05
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.push.dispatcher import PushDispatcher
+from core.push.rate_limiter import PushRateLimiter, PRIORITY_TRADE, PRIORITY_MESSAGE
+from core.push.wxpusher import WxPusher
+from core.push.serverchan import ServerChan
+from core.push.qmsgchan import QmsgChan
+from core.push.email_pusher import EmailPusher
+from tools.mock_push_server import MockPushServer, FaultInjector
+
+PUSHER_CLASSES = {
+    'wxpusher': WxPusher,
+    'serverchan': ServerChan,
+    'qmsgchan': QmsgChan,
+    'email': EmailPusher
+}
+
+
+def percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_benchmark(rate, duration, channels, latency_ms=0, jitter_ms=0, error_rate=0.0,
+                  http_error_rate=0.0, workers=8, use_limiter=False, trade_ratio=0.5, seed=1):
+    """按固定速率驱动推送分发器并返回统计结果"""
+    injector = FaultInjector(latency_ms, jitter_ms, error_rate, http_error_rate, seed=seed)
+    server = MockPushServer(injector=injector).start()
+    try:
+        config = server.push_config()
+        limiter = PushRateLimiter(config.get('push_rate_limit', {}), state_file=None) if use_limiter else None
+        dispatcher = PushDispatcher.from_config(config, limiter)
+        for channel in channels:
+            dispatcher.add_handler(PUSHER_CLASSES[channel](config))
+
+        latencies = []
+        delivered = [0]
+        lock = threading.Lock()
+
+        def send_one(index, scheduled_at):
+            priority = PRIORITY_TRADE if (index % 100) < trade_ratio * 100 else PRIORITY_MESSAGE
+            dispatcher.dispatch("压测", f"压测消息 #{index}", priority)
+            finished = time.perf_counter()
+            with lock:
+                latencies.append(finished - scheduled_at)
+
+        # 统计每个渠道的成功投递数
+        for handler in dispatcher.handlers:
+            original_send = handler.send
+
+            def counted_send(keyword, content, _send=original_send):
+                success, msg = _send(keyword, content)
+                if success:
+                    with lock:
+                        delivered[0] += 1
+                return success, msg
+            handler.send = counted_send
+
+        total = int(rate * duration)
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index in range(total):
+                scheduled_at = start + index * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(send_one, index, scheduled_at)
+        elapsed = time.perf_counter() - start
+
+        expected = total * len(channels)
+        requests_received = server.stats.total_requests()
+        return {
+            'messages': total,
+            'channels': len(channels),
+            'elapsed_s': elapsed,
+            'delivered': delivered[0],
+            'throughput': delivered[0] / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'requests_received': requests_received,
+            'retry_amplification': requests_received / expected if expected else 0.0,
+            'server_stats': server.stats.snapshot(),
+            'health': dispatcher.get_health()
+        }
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推送吞吐压测")
+    parser.add_argument('--rate', type=float, default=10, help="每秒消息数")
+    parser.add_argument('--duration', type=float, default=5, help="压测时长（秒）")
+    parser.add_argument('--channels', default='wxpusher,serverchan,qmsgchan,email')
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--jitter-ms', type=float, default=5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--http-error-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--with-limiter', action='store_true', help="启用推送限流器")
+    args = parser.parse_args()
+
+    channels = [c.strip() for c in args.channels.split(',') if c.strip()]
+    result = run_benchmark(args.rate, args.duration, channels, args.latency_ms, args.jitter_ms,
+                           args.error_rate, args.http_error_rate, args.workers, args.with_limiter)
+
+    print(f"消息数: {result['messages']} x {result['channels']} 渠道, 用时 {result['elapsed_s']:.2f}s")
+    print(f"成功投递: {result['delivered']}, 吞吐: {result['throughput']:.1f} 条/秒")
+    print(f"分发延迟: p50 {result['p50_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms")
+    print(f"服务器收到请求: {result['requests_received']}, 重试放大: {result['retry_amplification']:.2f}x")
+    for channel, stats in result['server_stats'].items():
+        health = result['health'].get(channel, {})
+        print(f"  {channel}: {stats}  状态: {health.get('state')} 健康度: {health.get('health')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""自动交易全流程仿真压测
+
+在仿真平台上连续运行完整的交易流程（邀请、等待进入、打开仓库、定位网格、取出物品、发起交易），
+不需要游戏和Windows，统计:
+    - 交易吞吐（笔/秒）和成功率
+    - 各阶段耗时 p50/p90/p99（来自TradeTracer）
+    - 每笔交易的截图次数和输入事件数，共享截图缓存的命中率
+    - 各输入动作（聊天命令、双击、Ctrl点击、按键）的批次数和注入耗时
+    - 模板匹配尺度记忆的命中率和节省时间（每次压测从空记忆和空模板库开始，不写入文件）
+    - 仓库按钮区域搜索的命中率和节省的搜索面积
+    - 仓库网格缓存的校验命中率
+
+用法:
+    python benchmarks/sim_trade_benchmark.py --trades 50
+    python benchmarks/sim_trade_benchmark.py --trades 20 --join-delay 1.5 --time-scale 0.1 --pipelined
+    python benchmarks/sim_trade_benchmark.py --scenario sim_scenario/scenario.json
+"""
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import argparse
+import logging
+import time
+
+from core.auto_trade import AutoTrade, TradeConfig
+from core.platforms.base import set_platform
+from core.platforms.simulation import SimulationPlatform
+from core.vision.scale_memory import ScaleMemory, set_scale_memory
+from core.vision.template_bank import TemplateBank, set_template_bank
+from core.vision.roi_memory import RoiMemory, set_roi_memory
+from tools.sim_scenario import synthetic_trade_platform
+
+
+def run_benchmark(trades, join_delay=0.0, trade_delay=0.0, time_scale=0.0,
+                  pipelined=False, scenario=None, p1_num=3, p2_num=5):
+    """在仿真平台上连续运行交易流程并返回统计结果"""
+    previous_memory = set_scale_memory(ScaleMemory(None))
+    previous_bank = set_template_bank(TemplateBank(None))
+    previous_roi = set_roi_memory(RoiMemory(None))
+    auto_trade = AutoTrade()
+    auto_trade.tracer.file_path = None
+    history = []
+    auto_trade.set_callbacks(lambda status: None, history.append)
+    auto_trade.set_config(TradeConfig(
+        stash_interval_ms=0,
+        trade_interval_ms=0,
+        party_timeout_ms=max(2000, join_delay * time_scale * 1000 * 2),
+        trade_timeout_ms=max(2000, trade_delay * time_scale * 1000 * 2),
+        pipelined_stash=pipelined
+    ))
+
+    if scenario:
+        platform = SimulationPlatform.from_scenario(
+            scenario, log_sink=auto_trade.handle_game_log, time_scale=time_scale)
+    else:
+        platform, _ = synthetic_trade_platform(
+            log_sink=auto_trade.handle_game_log, join_delay=join_delay,
+            trade_delay=trade_delay, time_scale=time_scale)
+    previous = set_platform(platform)
+
+    try:
+        start = time.perf_counter()
+        for i in range(trades):
+            parsed = {'user': f"Buyer{i}", 'p1_num': str(p1_num), 'p2_num': str(p2_num)}
+            auto_trade._process_trade(parsed, "")
+        elapsed = time.perf_counter() - start
+        capture = auto_trade.get_capture_stats()
+        scale = auto_trade.get_scale_stats()
+        grid = auto_trade.get_grid_stats()
+        roi = auto_trade.get_roi_stats()
+    finally:
+        platform.cancel_pending()
+        set_platform(previous)
+        set_scale_memory(previous_memory)
+        set_template_bank(previous_bank)
+        set_roi_memory(previous_roi)
+
+    completed = sum(1 for record in history if "交易完成" in record)
+    return {
+        'trades': trades,
+        'completed': completed,
+        'elapsed_s': elapsed,
+        'throughput': trades / elapsed if elapsed > 0 else 0.0,
+        'grabs_per_trade': len(platform.events_of('grab')) / trades,
+        'events_per_trade': len(platform.events) / trades,
+        'capture': capture,
+        'scale': scale,
+        'grid': grid,
+        'roi': roi,
+        'stages': auto_trade.get_latency_stats(),
+        'inputs': platform.get_input_stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动交易全流程仿真压测")
+    parser.add_argument('--trades', type=int, default=20, help="交易笔数")
+    parser.add_argument('--join-delay', type=float, default=0.0, help="买家进入区域的延迟（秒，按time-scale缩放）")
+    parser.add_argument('--trade-delay', type=float, default=0.0, help="买家完成交易的延迟（秒，按time-scale缩放）")
+    parser.add_argument('--time-scale', type=float, default=0.0, help="等待时间缩放比例，0表示不等待")
+    parser.add_argument('--pipelined', action='store_true', help="等待买家进入期间预备仓库")
+    parser.add_argument('--scenario', help="场景文件路径，默认使用合成场景")
+    args = parser.parse_args()
+
+    # 识别模板使用相对路径
+    os.chdir(ROOT)
+    logging.disable(logging.ERROR)
+
+    result = run_benchmark(args.trades, args.join_delay, args.trade_delay, args.time_scale,
+                           args.pipelined, args.scenario)
+
+    print(f"交易: {result['completed']}/{result['trades']} 完成, 用时 {result['elapsed_s']:.2f}s, "
+          f"吞吐 {result['throughput']:.2f} 笔/秒")
+    print(f"每笔截图: {result['grabs_per_trade']:.1f} 次, 每笔仿真事件: {result['events_per_trade']:.0f} 个")
+    capture = result['capture']
+    print(f"截图请求: {capture['requests']} 次, 实际截图: {capture['captures']} 次, "
+          f"缓存命中率: {capture['hit_rate'] * 100:.1f}%")
+    print(f"{'尺度记忆':<12}{'查询':>6}{'命中率':>8}{'全扫描':>8}{'命中(ms)':>10}{'全扫描(ms)':>12}{'节省(ms)':>10}")
+    for template, values in result['scale'].items():
+        name = os.path.splitext(os.path.basename(template))[0]
+        print(f"{name:<12}{values['lookups']:>6}{values['hit_rate'] * 100:>7.0f}%{values['sweeps']:>8}"
+              f"{values['avg_hit_ms']:>10.1f}{values['avg_sweep_ms']:>12.1f}{values['saved_ms']:>10.1f}")
+    for target, values in result['roi'].items():
+        name = os.path.splitext(os.path.basename(target))[0]
+        print(f"区域搜索 {name}: {values['lookups']} 次, 命中率 {values['hit_rate'] * 100:.1f}%, "
+              f"节省面积 {values['saved_ratio'] * 100:.1f}%")
+    grid = result['grid']
+    print(f"网格缓存: 校验 {grid['lookups']} 次, 命中率 {grid['hit_rate'] * 100:.1f}%, "
+          f"平均校验 {grid['avg_validate_ms']:.2f}ms, 重新定位 {grid['stores']} 次")
+    print(f"{'阶段':<12}{'次数':>6}{'P50(ms)':>10}{'P90(ms)':>10}{'P99(ms)':>10}")
+    for stage, values in result['stages'].items():
+        print(f"{stage:<12}{values['count']:>6}{values['p50']:>10.1f}{values['p90']:>10.1f}{values['p99']:>10.1f}")
+    print(f"{'输入动作':<12}{'次数':>6}{'事件':>6}{'批次':>6}{'平均(ms)':>10}{'最长(ms)':>10}")
+    for name, values in result['inputs'].items():
+        print(f"{name:<12}{values['count']:>6}{values['events']:>6}{values['batches']:>6}"
+              f"{values['avg_ms']:>10.2f}{values['max_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
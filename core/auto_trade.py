@@ -1,34 +1,36 @@
 import time
 import logging
 import re
-import win32con
-import win32api
-from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from typing import Optional, Callable, List
 from datetime import datetime
 import json
 import os
 import threading
-import queue
+import uuid
 
 from core.process_modules.game_command import GameCommandModule
 from core.process_modules.open_stash import OpenStashModule
 from core.process_modules.take_out_item import TakeOutItemModule
 from core.process_modules.tab_select import TabSelectModule
-
-class TradeState(Enum):
-    """交易状态枚举"""
-    IDLE = "空闲"
-    INVITING = "等待入组"
-    JOINED = "已入组"
-    STASH_OPENED = "仓库已打开"
-    ITEMS_TAKEN = "物品已取出"
-    TRADE_REQUESTED = "已发起交易"
-    TRADE_ACCEPTED = "交易已接受"
-    TRADE_COMPLETED = "交易完成"
-    TRADE_CANCELLED = "交易取消"
-    TRADE_FAILED = "交易失败"
+from core.dedup_cache import DedupCache, make_trade_key
+from core.trade_state import TradeState, TradeStateMachine, FINAL_STATES
+from core.trade_queue import TradeQueue
+from core.stash_prep import StashPreparation
+from core.log_history import LogHistory
+from core.trade_matcher import TradeLogMatcher, TradeEvent
+from core.trade_trace import TradeTracer
+from core.platforms.base import get_platform, KEY_ESC
+from core.frame_capture import get_frame_capture
+from core.vision.scale_memory import get_scale_memory
+from core.vision.roi_memory import get_roi_memory
+from core.visual_wait import (wait_until, ScreenChangeProbe, WaitStats,
+                              STASH_REGION, INVENTORY_REGION)
+
+# 用户进入后等待仓库预备结束的时间在打开仓库间隔之外的余量（秒），超时后放弃预备改为串行执行
+STASH_PREP_GRACE = 5.0
+# 取消仓库预备后等待后台线程退出的时间（秒），仍未退出时交易失败，避免两个线程同时操作游戏窗口
+STASH_PREP_CANCEL_TIMEOUT = 5.0
 
 @dataclass
 class TradeConfig:
@@ -37,22 +39,57 @@ class TradeConfig:
     stash_interval_ms: int = 1000
     trade_interval_ms: int = 1000
     trade_timeout_ms: int = 10000
+    dedup_ttl_ms: int = 60000
+    queue_ttl_ms: int = 120000
+    queue_max_size: int = 20
+    queue_priority: str = 'price'
+    currency_rates: dict = field(default_factory=dict)
+    pipelined_stash: bool = False
+    visual_confirm: bool = True
+    visual_poll_ms: int = 30
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TradeConfig':
+        """从配置字典(auto_trade节点)创建，忽略未知字段"""
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in names})
 
 class AutoTrade:
     def __init__(self):
         self.config = TradeConfig()
         self.enabled = False
-        self.current_trade = None
+        self.current_trade = None  # 当前交易的解析数据
+        self.current_trade_uid = None
         self.status_callback = None
         self.history_callback = None
-        self.log_history = []
-        self.trade_state = TradeState.IDLE
+        self.log_history = LogHistory(capacity=4096, max_age=60)  # 最近1分钟的游戏日志
+        
+        # 分阶段耗时追踪，状态转换和模块调用都会记录
+        self.tracer = TradeTracer()
+        
+        # 画面确认等待的确认次数和节省时间
+        self.wait_stats = WaitStats()
+        
+        # 交易状态机，日志线程推进状态，交易线程在条件变量上等待
+        self.state_machine = TradeStateMachine(on_change=self._on_state_change)
         
         # 当前交易信息
         self.current_user = None
         self.current_p1_num = None
         self.current_p2_num = None
+        self.trade_matcher = None  # 当前交易的日志匹配器
         self.trade_start_time = None
+        self.trade_log_mark = None  # 交易开始时日志缓冲区的时间基准
+        self.current_trade_key = None
+        self.current_time_saved = None
+        self.current_wait_saved = 0.0  # 画面确认等待节省的时间
+        
+        # 重复交易请求去重缓存
+        self.trade_dedup = DedupCache(ttl_seconds=self.config.dedup_ttl_ms / 1000)
+        
+        # 待处理交易请求的优先队列，交易进行中收到的请求在此排队
+        self.pending_trades = TradeQueue(on_discard=self._release_trade_key)
+        self._apply_queue_config()
         
         # 交易模式关键词模板缓存
         self.trade_templates = []
@@ -66,10 +103,9 @@ class AutoTrade:
         # 日志监控器引用
         self.log_monitor = None
         
-        # 用于等待用户加入的事件和结果
-        self.join_event = threading.Event()
-        self.join_result = False
-
+        # 交易账本，记录每笔交易的结果和分阶段耗时
+        self.ledger = None
+        
         self.logger = logging.getLogger("AutoTrade")
         
         # 添加Toast提示功能
@@ -85,8 +121,7 @@ class AutoTrade:
         except ImportError:
             self.has_toast = False
             
-        # 使用队列和专用线程处理交易请求
-        self.trade_queue = queue.Queue()
+        # 使用专用线程按优先级处理排队的交易请求
         self.trade_thread = None
         self.trade_thread_running = False
         
@@ -96,6 +131,16 @@ class AutoTrade:
         # 从配置文件读取初始状态
         self._load_config_state()
             
+    @property
+    def trade_state(self) -> TradeState:
+        """当前交易状态"""
+        return self.state_machine.get()
+
+    def _on_state_change(self, old_state: TradeState, new_state: TradeState):
+        """记录状态转换及上一状态的停留时间"""
+        self.tracer.on_state_change(old_state, new_state)
+        self.logger.debug(f"交易状态: {old_state.value} -> {new_state.value}")
+
     def _error_with_toast(self, msg, *args, **kwargs):
         """带Toast提示的错误日志方法"""
         # 调用原始的error方法记录日志
@@ -115,6 +160,15 @@ class AutoTrade:
     def set_config(self, config: TradeConfig):
         """更新交易配置"""
         self.config = config
+        self.trade_dedup.ttl_seconds = config.dedup_ttl_ms / 1000
+        self._apply_queue_config()
+
+    def _apply_queue_config(self):
+        """把队列相关配置应用到待处理交易队列"""
+        self.pending_trades.ttl_seconds = self.config.queue_ttl_ms / 1000
+        self.pending_trades.max_size = max(1, int(self.config.queue_max_size))
+        self.pending_trades.priority = self.config.queue_priority
+        self.pending_trades.set_currency_rates(self.config.currency_rates)
 
     def set_callbacks(self, 
                      status_callback: Callable[[str], None],
@@ -139,14 +193,8 @@ class AutoTrade:
     def add_log(self, log: str):
         """添加日志消息到历史记录"""
         try:
-            self.log_history.append({
-                'timestamp': time.time(),
-                'message': log
-            })
-            # 只保留最近1分钟的日志
-            cutoff_time = time.time() - 60
-            self.log_history = [l for l in self.log_history 
-                              if l['timestamp'] > cutoff_time]
+            # 环形缓冲区追加时自动淘汰1分钟前的日志
+            self.log_history.append(log)
             
             # 检查日志是否包含交易相关信息并立即处理
             self._process_trade_log(log)
@@ -158,49 +206,66 @@ class AutoTrade:
             self.logger.error(f"日志处理异常: {str(e)}")
 
     def handle_trade_message(self, message: str, template: str):
-        """处理交易消息，将请求放入队列"""
+        """处理交易消息，解析后放入待处理交易队列"""
         # 快速检查是否启用了自动交易
         if not self.enabled:
             self.logger.debug("自动交易已禁用，忽略交易消息")
             return
         
-        # 将交易请求添加到队列
-        self.trade_queue.put((message, template))
-        self.logger.debug(f"交易请求已加入队列: {message[:30]}...")
-
-    def _process_trade_request(self, message: str, template: str):
-        """处理单个交易请求"""
+        parsed_data = self._parse_with_templates(message, template)
+        if not parsed_data:
+            self.logger.warning(f"无法解析交易消息: {message}")
+            return
+        
+        # 忽略有效期内重复发送的交易请求
+        if self.trade_dedup.seen(make_trade_key(parsed_data)):
+            self.logger.info(f"忽略重复的交易请求: {parsed_data.get('user')}")
+            return
+        
+        # 同一买家的多条请求在队列中合并
+        result = self.pending_trades.push(parsed_data.get('user'), message, template, parsed_data)
+        if result == 'dropped':
+            # 请求没有排队，允许买家重新发送
+            self.trade_dedup.discard(make_trade_key(parsed_data))
+            self.logger.warning(f"待处理交易已满，忽略交易请求: {parsed_data.get('user')}")
+        else:
+            self.logger.debug(f"交易请求已加入队列({result}): {message[:30]}...")
+
+    def _release_trade_key(self, pending):
+        """排队的请求被淘汰、过期或清空，未被处理，允许买家重新发送相同的请求"""
+        self.trade_dedup.discard(make_trade_key(pending.parsed))
+        self.logger.info(f"交易请求未被处理已移出队列: {pending.buyer}")
+
+    def _parse_with_templates(self, message: str, template: str) -> Optional[dict]:
+        """先用触发的模板解析交易消息，失败时尝试其他交易模式模板"""
+        parsed_data = self._parse_trade_message(message, template)
+        if parsed_data:
+            return parsed_data
+        
+        # 更新交易模板
+        self._load_trade_templates()
+        for trade_template in self.trade_templates:
+            if trade_template != template:  # 避免重复尝试相同模板
+                parsed_data = self._parse_trade_message(message, trade_template)
+                if parsed_data:
+                    return parsed_data
+        return None
+
+    def _process_trade_request(self, pending):
+        """处理单个排队的交易请求"""
         # 获取锁以确保同一时间只有一个交易进行
         with self.trade_lock:
             try:
-                # 如果未启用或当前有交易正在进行，则忽略新的交易消息
-                if not self.enabled or self.trade_state != TradeState.IDLE:
-                    self.logger.info(f"忽略交易消息: {'自动交易已禁用' if not self.enabled else '当前有交易正在进行'}")
+                if not self.enabled:
+                    self.logger.info("忽略交易请求: 自动交易已禁用")
                     return
                 
-                # 更新交易模板
-                self._load_trade_templates()
-                    
-                # 尝试使用所有交易模式的模板解析交易消息
-                parsed_data = None
-                
-                # 先尝试使用传入的模板解析
-                parsed_data = self._parse_trade_message(message, template)
-                
-                # 如果失败，尝试使用其他交易模板
-                if not parsed_data:
-                    for trade_template in self.trade_templates:
-                        if trade_template != template:  # 避免重复尝试相同模板
-                            parsed_data = self._parse_trade_message(message, trade_template)
-                            if parsed_data:
-                                break
-                
-                if not parsed_data:
-                    self.logger.warning(f"无法解析交易消息: {message}")
-                    return
+                wait_seconds = self.pending_trades.clock() - pending.arrived_at
+                if wait_seconds >= 1:
+                    self.logger.info(f"交易请求 {pending.buyer} 排队 {wait_seconds:.1f} 秒后开始处理")
                 
                 # 处理交易流程
-                self._process_trade(parsed_data, message)
+                self._process_trade(pending.parsed, pending.message)
                     
             except Exception as e:
                 self.update_status(f"交易过程出错: {str(e)}")
@@ -209,95 +274,232 @@ class AutoTrade:
 
     def _process_trade(self, parsed_data, message):
         """处理交易流程的核心逻辑，从解析数据开始"""
+        prep = None
         try:
             self.trade_start_time = time.time()
+            self.trade_log_mark = self.log_history.clock()
+            self.current_trade = parsed_data
+            self.current_trade_uid = uuid.uuid4().hex
 
             self.current_user = parsed_data.get("user")
             self.current_p1_num = parsed_data.get("p1_num")
             self.current_p2_num = parsed_data.get("p2_num")
+            self.current_trade_key = make_trade_key(parsed_data)
+            self.trade_matcher = TradeLogMatcher(self.current_user)
+            self.tracer.begin_trade(self.current_user)
 
             self.update_status(f"开始与用户 {self.current_user} 的自动交易")
-            self.trade_state = TradeState.INVITING
-            
-            # 先添加临时触发器，注意：这时已经有了current_user
-            if self.log_monitor:
-                trigger_pattern = self.get_temp_trigger_pattern()
-                if trigger_pattern:
-                    self.log_monitor.add_temp_trigger(
-                        trigger_pattern,
-                        self.handle_temp_trigger_match,
-                        self.config.party_timeout_ms
-                    )
+            self.state_machine.transition(TradeState.INVITING)
             
             # 邀请用户组队
-            self.game_command.run(command_text=f"/invite {self.current_user}")
+            with self.tracer.span("邀请组队"):
+                self.game_command.run(command_text=f"/invite {self.current_user}")
             self.update_status(f"已发送组队邀请给 {self.current_user}")
 
+            # 流水线模式：等待用户进入期间在后台预备仓库
+            if self.config.pipelined_stash:
+                prep = StashPreparation(
+                    self.open_stash, self.tab_select, self.take_out_item,
+                    tab=parsed_data.get("tab"),
+                    stash_interval=self.config.stash_interval_ms / 1000
+                ).start()
+                self.update_status("等待用户进入期间预备仓库")
+
             # 等待用户进入
-            join_pattern = f"*{self.current_user} 進入了此區域。"
-            if not self._wait_for_join(join_pattern, self.config.party_timeout_ms):
-                self._handle_trade_fail("用户加入超时")
+            if not self._wait_for_join(self.config.party_timeout_ms):
+                self._cancel_stash_prep(prep)
+                self._handle_trade_fail(self._abort_reason() or "用户加入超时")
                 return
 
-            self.trade_state = TradeState.JOINED
             self.update_status(f"用户 {self.current_user} 已加入区域")
+            prepared = self._finish_stash_prep(prep)
+            if prepared is None:
+                self._handle_trade_fail("仓库预备超时且未能停止")
+                return
+            stash_opened, tab_selected, grid = prepared
             
             # 打开仓库
-            self.update_status("正在打开仓库")
-            if not self.open_stash.run():
-                self._handle_trade_fail("打开仓库失败")
-                return
-            time.sleep(self.config.stash_interval_ms / 1000)
-            self.trade_state = TradeState.STASH_OPENED
+            if not stash_opened:
+                self.update_status("正在打开仓库")
+                probe = self._arm_probe(STASH_REGION)
+                with self.tracer.span("打开仓库"):
+                    opened = self.open_stash.run()
+                if not opened:
+                    self._handle_trade_fail("打开仓库失败")
+                    return
+                if not self._wait_for_screen("等待仓库打开", probe, self.config.stash_interval_ms / 1000):
+                    self._handle_trade_fail(self._abort_reason())
+                    return
+            self.state_machine.transition(TradeState.STASH_OPENED)
 
             # 选择仓库标签页
-            if parsed_data.get("tab"):
+            if parsed_data.get("tab") and not tab_selected:
                 self.update_status(f"正在选择仓库标签页: {parsed_data['tab']}")
-                if not self.tab_select.run(tab_text=parsed_data["tab"]):
+                probe = self._arm_probe(STASH_REGION)
+                with self.tracer.span("选择标签页"):
+                    selected = self.tab_select.run(tab_text=parsed_data["tab"])
+                if not selected:
                     self._handle_trade_fail("选择仓库标签页失败")
                     return
-                time.sleep(0.5)  # 给一点时间让标签页切换完成
+                # 最多等待0.5秒让标签页切换完成
+                if not self._wait_for_screen("等待标签页切换", probe, 0.5):
+                    self._handle_trade_fail(self._abort_reason())
+                    return
 
             # 取出物品
+            inventory_probe = None
             if self.current_p1_num and self.current_p2_num:
                 self.update_status(f"正在取出物品位置: {self.current_p1_num}, {self.current_p2_num}")
-                if not self.take_out_item.run(p1_num=int(self.current_p1_num), p2_num=int(self.current_p2_num)):
+                inventory_probe = self._arm_probe(INVENTORY_REGION)
+                with self.tracer.span("取出物品"):
+                    taken = self.take_out_item.run(p1_num=int(self.current_p1_num), p2_num=int(self.current_p2_num), grid=grid)
+                if not taken:
                     self._handle_trade_fail("取出物品失败")
                     return
-                self.trade_state = TradeState.ITEMS_TAKEN
+                self.state_machine.transition(TradeState.ITEMS_TAKEN)
             else:
                 self.logger.warning("未提供物品位置信息，跳过取出物品步骤")
 
-            # 发起交易
-            time.sleep(self.config.trade_interval_ms / 1000)
+            # 发起交易，物品进入背包后立即继续
+            if not self._wait_for_screen("等待物品入包", inventory_probe, self.config.trade_interval_ms / 1000):
+                self._handle_trade_fail(self._abort_reason())
+                return
+            probe = self._arm_probe(STASH_REGION)
             self.press_esc()  # 先按ESC关闭可能打开的仓库
-            time.sleep(0.2)
+            if not self._wait_for_screen("等待仓库关闭", probe, 0.2):
+                self._handle_trade_fail(self._abort_reason())
+                return
             
-            self.game_command.run(command_text=f"/tradewith {self.current_user}")
-            self.update_status(f"已向 {self.current_user} 发起交易请求")
-            self.trade_state = TradeState.TRADE_REQUESTED
-
-            # 等待交易完成或超时
-            trade_request_time = time.time()
-            while time.time() - trade_request_time < self.config.trade_timeout_ms / 1000:
-                if self.trade_state in [TradeState.TRADE_COMPLETED, 
-                                      TradeState.TRADE_CANCELLED, 
-                                      TradeState.TRADE_FAILED]:
-                    break
-                time.sleep(0.1)
-
-            if self.trade_state != TradeState.TRADE_COMPLETED:
-                self._handle_trade_fail("交易请求超时")
+            # 先进入已发起交易状态，避免错过紧随命令出现的接受/完成日志
+            if not self.state_machine.transition(TradeState.TRADE_REQUESTED):
+                self._handle_trade_fail(self._abort_reason() or "交易状态异常")
                 return
+            with self.tracer.span("发起交易"):
+                self.game_command.run(command_text=f"/tradewith {self.current_user}")
+            self.update_status(f"已向 {self.current_user} 发起交易请求")
+
+            # 等待交易结果，对应日志解析后立即唤醒
+            final_state = self.state_machine.wait_for(
+                FINAL_STATES, self.config.trade_timeout_ms / 1000
+            )
+            if final_state == TradeState.TRADE_COMPLETED:
+                self._handle_trade_complete()
+            elif final_state == TradeState.TRADE_CANCELLED:
+                self._handle_trade_fail("交易被取消")
+            else:
+                self._handle_trade_fail(self._abort_reason() or "交易请求超时")
 
         except Exception as e:
+            self._cancel_stash_prep(prep)
             self.update_status(f"交易过程出错: {str(e)}")
             self.logger.error(f"Trade error: {str(e)}", exc_info=True)
             self._handle_trade_fail(str(e))
 
+    def _finish_stash_prep(self, prep):
+        """用户进入后收取仓库预备结果，计算节省的时间
+        
+        Returns:
+            tuple: (仓库已打开, 标签页已选择, 网格信息或None)，预备超时且后台线程未能停止时返回None
+        """
+        if not prep:
+            return False, False, None
+        
+        joined_at = time.monotonic()
+        # 交易锁仍被持有，预备步骤卡住（如首次加载OCR模型、截图无响应）时不能无限等待
+        if not prep.wait(self.config.stash_interval_ms / 1000 + STASH_PREP_GRACE):
+            self.logger.warning("仓库预备超时，取消预备")
+            # 后台线程退出前不能串行执行，否则两个线程的输入会交错
+            if not self._cancel_stash_prep(prep):
+                return None
+            self.logger.warning("仓库预备已停止，继续串行执行")
+            return False, False, None
+        blocked = time.monotonic() - joined_at
+        if prep.elapsed is not None:
+            self.tracer.add_span("仓库预备", prep.started_at, prep.finished_at)
+        
+        if prep.error:
+            self.logger.warning(f"仓库预备未完成({prep.error})，继续串行执行剩余步骤")
+        
+        # 节省的时间 = 预备步骤总耗时 - 用户进入后仍需等待预备完成的时间
+        if prep.ready:
+            self.current_time_saved = max(0.0, prep.elapsed - blocked)
+            self.update_status(f"仓库已预备，节省 {self.current_time_saved:.1f} 秒")
+        return prep.stash_opened, prep.tab_selected, prep.grid
+
+    def _cancel_stash_prep(self, prep):
+        """
+        取消仓库预备，后台线程退出后按ESC关闭已打开的仓库
+        :return: 后台线程是否已退出
+        """
+        if not prep:
+            return True
+        if not prep.cancel(timeout=STASH_PREP_CANCEL_TIMEOUT):
+            self.logger.warning("仓库预备线程未能及时退出")
+            return False
+        if prep.stash_opened:
+            self.press_esc()
+        return True
+
+    def _pause(self, seconds: float) -> bool:
+        """等待固定间隔，交易被中断时立即返回False"""
+        return self.state_machine.wait_for((), seconds) is None
+
+    def _arm_probe(self, region) -> Optional[ScreenChangeProbe]:
+        """操作前截取探测区域的基准画面，未启用画面确认或截图失败时返回None"""
+        if not self.config.visual_confirm:
+            return None
+        try:
+            probe = ScreenChangeProbe(get_frame_capture(), region)
+            return probe if probe.arm() else None
+        except Exception as e:
+            self.logger.warning(f"画面确认探针初始化失败，改为固定等待: {str(e)}")
+            return None
+
+    def _wait_for_screen(self, stage: str, probe: Optional[ScreenChangeProbe], timeout: float) -> bool:
+        """
+        等待画面确认界面已就绪，最长等待timeout秒（即原固定等待时间）
+        没有探针时退化为固定等待，交易被中断时返回False
+        """
+        if probe is None:
+            return self._pause(timeout)
+        with self.tracer.span(stage):
+            result = wait_until(
+                probe, timeout,
+                interval=self.config.visual_poll_ms / 1000,
+                should_abort=self.state_machine.is_failed,
+                sleep=self._pause
+            )
+        self.wait_stats.record(stage, result)
+        self.current_wait_saved += result.saved
+        return not result.aborted
+
+    def _abort_reason(self) -> Optional[str]:
+        """交易被外部中断（禁用、停止监控）时的原因"""
+        if self.state_machine.is_failed():
+            return self.state_machine.fail_reason
+        return None
+
+    def _handle_trade_complete(self):
+        """处理交易完成"""
+        duration = time.time() - self.trade_start_time
+        saved = f", 预备节省: {self.current_time_saved:.1f}秒" if self.current_time_saved is not None else ""
+        if self.current_wait_saved > 0:
+            saved += f", 画面确认节省: {self.current_wait_saved:.1f}秒"
+        self.update_status("交易完成")
+        self.add_history(
+            f"交易完成 - 用户: {self.current_user}, "
+            f"物品: {self.current_p1_num},{self.current_p2_num}, "
+            f"用时: {duration:.1f}秒{saved}"
+        )
+        self._end_trade("completed")
+        self._reset_trade()
+
     def _handle_trade_fail(self, reason: str):
         """处理交易失败"""
-        self.trade_state = TradeState.TRADE_FAILED
+        self.state_machine.fail(reason)
+        # 交易失败后允许买家重新发送相同的请求
+        if self.current_trade_key:
+            self.trade_dedup.discard(self.current_trade_key)
         if self.current_user:
             try:
                 self.game_command.run(command_text=f"/kick {self.current_user}")
@@ -310,55 +512,61 @@ class AutoTrade:
             f"物品: {self.current_p1_num},{self.current_p2_num}, "
             f"原因: {reason}"
         )
+        self._end_trade("failed", reason)
         self._reset_trade()
 
+    def _end_trade(self, outcome: str, reason: Optional[str] = None):
+        """结束耗时追踪，并把交易结果写入账本"""
+        trace = self.tracer.end_trade(outcome, reason)
+        if not self.ledger or not self.current_trade:
+            return
+        try:
+            self.ledger.record_trade(
+                self.current_trade_uid,
+                self.current_trade,
+                outcome,
+                started_at=self.trade_start_time,
+                reason=reason,
+                spans=trace['spans'] if trace else None,
+                time_saved=self.current_time_saved
+            )
+        except Exception as e:
+            self.logger.error(f"写入交易账本失败: {str(e)}")
+
     def _reset_trade(self):
         """重置交易状态"""
-        self.trade_state = TradeState.IDLE
+        self.state_machine.reset()
+        self.current_trade = None
+        self.current_trade_uid = None
         self.current_user = None
         self.current_p1_num = None
         self.current_p2_num = None
+        self.trade_matcher = None
         self.trade_start_time = None
+        self.trade_log_mark = None
+        self.current_trade_key = None
+        self.current_time_saved = None
+        self.current_wait_saved = 0.0
         self.update_status("等待新的交易请求")
 
     def _process_trade_log(self, log: str):
-        """处理交易相关的游戏日志"""
-        if not self.current_user:
+        """处理交易相关的游戏日志，匹配后立即推进状态机"""
+        matcher = self.trade_matcher
+        if not matcher:
             return
             
-        # 检查用户是否已进入区域
-        join_pattern = f".*{self.current_user} 進入了此區域。"
-        if re.match(join_pattern, log):
-            self.trade_state = TradeState.JOINED
-            self.update_status(f"用户 {self.current_user} 已进入区域")
-            return
-
-        # 检查交易是否被接受
-        accept_pattern = f".*{self.current_user} 已接受交易。"
-        if re.match(accept_pattern, log):
-            self.trade_state = TradeState.TRADE_ACCEPTED
-            self.update_status("对方已接受交易")
-            return
-
-        # 检查交易是否完成
-        complete_pattern = f".*與 {self.current_user} 的交易完成。"
-        if re.match(complete_pattern, log):
-            self.trade_state = TradeState.TRADE_COMPLETED
-            duration = time.time() - self.trade_start_time
-            self.update_status("交易完成")
-            self.add_history(
-                f"交易完成 - 用户: {self.current_user}, "
-                f"物品: {self.current_p1_num},{self.current_p2_num}, "
-                f"用时: {duration:.1f}秒"
-            )
-            self._reset_trade()
-            return
-
-        # 检查交易是否被取消
-        cancel_pattern = f".*交易取消。"
-        if re.match(cancel_pattern, log):
-            self._handle_trade_fail("交易被取消")
-            return
+        event = matcher.classify(log)
+        if event == TradeEvent.JOINED:
+            # 用户已进入区域
+            self._on_user_joined(log)
+        elif event == TradeEvent.ACCEPTED:
+            if self.state_machine.transition(TradeState.TRADE_ACCEPTED):
+                self.update_status("对方已接受交易")
+        elif event == TradeEvent.COMPLETED:
+            # 收尾由交易线程完成
+            self.state_machine.transition(TradeState.TRADE_COMPLETED)
+        elif event == TradeEvent.CANCELLED:
+            self.state_machine.transition(TradeState.TRADE_CANCELLED)
 
     def _parse_trade_message(self, message: str, template: str) -> Optional[dict]:
         """解析交易消息，提取关键信息"""
@@ -390,93 +598,63 @@ class AutoTrade:
             self.logger.error(f"Message parsing error: {str(e)}", exc_info=True)
             return None
 
-    def _wait_for_join(self, pattern: str, timeout_ms: int) -> bool:
-        """等待用户加入，使用临时日志触发器监测
+    def _wait_for_join(self, timeout_ms: int) -> bool:
+        """等待用户加入，临时日志触发器或日志处理匹配到进入区域后立即唤醒
         
         Args:
-            pattern: 用于匹配日志的模式
             timeout_ms: 超时时间（毫秒）
             
         Returns:
             bool: 用户是否成功加入
         """
-        # 确保日志监控器已设置
-        if not self.log_monitor:
-            self.logger.error("日志监控器未设置，无法添加临时触发器")
-            # 回退到原有的检查方式
-            return self._legacy_wait_for_join(pattern, timeout_ms)
-        
-        # 将通配符替换为正则表达式的通配符
-        regex_pattern = pattern.replace("*", ".*?")
-        
-        # 重置等待事件
-        self.join_event.clear()
-        self.join_result = False
-        
-        def on_user_join(log_line):
-            """用户加入区域的回调函数"""
-            self.logger.info(f"检测到用户进入: {log_line}")
-            self.join_result = True
-            self.join_event.set()  # 通知等待线程
-        
-        # 添加临时触发器
-        trigger_id = self.log_monitor.add_temp_trigger(
-            regex_pattern,
-            on_user_join,
-            timeout_ms
-        )
-            
-        if not trigger_id:
-            self.logger.error("添加临时触发器失败，回退到原有检查方式")
-            return self._legacy_wait_for_join(pattern, timeout_ms)
+        trigger_id = None
+        if self.log_monitor:
+            # 临时触发器在监控线程中同步匹配，比异步的日志处理更早触发
+            trigger_id = self.log_monitor.add_temp_trigger(
+                self.get_temp_trigger_pattern(),
+                self.handle_temp_trigger_match,
+                timeout_ms
+            )
+            if not trigger_id:
+                self.logger.error("添加临时触发器失败，仅依赖日志处理检测用户进入")
+        else:
+            self.logger.error("日志监控器未设置，仅依赖日志处理检测用户进入")
+            self._check_recent_join()
         
-        # 等待触发器被触发或超时
-        self.join_event.wait(timeout_ms / 1000 + 0.5)  # 额外添加0.5秒确保触发器超时处理完成
+        joined = self.state_machine.wait_for((TradeState.JOINED,), timeout_ms / 1000) == TradeState.JOINED
         
         # 无论结果如何，尝试移除触发器（可能已在触发或超时时被移除）
-        try:
-            self.log_monitor.remove_temp_trigger(trigger_id)
-        except:
-            pass
+        if trigger_id:
+            try:
+                self.log_monitor.remove_temp_trigger(trigger_id)
+            except:
+                pass
         
-        if self.join_result:
+        if joined:
             self.logger.info(f"用户 {self.current_user} 已成功进入区域")
         else:
             self.logger.warning(f"等待用户 {self.current_user} 进入超时")
         
-        return self.join_result
+        return joined
     
-    def _legacy_wait_for_join(self, pattern: str, timeout_ms: int) -> bool:
-        """原有的等待用户加入方法（备用）
-        
-        Args:
-            pattern: 匹配模式
-            timeout_ms: 超时时间（毫秒）
-            
-        Returns:
-            bool: 是否成功
-        """
-        self.logger.warning("使用备用方法等待用户进入")
-        start_time = time.time()
-        pattern = pattern.replace("*", ".*?")  # 将*转换为正则表达式的.*
-
-        while time.time() - start_time < timeout_ms / 1000:
-            # 检查最近的日志
-            for log in reversed(self.log_history):
-                if re.search(pattern, log['message']):
-                    return True
-            time.sleep(0.1)
+    def _check_recent_join(self):
+        """检查交易开始后已记录的日志中是否已有用户进入的消息"""
+        matcher = self.trade_matcher
+        found = self.log_history.latest_since(
+            self.trade_log_mark,
+            lambda line: matcher.matches(line, TradeEvent.JOINED)
+        )
+        if found:
+            self._on_user_joined(found[1])
 
-        return False
+    def _on_user_joined(self, log_line: str):
+        """用户进入区域，推进到已入组状态"""
+        if self.state_machine.transition(TradeState.JOINED, expected=(TradeState.INVITING,)):
+            self.logger.info(f"检测到用户进入: {log_line}")
 
     def press_esc(self):
         """模拟按下ESC键"""
-        VK_ESCAPE = 0x1B
-        # 按下ESC
-        win32api.keybd_event(VK_ESCAPE, 0, 0, 0)
-        time.sleep(0.1)  # 短暂延迟
-        # 释放ESC
-        win32api.keybd_event(VK_ESCAPE, 0, win32con.KEYEVENTF_KEYUP, 0)
+        get_platform().press_key(KEY_ESC)
 
     def handle_game_log(self, log: str):
         """处理游戏日志"""
@@ -498,7 +676,7 @@ class AutoTrade:
             self.logger.info(f"已加载 {len(self.trade_templates)} 个交易模板")
         
         self.enabled = True
-        self.trade_state = TradeState.IDLE
+        self.pending_trades.open()
         self.update_status("自动交易已启用")
         
         # 启动交易处理线程
@@ -510,24 +688,23 @@ class AutoTrade:
     def disable(self):
         """禁用自动交易"""
         self.enabled = False
+        self.pending_trades.clear()
+        
+        # 中断进行中的交易，交易线程被唤醒后负责收尾
+        if not self.state_machine.fail("自动交易已禁用"):
+            self.update_status("自动交易已禁用")
         
         # 停止交易处理线程
         self._stop_trade_thread()
-        
-        if self.current_user:
-            self._handle_trade_fail("自动交易已禁用")
-        else:
-            self.trade_state = TradeState.IDLE
-            self.update_status("自动交易已禁用")
             
         # 更新配置文件
         self._update_config_state(False)
 
     def stop_current_trade(self):
         """停止当前交易流程，但不改变自动交易功能的开启状态"""
-        if self.current_user:
-            self._handle_trade_fail("监控已停止")
-        self.trade_state = TradeState.IDLE
+        self.pending_trades.clear()
+        # 交易线程在等待中被立即唤醒并处理失败
+        self.state_machine.fail("监控已停止")
             
     def _update_config_state(self, enabled):
         """更新配置文件中的自动交易状态"""
@@ -574,12 +751,7 @@ class AutoTrade:
                 self.enabled = auto_trade_config.get('enabled', False)
                 
                 # 更新配置参数
-                self.config = TradeConfig(
-                    party_timeout_ms=auto_trade_config.get('party_timeout_ms', 30000),
-                    trade_timeout_ms=auto_trade_config.get('trade_timeout_ms', 10000),
-                    stash_interval_ms=auto_trade_config.get('stash_interval_ms', 1000),
-                    trade_interval_ms=auto_trade_config.get('trade_interval_ms', 1000)
-                )
+                self.set_config(TradeConfig.from_dict(auto_trade_config))
                 
                 # 加载交易模板
                 self._load_trade_templates()
@@ -607,6 +779,43 @@ class AutoTrade:
             self.logger.error(f"读取配置文件失败: {str(e)}")
             self.trade_templates = []
             
+    def get_dedup_stats(self):
+        """获取交易请求去重缓存的命中统计"""
+        return self.trade_dedup.get_stats()
+            
+    def get_latency_stats(self):
+        """获取各交易阶段最近样本的 p50/p90/p99 耗时（毫秒）"""
+        return self.tracer.get_percentiles()
+            
+    def get_wait_stats(self):
+        """获取画面确认等待的确认次数和节省时间统计"""
+        return self.wait_stats.get_stats()
+            
+    def get_capture_stats(self):
+        """获取共享截图服务的截图次数和缓存命中率"""
+        return get_frame_capture().get_stats()
+            
+    def get_scale_stats(self):
+        """获取模板匹配尺度记忆的命中率和节省时间统计"""
+        return get_scale_memory().get_stats()
+            
+    def get_roi_stats(self):
+        """获取仓库按钮和标签栏区域搜索的命中率和节省的搜索面积"""
+        return get_roi_memory().get_stats()
+            
+    def get_grid_stats(self):
+        """获取仓库网格缓存的校验次数和命中率"""
+        return self.take_out_item.grid_cache.get_stats()
+            
+    def get_queue_stats(self):
+        """获取待处理交易队列的深度和等待时间统计"""
+        return self.pending_trades.get_stats()
+            
+    def set_ledger(self, ledger):
+        """设置交易账本"""
+        self.ledger = ledger
+        return self
+            
     def set_log_monitor(self, log_monitor):
         """设置日志监控器引用
         
@@ -623,9 +832,9 @@ class AutoTrade:
         Returns:
             str: 匹配模式（正则表达式）
         """
-        if not self.current_user:
+        if not self.trade_matcher:
             return ""
-        return f".*{self.current_user} 進入了此區域。"
+        return self.trade_matcher.join_regex.pattern
     
     def handle_temp_trigger_match(self, log_line: str):
         """处理临时触发器匹配的回调函数
@@ -633,16 +842,14 @@ class AutoTrade:
         Args:
             log_line: 匹配的日志行
         """
-        self.logger.info(f"检测到用户进入: {log_line}")
-        self.join_result = True
-        self.join_event.set()  # 通知等待线程
+        self._on_user_joined(log_line)
 
     def _start_trade_thread(self):
         """启动交易处理线程"""
+        self.trade_thread_running = True
         if self.trade_thread is not None and self.trade_thread.is_alive():
             return  # 线程已经在运行
             
-        self.trade_thread_running = True
         self.trade_thread = threading.Thread(
             target=self._trade_worker,
             daemon=True
@@ -653,32 +860,25 @@ class AutoTrade:
     def _stop_trade_thread(self):
         """停止交易处理线程"""
         self.trade_thread_running = False
-        # 添加哨兵值确保线程能够退出
+        # 关闭队列唤醒等待中的线程
+        self.pending_trades.close()
         if self.trade_thread and self.trade_thread.is_alive():
-            self.trade_queue.put((None, None))
             self.trade_thread.join(timeout=2.0)
             self.logger.info("交易处理线程已停止")
     
     def _trade_worker(self):
-        """交易处理工作线程"""
+        """交易处理工作线程，上一笔交易结束后立即取出下一个请求"""
         self.logger.info("交易处理线程开始运行")
         while self.trade_thread_running:
             try:
-                # 从队列获取交易请求，设置超时以便能够响应停止信号
-                try:
-                    message, template = self.trade_queue.get(timeout=1.0)
-                    
-                    # 检查是否是停止信号
-                    if message is None and template is None:
-                        break
-                        
-                    # 处理交易请求
-                    self._process_trade_request(message, template)
-                    
-                except queue.Empty:
-                    # 队列为空，继续等待
+                # 阻塞等待优先级最高的请求，队列关闭时返回None
+                pending = self.pending_trades.pop(timeout=1.0)
+                if pending is None:
                     continue
                     
+                # 处理交易请求
+                self._process_trade_request(pending)
+                    
             except Exception as e:
                 self.logger.error(f"交易处理线程异常: {str(e)}", exc_info=True)
                 # 短暂暂停防止CPU占用过高
@@ -1,10 +1,13 @@
 import json
+import logging
 import os
 
 class Config:
     """配置管理类"""
     def __init__(self, config_file="config.json"):
         self.config_file = config_file
+        self.listeners = []  # 配置变更监听器
+        self.logger = logging.getLogger(self.__class__.__name__)
         self.config = {
             'interval': 1000,
             'push_interval': 0,
@@ -59,6 +62,7 @@ class Config:
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=2, ensure_ascii=False)
+            self.notify_listeners()
             return True, "配置保存成功"
         except Exception as e:
             return False, f"配置保存失败: {str(e)}"
@@ -81,6 +85,24 @@ class Config:
         if 'accounts' in new_config:
             self.save()
         
+    def add_listener(self, callback):
+        """添加配置变更监听器，配置保存后以Config实例为参数回调"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+            
+    def remove_listener(self, callback):
+        """移除配置变更监听器"""
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+            
+    def notify_listeners(self):
+        """通知所有监听器配置已变更，单个监听器出错不影响其他监听器"""
+        for callback in list(self.listeners):
+            try:
+                callback(self)
+            except Exception as e:
+                self.logger.exception(f"配置变更监听器执行失败: {str(e)}")
+        
     def get(self, key, default=None):
         """获取配置值"""
         return self.config.get(key, default)
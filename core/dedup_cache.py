@@ -0,0 +1,127 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# 归一化后每个字段的最大长度，限制单个键的内存占用
+MAX_FIELD_LENGTH = 64
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _normalize(value):
+    """归一化单个字段：去除首尾空白、合并连续空白、统一小写并截断"""
+    if value is None:
+        return ''
+    text = _WHITESPACE.sub(' ', str(value).strip()).casefold()
+    return text[:MAX_FIELD_LENGTH]
+
+
+def _normalize_price(value):
+    """归一化价格，1、1.0、1.00 视为同一价格"""
+    try:
+        return f"{float(value):g}"
+    except (TypeError, ValueError):
+        return _normalize(value)
+
+
+def make_trade_key(parsed_data):
+    """根据交易消息解析结果生成去重键 (用户, 物品, 价格, 仓库页, 位置)
+
+    Args:
+        parsed_data: 交易模板解析出的字段字典
+
+    Returns:
+        tuple: 去重键
+    """
+    return (
+        _normalize(parsed_data.get('user')),
+        _normalize(parsed_data.get('item')),
+        f"{_normalize_price(parsed_data.get('price'))} {_normalize(parsed_data.get('currency'))}".strip(),
+        _normalize(parsed_data.get('tab')),
+        f"{_normalize(parsed_data.get('p1_num'))},{_normalize(parsed_data.get('p2_num'))}"
+    )
+
+
+class DedupCache:
+    """带过期时间的有界LRU去重缓存"""
+
+    def __init__(self, ttl_seconds=60.0, max_entries=256, clock=None):
+        """初始化去重缓存
+
+        Args:
+            ttl_seconds: 记录的有效时间（秒），有效期内重复出现视为重复消息
+            max_entries: 最大记录数，超过时淘汰最久未使用的记录
+            clock: 时间函数，默认time.monotonic
+        """
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_entries = max(1, int(max_entries))
+        self.clock = clock or time.monotonic
+        self.entries = OrderedDict()  # {key: 首次出现时间}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def seen(self, key):
+        """检查键是否在有效期内出现过，未出现时记录该键
+
+        Returns:
+            bool: 是否为重复消息
+        """
+        now = self.clock()
+        with self.lock:
+            first_seen = self.entries.get(key)
+            if first_seen is not None:
+                if now - first_seen <= self.ttl_seconds:
+                    # 命中时只更新LRU顺序，不延长有效期，避免持续重发的请求永远被拦截
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True
+                del self.entries[key]
+                self.expirations += 1
+
+            self.misses += 1
+            self.entries[key] = now
+            self._evict(now)
+            return False
+
+    def discard(self, key):
+        """移除指定键，使下一次相同消息不再被视为重复"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.entries.clear()
+
+    def _evict(self, now):
+        """清理过期记录并把记录数限制在上限内（调用方需持有锁）"""
+        # 从最久未使用的一端清理过期记录
+        while self.entries:
+            key, first_seen = next(iter(self.entries.items()))
+            if now - first_seen <= self.ttl_seconds:
+                break
+            self.entries.popitem(last=False)
+            self.expirations += 1
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_stats(self):
+        """获取命中统计"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
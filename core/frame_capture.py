@@ -0,0 +1,212 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from typing import Optional
+
+import cv2
+
+from core.platforms.base import get_platform
+
+# 识别模块可以接受的截图时效（秒）：同一笔交易中刚截取且之后没有输入的画面可直接复用
+RECOGNITION_MAX_AGE = 0.5
+
+# 一帧窗口截图：BGR图像（只读，多个模块共享）、窗口区域、窗口句柄、截图时间
+Frame = namedtuple('Frame', ['image', 'rect', 'hwnd', 'time'])
+
+
+class FrameSource(ABC):
+    """截图来源：定位窗口并截取整个窗口"""
+
+    @abstractmethod
+    def locate(self):
+        """查找游戏窗口，返回窗口句柄，未找到返回None"""
+
+    @abstractmethod
+    def window_rect(self, hwnd):
+        """窗口在屏幕上的区域 (left, top, right, bottom)"""
+
+    @abstractmethod
+    def capture(self, rect):
+        """截取窗口区域，返回BGR格式的numpy数组"""
+
+    @property
+    def input_epoch(self):
+        """输入计数，注入输入后变化，截图缓存随之失效"""
+        return 0
+
+
+class PlatformFrameSource(FrameSource):
+    """通过平台层截取游戏窗口，窗口名称默认读取配置文件"""
+
+    def __init__(self, platform, window_name=None):
+        self.platform = platform
+        self.window_name = window_name
+
+    def locate(self):
+        from core.process_module import get_game_window_name
+        return self.platform.find_window(self.window_name or get_game_window_name())
+
+    def window_rect(self, hwnd):
+        return self.platform.get_window_rect(hwnd)
+
+    def capture(self, rect):
+        return self.platform.grab(rect)
+
+    @property
+    def input_epoch(self):
+        return self.platform.input_epoch
+
+
+class ArrayFrameSource(FrameSource):
+    """由图片文件或数组提供截图，用于测试和离线回放
+
+    frames按顺序提供，advance()切换到下一帧（模拟画面变化），最后一帧之后保持不变。
+    """
+
+    def __init__(self, frames, window_rect=None):
+        """
+        :param frames: 图片路径或BGR数组的列表
+        :param window_rect: 窗口区域，默认为 (0, 0, 宽, 高)
+        """
+        self.frames = list(frames)
+        self.index = 0
+        self.epoch = 0
+        self.rect = tuple(window_rect) if window_rect else None
+
+    def _image(self):
+        image = self.frames[self.index]
+        if isinstance(image, str):
+            loaded = cv2.imread(image)
+            if loaded is None:
+                raise FileNotFoundError(f"无法加载截图: {image}")
+            self.frames[self.index] = image = loaded
+        return image
+
+    def advance(self):
+        """切换到下一帧，同时视为发生了一次输入"""
+        self.index = min(self.index + 1, len(self.frames) - 1)
+        self.epoch += 1
+
+    def locate(self):
+        return 1 if self.frames else None
+
+    def window_rect(self, hwnd):
+        if self.rect is None:
+            height, width = self._image().shape[:2]
+            self.rect = (0, 0, width, height)
+        return self.rect
+
+    def capture(self, rect):
+        left, top = self.window_rect(1)[:2]
+        return self._image()[rect[1] - top:rect[3] - top, rect[0] - left:rect[2] - left]
+
+    @property
+    def input_epoch(self):
+        return self.epoch
+
+
+class FrameCapture:
+    """共享的窗口截图服务
+
+    持有游戏窗口句柄，按需截取整个窗口。调用方通过max_age声明可以接受的
+    截图时效：缓存的截图不超过max_age秒、且截图之后没有注入过输入时直接复用，
+    避免同一笔交易中各识别模块和画面确认探针重复截图。返回的图像为只读，
+    需要修改时先copy()。
+    """
+
+    def __init__(self, source: FrameSource, clock=None):
+        """
+        :param source: 截图来源
+        :param clock: 时间函数，默认time.monotonic
+        """
+        self.source = source
+        self.clock = clock or time.monotonic
+        self.lock = threading.Lock()
+        self.hwnd = None
+        self.frame = None
+        self.frame_epoch = None
+        self.requests = 0
+        self.hits = 0
+        self.captures = 0
+        self.capture_time = 0.0
+
+    def get_frame(self, max_age=0.0) -> Optional[Frame]:
+        """
+        获取游戏窗口截图
+        :param max_age: 可接受的缓存时效（秒），0表示总是重新截图
+        :return: Frame，找不到窗口时返回None
+        """
+        with self.lock:
+            self.requests += 1
+            epoch = self.source.input_epoch
+            frame = self.frame
+            if (frame is not None and max_age > 0 and self.frame_epoch == epoch
+                    and self.clock() - frame.time <= max_age):
+                self.hits += 1
+                return frame
+
+            if self.hwnd is None:
+                self.hwnd = self.source.locate()
+                if not self.hwnd:
+                    self.hwnd = None
+                    return None
+            try:
+                rect = tuple(self.source.window_rect(self.hwnd))
+                start = time.perf_counter()
+                image = self.source.capture(rect)
+            except Exception:
+                # 窗口句柄可能已失效，下次重新查找
+                self.hwnd = None
+                raise
+            self.capture_time += time.perf_counter() - start
+            self.captures += 1
+
+            image.flags.writeable = False
+            self.frame = Frame(image, rect, self.hwnd, self.clock())
+            self.frame_epoch = epoch
+            return self.frame
+
+    def invalidate(self, window=False):
+        """丢弃缓存的截图，window为True时同时重新查找窗口"""
+        with self.lock:
+            self.frame = None
+            if window:
+                self.hwnd = None
+
+    def get_stats(self):
+        """{requests, captures, hits, hit_rate, avg_capture_ms}"""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'captures': self.captures,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.requests, 3) if self.requests else 0.0,
+                'avg_capture_ms': round(self.capture_time * 1000 / self.captures, 2) if self.captures else 0.0
+            }
+
+
+_capture = None
+_capture_pinned = False
+_capture_lock = threading.Lock()
+
+
+def get_frame_capture() -> FrameCapture:
+    """获取共享截图服务，默认截取当前平台的游戏窗口，平台切换后重新创建"""
+    global _capture
+    with _capture_lock:
+        if _capture_pinned:
+            return _capture
+        platform = get_platform()
+        if _capture is None or getattr(_capture.source, 'platform', None) is not platform:
+            _capture = FrameCapture(PlatformFrameSource(platform))
+        return _capture
+
+
+def set_frame_capture(capture):
+    """设置共享截图服务（如使用ArrayFrameSource），传入None时恢复默认，返回之前的服务"""
+    global _capture, _capture_pinned
+    with _capture_lock:
+        previous, _capture = _capture, capture
+        _capture_pinned = capture is not None
+        return previous
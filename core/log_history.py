@@ -0,0 +1,125 @@
+import threading
+import time
+
+
+class LogHistory:
+    """固定容量的游戏日志环形缓冲区
+
+    时间戳与日志内容存放在预分配的数组中，按写入顺序单调递增，追加为O(1)，
+    过期日志在追加时从队头批量移除（均摊O(1)），按时间查询使用二分查找。
+    """
+
+    def __init__(self, capacity=4096, max_age=60, clock=None):
+        """
+        初始化日志缓冲区
+        :param capacity: 最多保留的日志条数，写满后覆盖最旧的日志
+        :param max_age: 日志保留时间（秒），为None时只按容量淘汰
+        :param clock: 单调时间函数，默认time.monotonic
+        """
+        self.capacity = max(1, int(capacity))
+        self.max_age = max_age
+        self.clock = clock or time.monotonic
+        self.lock = threading.Lock()
+
+        self.times = [0.0] * self.capacity
+        self.messages = [None] * self.capacity
+        self.head = 0   # 最旧日志的物理下标
+        self.size = 0
+        self.last_time = float('-inf')
+
+    def append(self, message, timestamp=None):
+        """追加一条日志，返回记录的时间戳"""
+        with self.lock:
+            now = self.clock() if timestamp is None else timestamp
+            # 保证时间索引单调，二分查找才成立
+            now = max(now, self.last_time)
+            self.last_time = now
+
+            if self.size == self.capacity:
+                # 已满，覆盖最旧的一条
+                self.times[self.head] = now
+                self.messages[self.head] = message
+                self.head = (self.head + 1) % self.capacity
+            else:
+                tail = (self.head + self.size) % self.capacity
+                self.times[tail] = now
+                self.messages[tail] = message
+                self.size += 1
+
+            self._expire(now)
+            return now
+
+    def _expire(self, now):
+        """从队头移除过期日志（调用方需持有锁）"""
+        if self.max_age is None:
+            return
+        cutoff = now - self.max_age
+        while self.size and self.times[self.head] <= cutoff:
+            self.messages[self.head] = None
+            self.head = (self.head + 1) % self.capacity
+            self.size -= 1
+
+    def _time_at(self, index):
+        """按逻辑下标（0为最旧）读取时间戳（调用方需持有锁）"""
+        return self.times[(self.head + index) % self.capacity]
+
+    def _first_index_since(self, since):
+        """二分查找第一条时间戳不早于since的逻辑下标（调用方需持有锁）"""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._time_at(mid) < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @staticmethod
+    def _matcher(pattern):
+        """把匹配条件统一为函数：None匹配全部，字符串按包含判断，正则对象使用search"""
+        if pattern is None:
+            return lambda message: True
+        if isinstance(pattern, str):
+            return lambda message: pattern in message
+        if hasattr(pattern, 'search'):
+            return lambda message: pattern.search(message) is not None
+        return pattern
+
+    def since(self, since, pattern=None):
+        """
+        获取指定时间之后（含）的日志
+        :param since: 起始时间戳（与clock同一时间基准）
+        :param pattern: 匹配条件，可以是子串、已编译的正则或函数
+        :return: [(timestamp, message)]，按时间从旧到新
+        """
+        match = self._matcher(pattern)
+        with self.lock:
+            result = []
+            for index in range(self._first_index_since(since), self.size):
+                physical = (self.head + index) % self.capacity
+                message = self.messages[physical]
+                if match(message):
+                    result.append((self.times[physical], message))
+            return result
+
+    def latest_since(self, since, pattern=None):
+        """从新到旧查找指定时间之后第一条匹配的日志，返回(timestamp, message)或None"""
+        match = self._matcher(pattern)
+        with self.lock:
+            start = self._first_index_since(since)
+            for index in range(self.size - 1, start - 1, -1):
+                physical = (self.head + index) % self.capacity
+                if match(self.messages[physical]):
+                    return self.times[physical], self.messages[physical]
+            return None
+
+    def clear(self):
+        """清空缓冲区"""
+        with self.lock:
+            self.messages = [None] * self.capacity
+            self.head = 0
+            self.size = 0
+
+    def __len__(self):
+        with self.lock:
+            return self.size
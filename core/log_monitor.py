@@ -5,15 +5,32 @@ import traceback
 import re
 from datetime import datetime
 from .file_utils import FileUtils
+from .push.dispatcher import PushDispatcher
+from .push.rate_limiter import PushRateLimiter, PRIORITY_TRADE, PRIORITY_MESSAGE
+from .dedup_cache import DedupCache, make_trade_key
 
 class LogMonitor:
     """日志监控核心类"""
-    def __init__(self, config, log_callback=None, stats_page=None):
+    def __init__(self, config, log_callback=None, stats_page=None, ledger=None):
         self.config = config
-        self.push_handlers = []  # 推送处理器列表
         self.handlers = []  # 其他处理器列表(如自动交易处理器)
         self.log_callback = log_callback or (lambda msg, level: None)
         self.stats_page = stats_page
+        self.ledger = ledger  # 交易账本，设置后统计数据由账本持久化，统计页定时查询
+        
+        # 推送分发器（按渠道限流和熔断，交易消息优先）
+        self.push_dispatcher = PushDispatcher.from_config(
+            config,
+            PushRateLimiter.from_config(config, self.log_callback),
+            self.log_callback
+        )
+        self.push_handlers = self.push_dispatcher.handlers  # 推送处理器列表
+        
+        # 重复交易消息去重缓存（买家短时间内重复发送相同的购买消息）
+        self.trade_dedup = DedupCache(
+            ttl_seconds=config.get('push_dedup_ttl_ms', 60000) / 1000,
+            max_entries=config.get('push_dedup_max_entries', 256)
+        )
         
         # 文件监控相关参数
         self.file_utils = FileUtils(self.log_callback)
@@ -39,6 +56,14 @@ class LogMonitor:
         """获取交易统计数据"""
         return self.trade_stats
         
+    def get_push_health(self):
+        """获取各推送渠道的熔断状态和健康度"""
+        return self.push_dispatcher.get_health()
+        
+    def get_dedup_stats(self):
+        """获取交易消息去重缓存的命中统计"""
+        return self.trade_dedup.get_stats()
+        
     def start(self):
         """开始监控"""
         if not self._validate_settings():
@@ -83,12 +108,14 @@ class LogMonitor:
         """停止监控"""
         self.monitoring = False
         self.stop_event.set()
+        if self.push_dispatcher.limiter:
+            self.push_dispatcher.limiter.flush()
         self.log_callback("监控已停止", "SYSTEM")
         
     def add_push_handler(self, handler):
         """添加推送处理器"""
         if handler:
-            self.push_handlers.append(handler)
+            self.push_dispatcher.add_handler(handler)
             self.log_callback("已添加推送处理器", "SYSTEM")
             
     def add_handler(self, handler):
@@ -100,19 +127,9 @@ class LogMonitor:
             self.handlers.append(handler)
             self.log_callback("已添加处理器", "SYSTEM")
             
-    def _send_push_message(self, title, content):
+    def _send_push_message(self, title, content, priority=PRIORITY_MESSAGE):
         """发送推送消息到所有处理器"""
-        results = []
-        for handler in self.push_handlers:
-            try:
-                result, msg = handler.send(title, content)
-                results.append(result)
-                if not result:
-                    self.log_callback(f"推送消息失败: {msg}", "ERROR")
-            except Exception as e:
-                self.log_callback(f"推送消息失败: {str(e)}", "ERROR")
-                results.append(False)
-        return any(results)  # 至少有一个推送成功就返回True
+        return self.push_dispatcher.dispatch(title, content, priority)
             
     def _validate_settings(self):
         """验证设置完整性"""
@@ -251,10 +268,8 @@ class LogMonitor:
                     # 捕获处理器异常，防止影响主循环
                     self.log_callback(f"处理器处理日志异常: {str(handler_error)}", "ERROR")
 
-        # 推送间隔检查
-        if push_interval > 0 and (current_time - self.last_push_time) < push_interval:
-            # 只跳过推送，不影响日志处理
-            return
+        # 推送间隔检查，只限制消息模式推送，交易模式消息不受影响
+        message_throttled = push_interval > 0 and (current_time - self.last_push_time) < push_interval
             
         # 处理推送和关键词匹配
         for line in lines:
@@ -271,7 +286,7 @@ class LogMonitor:
                     mode = kw.get('mode', '消息模式')
                     
                     # 消息模式匹配
-                    if mode == '消息模式' and self._match_message_mode(pattern, line):
+                    if mode == '消息模式' and not message_throttled and self._match_message_mode(pattern, line):
                         # 记录消息模式匹配日志
                         log_msg = (
                             f"[消息模式]关键词触发\n"
@@ -280,7 +295,7 @@ class LogMonitor:
                         )
                         self.log_callback(log_msg, "INFO")
                         
-                        self._send_push_message(pattern, line)
+                        self._send_push_message(pattern, line, PRIORITY_MESSAGE)
                         self.last_push_time = time.time() * 1000
                     
                     # 交易模式匹配
@@ -306,9 +321,22 @@ class LogMonitor:
                                         daemon=True
                                     ).start()
 
-                            self._send_push_message(pattern, line)
+                            # 重复的交易消息不再推送和计入统计
+                            if self.trade_dedup.seen(make_trade_key(match_result)):
+                                self.log_callback(f"重复的交易消息，已跳过推送: {match_result.get('user')}", "TRADE")
+                                continue
+
+                            self._send_push_message(pattern, line, PRIORITY_TRADE)
                             self.last_push_time = time.time() * 1000
                             
+                            # 写入交易账本（后台线程批量提交，不阻塞监控线程）
+                            if self.ledger:
+                                try:
+                                    self.ledger.record_request(match_result)
+                                except Exception as ledger_error:
+                                    self.log_callback(f"写入交易账本异常: {str(ledger_error)}", "ERROR")
+                                continue
+
                             # 更新交易统计
                             if self.stats_page:
                                 try:
@@ -0,0 +1,165 @@
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from core.platforms.macro import (
+    KEY_ENTER, KEY_CTRL, KEY_ESC,
+    INPUT_KEY_DOWN, INPUT_KEY_UP, INPUT_MOUSE_DOWN, INPUT_MOUSE_UP, INPUT_MOVE,
+    InputTiming, InputStats, load_input_timing,
+    key_macro, hotkey_macro, click_macro, double_click_macro
+)
+
+_platform = None
+_platform_lock = threading.Lock()
+
+
+class Platform(ABC):
+    """平台抽象层：键鼠输入、窗口、截图和剪贴板
+
+    流程模块只通过该接口操作游戏，Windows下使用Win32Platform驱动真实游戏，
+    测试和离线基准使用SimulationPlatform回放脚本化的日志和截图。
+    键鼠操作编译为InputMacro后按批次注入，input_stats记录每个动作的注入耗时。
+    """
+
+    def __init__(self, timing=None):
+        """
+        :param timing: 输入宏的等待时间，默认使用InputTiming的默认值
+        """
+        self.timing = timing or InputTiming()
+        self.input_stats = InputStats()
+        self.input_epoch = 0  # 每次注入输入后加1，截图缓存据此判断画面是否可能已变化
+
+    # ---------- 窗口 ----------
+
+    @abstractmethod
+    def find_window(self, title):
+        """按标题查找窗口，未找到返回None"""
+
+    @abstractmethod
+    def get_window_rect(self, handle):
+        """窗口在屏幕上的区域 (left, top, right, bottom)"""
+
+    @abstractmethod
+    def activate_window(self, title):
+        """把窗口切换到前台，返回是否成功"""
+
+    # ---------- 截图 ----------
+
+    @abstractmethod
+    def grab(self, rect):
+        """截取屏幕区域，返回BGR格式的numpy数组"""
+
+    def grab_window(self, handle):
+        """截取整个窗口"""
+        return self.grab(self.get_window_rect(handle))
+
+    # ---------- 输入 ----------
+
+    @abstractmethod
+    def key_down(self, key):
+        """按下按键"""
+
+    @abstractmethod
+    def key_up(self, key):
+        """释放按键"""
+
+    @abstractmethod
+    def mouse_down(self):
+        """按下鼠标左键"""
+
+    @abstractmethod
+    def mouse_up(self):
+        """释放鼠标左键"""
+
+    @abstractmethod
+    def get_cursor_pos(self):
+        """鼠标的屏幕坐标"""
+
+    @abstractmethod
+    def set_cursor_pos(self, pos):
+        """移动鼠标到屏幕坐标"""
+
+    def sleep(self, seconds):
+        """输入之间的等待"""
+        time.sleep(seconds)
+
+    def send_inputs(self, events):
+        """
+        注入一批输入事件（InputEvent序列），事件之间不等待
+        默认逐个调用单个输入方法，支持批量注入的平台应重写为一次系统调用
+        """
+        for kind, value in events:
+            if kind == INPUT_KEY_DOWN:
+                self.key_down(value)
+            elif kind == INPUT_KEY_UP:
+                self.key_up(value)
+            elif kind == INPUT_MOUSE_DOWN:
+                self.mouse_down()
+            elif kind == INPUT_MOUSE_UP:
+                self.mouse_up()
+            elif kind == INPUT_MOVE:
+                self.set_cursor_pos(value)
+            else:
+                raise ValueError(f"未知的输入事件: {kind}")
+
+    def run_macro(self, macro):
+        """按批次注入输入宏，批次之间按宏中的等待时间等待，返回注入耗时（秒）"""
+        batches = macro.compile()
+        start = time.perf_counter()
+        for events, delay in batches:
+            if events:
+                self.send_inputs(events)
+            if delay > 0:
+                self.sleep(delay)
+        elapsed = time.perf_counter() - start
+        self.input_epoch += 1
+        self.input_stats.record(macro.name, macro.event_count(), len(batches), elapsed)
+        return elapsed
+
+    def press_key(self, key, hold=None):
+        """按下并释放按键，hold为None时使用timing.key_hold"""
+        return self.run_macro(key_macro(key, self.timing, hold))
+
+    def hotkey(self, modifier, key):
+        """组合键，如 Ctrl+V"""
+        return self.run_macro(hotkey_macro(modifier, key, self.timing))
+
+    def click(self, pos=None, hold=None):
+        """在指定屏幕坐标（为None时在当前位置）单击左键"""
+        return self.run_macro(click_macro(pos, self.timing, hold))
+
+    def double_click(self, pos, restore_cursor=True):
+        """在指定屏幕坐标双击左键，默认完成后恢复鼠标位置"""
+        old_pos = self.get_cursor_pos() if restore_cursor else None
+        return self.run_macro(double_click_macro(pos, self.timing, old_pos))
+
+    def get_input_stats(self):
+        """各输入动作的注入次数和耗时统计"""
+        return self.input_stats.get_stats()
+
+    # ---------- 剪贴板 ----------
+
+    @abstractmethod
+    def set_clipboard_text(self, text):
+        """设置剪贴板文本"""
+
+
+def get_platform() -> Platform:
+    """获取当前平台，未设置时在Windows下创建Win32Platform"""
+    global _platform
+    with _platform_lock:
+        if _platform is None:
+            if sys.platform != 'win32':
+                raise RuntimeError("当前系统没有默认平台实现，请先调用set_platform()设置（如SimulationPlatform）")
+            from core.platforms.win32 import Win32Platform
+            _platform = Win32Platform(timing=load_input_timing())
+        return _platform
+
+
+def set_platform(platform):
+    """设置当前平台，传入None时恢复默认，返回之前的平台"""
+    global _platform
+    with _platform_lock:
+        previous, _platform = _platform, platform
+        return previous
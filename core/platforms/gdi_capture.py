@@ -0,0 +1,174 @@
+import ctypes
+import threading
+from ctypes import Structure, POINTER, byref, c_void_p, c_uint8, c_uint16, c_uint32, c_int32
+
+import cv2
+import numpy as np
+
+SRCCOPY = 0x00CC0020
+CAPTUREBLT = 0x40000000
+BI_RGB = 0
+DIB_RGB_COLORS = 0
+
+
+class BITMAPINFOHEADER(Structure):
+    _fields_ = [
+        ("biSize", c_uint32),
+        ("biWidth", c_int32),
+        ("biHeight", c_int32),
+        ("biPlanes", c_uint16),
+        ("biBitCount", c_uint16),
+        ("biCompression", c_uint32),
+        ("biSizeImage", c_uint32),
+        ("biXPelsPerMeter", c_int32),
+        ("biYPelsPerMeter", c_int32),
+        ("biClrUsed", c_uint32),
+        ("biClrImportant", c_uint32)
+    ]
+
+class BITMAPINFO(Structure):
+    _fields_ = [
+        ("bmiHeader", BITMAPINFOHEADER),
+        ("bmiColors", c_uint32 * 3)
+    ]
+
+
+def bgrx_view(buffer, width, height, stride=None):
+    """
+    把32位BGRX像素缓冲区包装为 (height, width, 4) 的numpy视图，不复制数据
+    :param buffer: 支持缓冲区协议的对象（bytearray、ctypes数组、numpy数组等）
+    :param width: 图像宽度
+    :param height: 图像高度
+    :param stride: 每行字节数，默认 width * 4
+    """
+    stride = stride or width * 4
+    if stride < width * 4 or stride % 4:
+        raise ValueError(f"无效的行字节数: {stride}")
+    pixels = np.frombuffer(buffer, dtype=np.uint8, count=stride * height)
+    return pixels.reshape(height, stride // 4, 4)[:, :width]
+
+
+def bgrx_to_bgr(view, out=None):
+    """
+    BGRX视图转换为连续的BGR图像，只复制一次
+    :param view: bgrx_view()返回的视图
+    :param out: 可选的输出数组 (height, width, 3)，传入时直接写入并返回
+    """
+    if out is None:
+        return cv2.cvtColor(view, cv2.COLOR_BGRA2BGR)
+    return cv2.cvtColor(view, cv2.COLOR_BGRA2BGR, dst=out)
+
+
+class GdiCapture:
+    """复用GDI对象的屏幕截图
+
+    屏幕DC、内存DC和当前分辨率的自顶向下32位DIB section在首次使用时创建并保留，
+    截图尺寸变化时才重建DIB section。
+    BitBlt直接写入DIB section的像素内存，capture()返回该内存上的numpy视图，
+    中间没有GetBitmapBits/PIL的整帧复制。视图在下一次同尺寸截图时会被覆盖，
+    需要保留时调用grab()得到独立的BGR图像。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.screen_dc = None
+        self.memory_dc = None
+        self.bitmap = None
+        self.old_bitmap = None
+        self.size = None
+        self.view = None
+        self.allocations = 0  # 创建DIB section的次数
+        self._api = None
+
+    def _load_api(self):
+        """加载并声明用到的user32/gdi32函数（64位下句柄需要c_void_p）"""
+        if self._api is None:
+            user32 = ctypes.windll.user32
+            gdi32 = ctypes.windll.gdi32
+            user32.GetDC.restype = c_void_p
+            user32.GetDC.argtypes = [c_void_p]
+            user32.ReleaseDC.argtypes = [c_void_p, c_void_p]
+            gdi32.CreateCompatibleDC.restype = c_void_p
+            gdi32.CreateCompatibleDC.argtypes = [c_void_p]
+            gdi32.CreateDIBSection.restype = c_void_p
+            gdi32.CreateDIBSection.argtypes = [c_void_p, POINTER(BITMAPINFO), c_uint32,
+                                               POINTER(c_void_p), c_void_p, c_uint32]
+            gdi32.SelectObject.restype = c_void_p
+            gdi32.SelectObject.argtypes = [c_void_p, c_void_p]
+            gdi32.BitBlt.argtypes = [c_void_p, c_int32, c_int32, c_int32, c_int32,
+                                     c_void_p, c_int32, c_int32, c_uint32]
+            gdi32.DeleteObject.argtypes = [c_void_p]
+            gdi32.DeleteDC.argtypes = [c_void_p]
+            self._api = (user32, gdi32)
+        return self._api
+
+    def _ensure_bitmap(self, width, height):
+        """按需创建设备上下文和当前尺寸的DIB section"""
+        user32, gdi32 = self._load_api()
+        if self.screen_dc is None:
+            self.screen_dc = user32.GetDC(None)
+            self.memory_dc = gdi32.CreateCompatibleDC(self.screen_dc)
+        if self.size == (width, height):
+            return
+
+        self._release_bitmap()
+        info = BITMAPINFO()
+        info.bmiHeader.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        info.bmiHeader.biWidth = width
+        info.bmiHeader.biHeight = -height  # 负数表示自顶向下，与numpy的行顺序一致
+        info.bmiHeader.biPlanes = 1
+        info.bmiHeader.biBitCount = 32
+        info.bmiHeader.biCompression = BI_RGB
+        bits = c_void_p()
+        bitmap = gdi32.CreateDIBSection(self.memory_dc, byref(info), DIB_RGB_COLORS, byref(bits), None, 0)
+        if not bitmap or not bits.value:
+            raise OSError(f"创建 {width}x{height} 截图缓冲区失败")
+
+        self.bitmap = bitmap
+        self.old_bitmap = gdi32.SelectObject(self.memory_dc, bitmap)
+        buffer = (c_uint8 * (width * height * 4)).from_address(bits.value)
+        self.view = bgrx_view(buffer, width, height)
+        self.size = (width, height)
+        self.allocations += 1
+
+    def _blit(self, rect):
+        """把屏幕区域复制到DIB section，调用方需持有锁"""
+        width = rect[2] - rect[0]
+        height = rect[3] - rect[1]
+        self._ensure_bitmap(width, height)
+        _, gdi32 = self._api
+        if not gdi32.BitBlt(self.memory_dc, 0, 0, width, height,
+                            self.screen_dc, rect[0], rect[1], SRCCOPY | CAPTUREBLT):
+            raise OSError("BitBlt截图失败")
+        gdi32.GdiFlush()
+        return self.view
+
+    def capture(self, rect):
+        """截取屏幕区域，返回 (height, width, 4) 的BGRX视图（下一次截图前有效）"""
+        with self.lock:
+            return self._blit(rect)
+
+    def grab(self, rect, out=None):
+        """截取屏幕区域，返回独立的BGR图像（唯一的一次整帧复制）"""
+        with self.lock:
+            return bgrx_to_bgr(self._blit(rect), out)
+
+    def _release_bitmap(self):
+        if self.bitmap is not None:
+            _, gdi32 = self._api
+            gdi32.SelectObject(self.memory_dc, self.old_bitmap)
+            gdi32.DeleteObject(self.bitmap)
+        self.bitmap = self.old_bitmap = self.view = self.size = None
+
+    def close(self):
+        """释放GDI对象"""
+        with self.lock:
+            if self._api is None:
+                return
+            self._release_bitmap()
+            user32, gdi32 = self._api
+            if self.memory_dc is not None:
+                gdi32.DeleteDC(self.memory_dc)
+            if self.screen_dc is not None:
+                user32.ReleaseDC(None, self.screen_dc)
+            self.memory_dc = self.screen_dc = None
@@ -0,0 +1,207 @@
+import json
+import threading
+from collections import namedtuple
+from dataclasses import dataclass, fields
+
+# 与平台无关的按键名称，单个字符表示对应的字母/数字键
+KEY_ENTER = 'enter'
+KEY_CTRL = 'ctrl'
+KEY_ESC = 'esc'
+
+# 输入事件类型
+INPUT_KEY_DOWN = 'key_down'
+INPUT_KEY_UP = 'key_up'
+INPUT_MOUSE_DOWN = 'mouse_down'
+INPUT_MOUSE_UP = 'mouse_up'
+INPUT_MOVE = 'move'
+
+# 一个输入事件，value为按键名称或屏幕坐标
+InputEvent = namedtuple('InputEvent', ['kind', 'value'])
+
+
+@dataclass
+class InputTiming:
+    """输入宏中的等待时间（秒）
+
+    为0的等待不会拆分批次，前后的输入在同一次批量发送中注入。
+    按键和点击默认保持按下一帧以上，每帧轮询一次输入的游戏才不会漏掉同一批次内的按下和释放。
+    """
+    key_hold: float = 0.02      # 按键按下到释放
+    click_hold: float = 0.02    # 鼠标按下到释放
+    chat_open: float = 0.03     # 回车打开聊天框到粘贴
+    paste: float = 0.03         # 粘贴到回车提交
+    modifier: float = 0.03      # 按下修饰键到点击、点击到释放修饰键
+    move: float = 0.02          # 移动鼠标到按下，让游戏更新悬停目标
+    double_click: float = 0.05  # 双击的两次单击之间
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'InputTiming':
+        """从配置字典创建，单位为毫秒，忽略未知的键"""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key[:-3]: value / 1000 for key, value in (data or {}).items()
+                      if key.endswith('_ms') and key[:-3] in names})
+
+
+def load_input_timing(path='config.json') -> InputTiming:
+    """从配置文件auto_trade节点下的input_timing读取输入等待时间，读取失败时使用默认值"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return InputTiming.from_dict(json.load(f).get('auto_trade', {}).get('input_timing'))
+    except Exception:
+        return InputTiming()
+
+
+class InputMacro:
+    """输入宏：按顺序记录的输入事件和等待
+
+    compile()把相邻的、中间没有等待的事件合并为一批，平台一次性注入整批事件，
+    批次之间按等待时间sleep，避免每个事件之后的固定等待。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.steps = []  # InputEvent 或 等待秒数
+
+    def key_down(self, key):
+        self.steps.append(InputEvent(INPUT_KEY_DOWN, key))
+        return self
+
+    def key_up(self, key):
+        self.steps.append(InputEvent(INPUT_KEY_UP, key))
+        return self
+
+    def move(self, pos):
+        self.steps.append(InputEvent(INPUT_MOVE, (int(pos[0]), int(pos[1]))))
+        return self
+
+    def mouse_down(self):
+        self.steps.append(InputEvent(INPUT_MOUSE_DOWN, None))
+        return self
+
+    def mouse_up(self):
+        self.steps.append(InputEvent(INPUT_MOUSE_UP, None))
+        return self
+
+    def pause(self, seconds):
+        if seconds > 0:
+            self.steps.append(seconds)
+        return self
+
+    def tap(self, key, hold=0.0):
+        """按下并释放按键"""
+        return self.key_down(key).pause(hold).key_up(key)
+
+    def click(self, hold=0.0):
+        """在当前位置单击左键"""
+        return self.mouse_down().pause(hold).mouse_up()
+
+    def compile(self):
+        """
+        编译为批次列表 [(事件元组, 之后的等待秒数)]
+        连续的等待合并，开头的等待保留为一个空批次
+        """
+        batches = []
+        events = []
+        for step in self.steps:
+            if isinstance(step, InputEvent):
+                events.append(step)
+            elif events or not batches:
+                batches.append([tuple(events), step])
+                events = []
+            else:
+                batches[-1][1] += step
+        if events:
+            batches.append([tuple(events), 0.0])
+        return [(events, delay) for events, delay in batches]
+
+    def event_count(self):
+        return sum(1 for step in self.steps if isinstance(step, InputEvent))
+
+    def total_delay(self):
+        """宏中等待时间的总和（秒）"""
+        return sum(step for step in self.steps if not isinstance(step, InputEvent))
+
+
+def key_macro(key, timing: InputTiming, hold=None) -> InputMacro:
+    """单个按键"""
+    return InputMacro("按键").tap(key, timing.key_hold if hold is None else hold)
+
+
+def hotkey_macro(modifier, key, timing: InputTiming) -> InputMacro:
+    """组合键，如 Ctrl+V"""
+    return (InputMacro("组合键")
+            .key_down(modifier).tap(key, timing.key_hold).key_up(modifier))
+
+
+def chat_command_macro(timing: InputTiming) -> InputMacro:
+    """回车打开聊天框 - Ctrl+V粘贴剪贴板中的命令 - 回车提交"""
+    return (InputMacro("聊天命令")
+            .tap(KEY_ENTER, timing.key_hold).pause(timing.chat_open)
+            .key_down(KEY_CTRL).tap('v', timing.key_hold).key_up(KEY_CTRL).pause(timing.paste)
+            .tap(KEY_ENTER, timing.key_hold))
+
+
+def click_macro(pos, timing: InputTiming, hold=None) -> InputMacro:
+    """移动到屏幕坐标并单击，pos为None时在当前位置单击"""
+    macro = InputMacro("单击")
+    if pos is not None:
+        macro.move(pos).pause(timing.move)
+    return macro.click(timing.click_hold if hold is None else hold)
+
+
+def ctrl_click_macro(pos, timing: InputTiming) -> InputMacro:
+    """按住Ctrl在屏幕坐标单击（把仓库物品移入背包）"""
+    return (InputMacro("Ctrl点击")
+            .key_down(KEY_CTRL).move(pos).pause(max(timing.modifier, timing.move))
+            .click(timing.click_hold).pause(timing.modifier)
+            .key_up(KEY_CTRL))
+
+
+def double_click_macro(pos, timing: InputTiming, restore_pos=None) -> InputMacro:
+    """在屏幕坐标双击，restore_pos不为None时完成后把鼠标移回"""
+    macro = (InputMacro("双击")
+             .move(pos).pause(timing.move)
+             .click(timing.click_hold).pause(timing.double_click)
+             .click(timing.click_hold))
+    if restore_pos is not None:
+        macro.move(restore_pos)
+    return macro
+
+
+class InputStats:
+    """各输入动作的注入次数、事件数、批次数和注入耗时统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.actions = {}
+
+    def record(self, name, events, batches, elapsed):
+        """记录一次宏执行，elapsed为从第一批注入到最后一批完成的时间（秒）"""
+        with self.lock:
+            stats = self.actions.setdefault(name, {
+                'count': 0, 'events': 0, 'batches': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            stats['count'] += 1
+            stats['events'] += events
+            stats['batches'] += batches
+            stats['total_ms'] += elapsed * 1000
+            stats['max_ms'] = max(stats['max_ms'], elapsed * 1000)
+
+    def get_stats(self):
+        """{动作: {count, events, batches, avg_ms, max_ms, total_ms}}"""
+        with self.lock:
+            return {
+                name: {
+                    'count': stats['count'],
+                    'events': stats['events'],
+                    'batches': stats['batches'],
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 2),
+                    'max_ms': round(stats['max_ms'], 2),
+                    'total_ms': round(stats['total_ms'], 2)
+                }
+                for name, stats in self.actions.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.actions.clear()
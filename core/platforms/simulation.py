@@ -0,0 +1,286 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from core.platforms.base import Platform, KEY_ENTER, KEY_CTRL
+
+DEFAULT_WINDOW_TITLE = 'Path of Exile 2'
+
+# 仿真平台记录的一次输入/输出事件
+SimEvent = namedtuple('SimEvent', ['time', 'kind', 'detail'])
+
+RULE_COMMAND = 'command'  # 在聊天框提交命令
+RULE_CLICK = 'click'      # 鼠标左键单击
+RULE_KEY = 'key'          # 按下按键
+
+
+@dataclass
+class SimRule:
+    """仿真脚本规则：某个输入发生时输出日志行并/或切换截图
+
+    command规则的match为正则，命名分组可在日志行中以 {名称} 引用；
+    click规则按当前截图screen和窗口坐标区域region(x1, y1, x2, y2)匹配，
+    modifiers为点击时必须按住的按键；key规则的match为按键名称。
+    """
+    on: str
+    match: Optional[str] = None
+    screen: Optional[str] = None
+    region: Optional[tuple] = None
+    modifiers: tuple = ()
+    logs: list = field(default_factory=list)  # [(延迟秒数, 日志行)]
+    goto: Optional[str] = None
+    once: bool = False
+    fired: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SimRule':
+        """从场景文件中的规则字典创建"""
+        return cls(
+            on=data['on'],
+            match=data.get('match'),
+            screen=data.get('screen'),
+            region=tuple(data['region']) if data.get('region') else None,
+            modifiers=tuple(data.get('modifiers', ())),
+            logs=[tuple(item) for item in data.get('logs', [])],
+            goto=data.get('goto'),
+            once=data.get('once', False)
+        )
+
+
+class SimulationPlatform(Platform):
+    """无界面的确定性仿真平台
+
+    按脚本规则模拟游戏对输入的反应：聊天框提交的命令、点击和按键会触发
+    脚本化的游戏日志（交给log_sink，通常是AutoTrade.handle_game_log）并切换
+    当前截图，截图来自录制的图片文件或内存中的数组。所有输入都记录在events中，
+    便于断言和离线基准测试。time_scale为0时不真正等待，日志同步输出，
+    同一脚本每次运行的事件顺序完全一致。
+    """
+
+    def __init__(self, window_title=DEFAULT_WINDOW_TITLE, window_rect=(0, 0, 1280, 720),
+                 screens=None, initial_screen=None, rules=None, log_sink=None,
+                 time_scale=0.0, clock=None):
+        """
+        初始化仿真平台
+        :param window_title: 仿真游戏窗口标题
+        :param window_rect: 窗口在屏幕上的区域 (left, top, right, bottom)
+        :param screens: {名称: 图片路径或BGR数组}
+        :param initial_screen: 初始截图名称
+        :param rules: SimRule列表
+        :param log_sink: 接收游戏日志行的函数
+        :param time_scale: 等待时间和日志延迟的缩放比例，0表示不等待
+        :param clock: 时间函数，默认time.monotonic
+        """
+        super().__init__()
+        self.window_title = window_title
+        self.window_rect = tuple(window_rect)
+        self.screens = dict(screens or {})
+        self.screen = initial_screen
+        self.rules = list(rules or [])
+        self.log_sink = log_sink
+        self.time_scale = time_scale
+        self.clock = clock or time.monotonic
+        self.lock = threading.RLock()
+
+        self.events = []
+        self.logs = []  # 已输出的日志行
+        self.clipboard = ''
+        self.cursor = (0, 0)
+        self.keys_down = set()
+        self.chat_open = False
+        self.chat_text = ''
+        self.timers = []
+
+    @classmethod
+    def from_scenario(cls, path, log_sink=None, time_scale=0.0, clock=None) -> 'SimulationPlatform':
+        """
+        从JSON场景文件创建，截图路径相对于场景文件所在目录
+        格式: {"window": {"title", "rect"}, "screens": {名称: 路径}, "initial_screen", "rules": [...]}
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            scenario = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        window = scenario.get('window', {})
+        screens = {
+            name: image if os.path.isabs(image) else os.path.join(base_dir, image)
+            for name, image in scenario.get('screens', {}).items()
+        }
+        return cls(
+            window_title=window.get('title', DEFAULT_WINDOW_TITLE),
+            window_rect=window.get('rect', (0, 0, 1280, 720)),
+            screens=screens,
+            initial_screen=scenario.get('initial_screen'),
+            rules=[SimRule.from_dict(rule) for rule in scenario.get('rules', [])],
+            log_sink=log_sink,
+            time_scale=time_scale,
+            clock=clock
+        )
+
+    # ---------- 事件与日志 ----------
+
+    def _record(self, kind, detail=None):
+        """记录一次事件"""
+        with self.lock:
+            self.events.append(SimEvent(self.clock(), kind, detail))
+
+    def events_of(self, kind):
+        """某类事件的详情列表"""
+        with self.lock:
+            return [event.detail for event in self.events if event.kind == kind]
+
+    def emit_log(self, line):
+        """立即输出一行游戏日志"""
+        with self.lock:
+            self.logs.append(line)
+        self._record('log', line)
+        if self.log_sink:
+            self.log_sink(line)
+
+    def _emit_logs(self, logs, context):
+        """按规则输出日志，缩放后的延迟为0时同步输出"""
+        for delay, line in logs:
+            text = line.format(**context)
+            delay = delay * self.time_scale
+            if delay <= 0:
+                self.emit_log(text)
+            else:
+                timer = threading.Timer(delay, self.emit_log, args=(text,))
+                timer.daemon = True
+                self.timers.append(timer)
+                timer.start()
+
+    def _fire(self, kind, detail=None, key=None):
+        """查找并执行匹配的规则，规则按事件发生时的截图匹配"""
+        screen = self.screen
+        for rule in self.rules:
+            if rule.on != kind or (rule.once and rule.fired):
+                continue
+            if rule.screen and rule.screen != screen:
+                continue
+
+            context = {}
+            if kind == RULE_COMMAND:
+                match = re.search(rule.match, detail) if rule.match else None
+                if rule.match and not match:
+                    continue
+                context = match.groupdict() if match else {}
+            elif kind == RULE_CLICK:
+                if rule.region:
+                    x1, y1, x2, y2 = rule.region
+                    if not (x1 <= detail[0] < x2 and y1 <= detail[1] < y2):
+                        continue
+                if any(modifier not in self.keys_down for modifier in rule.modifiers):
+                    continue
+            elif kind == RULE_KEY:
+                if rule.match and rule.match != key:
+                    continue
+
+            rule.fired += 1
+            if rule.goto:
+                self.screen = rule.goto
+                self._record('screen', rule.goto)
+            self._emit_logs(rule.logs, context)
+
+    def cancel_pending(self):
+        """取消尚未输出的延迟日志"""
+        for timer in self.timers:
+            timer.cancel()
+        self.timers.clear()
+
+    # ---------- 窗口 ----------
+
+    def find_window(self, title):
+        return 1 if title == self.window_title else None
+
+    def get_window_rect(self, handle):
+        return self.window_rect
+
+    def activate_window(self, title):
+        self._record('activate', title)
+        return title == self.window_title
+
+    # ---------- 截图 ----------
+
+    def _screen_image(self):
+        """当前截图，图片路径在首次使用时加载"""
+        left, top, right, bottom = self.window_rect
+        image = self.screens.get(self.screen)
+        if isinstance(image, str):
+            loaded = cv2.imread(image)
+            if loaded is None:
+                raise FileNotFoundError(f"无法加载仿真截图: {image}")
+            self.screens[self.screen] = image = loaded
+        if image is None:
+            return np.zeros((bottom - top, right - left, 3), dtype=np.uint8)
+        return image
+
+    def grab(self, rect):
+        """截取当前截图中与屏幕区域重叠的部分"""
+        self._record('grab', self.screen)
+        left, top = self.window_rect[:2]
+        image = self._screen_image()
+        return image[rect[1] - top:rect[3] - top, rect[0] - left:rect[2] - left]
+
+    # ---------- 输入 ----------
+
+    def send_inputs(self, events):
+        """记录批次边界后逐个回放，便于断言宏的分批方式"""
+        self._record('send_input', len(events))
+        super().send_inputs(events)
+
+    def key_down(self, key):
+        with self.lock:
+            self.keys_down.add(key)
+        self._record('key_down', key)
+
+        if key == KEY_ENTER:
+            # 第一次回车打开聊天框，再次回车提交
+            if self.chat_open:
+                command, self.chat_open, self.chat_text = self.chat_text, False, ''
+                self._record('command', command)
+                self._fire(RULE_COMMAND, command)
+            else:
+                self.chat_open = True
+        elif key == 'v' and KEY_CTRL in self.keys_down and self.chat_open:
+            self.chat_text += self.clipboard
+        else:
+            self._fire(RULE_KEY, key=key)
+
+    def key_up(self, key):
+        with self.lock:
+            self.keys_down.discard(key)
+        self._record('key_up', key)
+
+    def mouse_down(self):
+        self._record('mouse_down', self.cursor)
+
+    def mouse_up(self):
+        """松开左键完成一次点击，按窗口坐标匹配点击规则"""
+        self._record('mouse_up', self.cursor)
+        left, top = self.window_rect[:2]
+        position = (self.cursor[0] - left, self.cursor[1] - top)
+        self._record('click', position)
+        self._fire(RULE_CLICK, position)
+
+    def get_cursor_pos(self):
+        return self.cursor
+
+    def set_cursor_pos(self, pos):
+        self.cursor = (int(pos[0]), int(pos[1]))
+        self._record('move', self.cursor)
+
+    def sleep(self, seconds):
+        if self.time_scale > 0 and seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def set_clipboard_text(self, text):
+        self.clipboard = text
+        self._record('clipboard', text)
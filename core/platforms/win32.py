@@ -0,0 +1,158 @@
+import ctypes
+from ctypes import Structure, c_ulong, c_ushort, c_long, POINTER
+
+import win32gui
+import win32con
+import win32api
+import win32clipboard
+
+from core.platforms.base import (
+    Platform, KEY_ENTER, KEY_CTRL, KEY_ESC,
+    INPUT_KEY_DOWN, INPUT_KEY_UP, INPUT_MOUSE_DOWN, INPUT_MOUSE_UP, INPUT_MOVE
+)
+from core.platforms.gdi_capture import GdiCapture
+
+VIRTUAL_KEYS = {
+    KEY_ENTER: win32con.VK_RETURN,
+    KEY_CTRL: win32con.VK_CONTROL,
+    KEY_ESC: win32con.VK_ESCAPE,
+}
+
+
+# SendInput 使用的输入结构
+ULONG_PTR = POINTER(c_ulong)
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+MOUSEEVENTF_VIRTUALDESK = 0x4000
+
+class MOUSEINPUT(Structure):
+    _fields_ = [
+        ("dx", c_long),
+        ("dy", c_long),
+        ("mouseData", c_ulong),
+        ("dwFlags", c_ulong),
+        ("time", c_ulong),
+        ("dwExtraInfo", ULONG_PTR)
+    ]
+
+class KEYBDINPUT(Structure):
+    _fields_ = [
+        ("wVk", c_ushort),
+        ("wScan", c_ushort),
+        ("dwFlags", c_ulong),
+        ("time", c_ulong),
+        ("dwExtraInfo", ULONG_PTR)
+    ]
+
+class _INPUT_UNION(ctypes.Union):
+    _fields_ = [
+        ("mi", MOUSEINPUT),
+        ("ki", KEYBDINPUT)
+    ]
+
+class INPUT(Structure):
+    _fields_ = [
+        ("type", c_ulong),
+        ("_input", _INPUT_UNION)
+    ]
+
+
+def _virtual_key(key):
+    """按键名称转换为虚拟键码"""
+    if key in VIRTUAL_KEYS:
+        return VIRTUAL_KEYS[key]
+    if len(key) == 1:
+        return ord(key.upper())
+    raise ValueError(f"不支持的按键: {key}")
+
+
+class Win32Platform(Platform):
+    """Windows平台实现，通过win32 API驱动真实的游戏窗口"""
+
+    def __init__(self, timing=None):
+        super().__init__(timing)
+        self.capture = None  # GdiCapture，首次截图时创建
+
+    def find_window(self, title):
+        """查找指定标题的窗口句柄"""
+        return win32gui.FindWindow(None, title) or None
+
+    def get_window_rect(self, handle):
+        """获取窗口矩形区域"""
+        return win32gui.GetWindowRect(handle)
+
+    def activate_window(self, title):
+        """使用通用切换窗口函数把游戏窗口置于前台"""
+        from gui.utils import switch_to_window
+        return switch_to_window(title)
+
+    def grab(self, rect):
+        """截取指定区域的屏幕图像，GDI对象和像素缓冲区在多次截图间复用"""
+        if self.capture is None:
+            self.capture = GdiCapture()
+        return self.capture.grab(rect)
+
+    def _absolute(self, pos):
+        """屏幕坐标转换为SendInput绝对移动使用的0-65535虚拟桌面坐标"""
+        left = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
+        top = win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
+        width = max(2, win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN))
+        height = max(2, win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN))
+        return (round((pos[0] - left) * 65535 / (width - 1)),
+                round((pos[1] - top) * 65535 / (height - 1)))
+
+    def send_inputs(self, events):
+        """把一批输入事件转换为INPUT数组，通过一次SendInput调用注入"""
+        inputs = (INPUT * len(events))()
+        for item, (kind, value) in zip(inputs, events):
+            if kind in (INPUT_KEY_DOWN, INPUT_KEY_UP):
+                item.type = INPUT_KEYBOARD
+                item._input.ki.wVk = _virtual_key(value)
+                item._input.ki.dwFlags = win32con.KEYEVENTF_KEYUP if kind == INPUT_KEY_UP else 0
+            elif kind in (INPUT_MOUSE_DOWN, INPUT_MOUSE_UP):
+                item.type = INPUT_MOUSE
+                item._input.mi.dwFlags = (win32con.MOUSEEVENTF_LEFTDOWN if kind == INPUT_MOUSE_DOWN
+                                          else win32con.MOUSEEVENTF_LEFTUP)
+            elif kind == INPUT_MOVE:
+                item.type = INPUT_MOUSE
+                item._input.mi.dx, item._input.mi.dy = self._absolute(value)
+                item._input.mi.dwFlags = (win32con.MOUSEEVENTF_MOVE | win32con.MOUSEEVENTF_ABSOLUTE
+                                          | MOUSEEVENTF_VIRTUALDESK)
+            else:
+                raise ValueError(f"未知的输入事件: {kind}")
+
+        sent = ctypes.windll.user32.SendInput(len(events), inputs, ctypes.sizeof(INPUT))
+        if sent != len(events):
+            # 被UIPI拦截或输入队列已满时只注入了部分事件
+            raise OSError(f"SendInput只注入了 {sent}/{len(events)} 个输入事件")
+
+    def key_down(self, key):
+        win32api.keybd_event(_virtual_key(key), 0, 0, 0)
+
+    def key_up(self, key):
+        win32api.keybd_event(_virtual_key(key), 0, win32con.KEYEVENTF_KEYUP, 0)
+
+    def mouse_down(self):
+        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
+
+    def mouse_up(self):
+        win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
+
+    def get_cursor_pos(self):
+        return win32api.GetCursorPos()
+
+    def set_cursor_pos(self, pos):
+        win32api.SetCursorPos((int(pos[0]), int(pos[1])))
+
+    def sleep(self, seconds):
+        win32api.Sleep(int(seconds * 1000))
+
+    def set_clipboard_text(self, text):
+        """设置剪贴板文本内容"""
+        win32clipboard.OpenClipboard()
+        try:
+            win32clipboard.EmptyClipboard()
+            win32clipboard.SetClipboardText(text)
+        finally:
+            win32clipboard.CloseClipboard()
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+import json
 import logging
 import sys
 import os
@@ -13,6 +14,22 @@ try:
 except ImportError:
     HAS_TOAST = False
 
+from core.platforms.base import get_platform
+
+DEFAULT_WINDOW_NAME = 'Path of Exile 2'
+
+
+def get_game_window_name(logger=None):
+    """从配置文件读取游戏窗口名称，读取失败时使用默认名称"""
+    try:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            config = json.load(f)
+            return config.get('game_window', DEFAULT_WINDOW_NAME)
+    except Exception as e:
+        if logger:
+            logger.error(f"读取配置文件失败: {str(e)}")
+        return DEFAULT_WINDOW_NAME
+
 class ProcessModule(ABC):
     """流程模块基类"""
     
@@ -45,6 +62,21 @@ class ProcessModule(ABC):
             # 显示Toast提示
             show_toast(parent, "错误", str(msg), Toast.ERROR)
 
+    @property
+    def platform(self):
+        """当前平台（键鼠输入、窗口、截图、剪贴板）"""
+        return get_platform()
+
+    @property
+    def capture(self):
+        """共享的游戏窗口截图服务"""
+        from core.frame_capture import get_frame_capture
+        return get_frame_capture()
+
+    def _get_window_name(self):
+        """从配置文件读取游戏窗口名称"""
+        return get_game_window_name(self.logger)
+
     @abstractmethod
     def name(self) -> str:
         """模块名称"""
@@ -1,10 +1,5 @@
-import win32gui
-import win32con
-import win32api
-import win32clipboard
-import json
 from ..process_module import ProcessModule
-from gui.utils import switch_to_window
+from core.platforms.macro import chat_command_macro
 
 class GameCommandModule(ProcessModule):
     """游戏命令模块 - 执行游戏命令"""
@@ -40,37 +35,15 @@ class GameCommandModule(ProcessModule):
             # if not switch_result:
             #     self.logger.warning("切换到游戏窗口失败，尝试继续执行")
             
-            # 模拟回车键
-            self._press_enter()
-            win32api.Sleep(50)
+            platform = self.platform
             
-            # 设置剪贴板内容并粘贴
-            self._set_clipboard_text(command_text)
-            win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-            win32api.keybd_event(ord('V'), 0, 0, 0)
-            win32api.Sleep(50)
-            win32api.keybd_event(ord('V'), 0, win32con.KEYEVENTF_KEYUP, 0)
-            win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
-            win32api.Sleep(50)
-            
-            # 再次模拟回车键
-            self._press_enter()
+            # 先设置剪贴板内容，再批量注入 回车-Ctrl+V-回车
+            platform.set_clipboard_text(command_text)
+            elapsed = platform.run_macro(chat_command_macro(platform.timing))
+            self.logger.debug(f"命令输入耗时: {elapsed * 1000:.1f}ms")
             
             return True
             
         except Exception as e:
             self.logger.error(f"执行命令失败: {str(e)}")
             return False
-            
-    def _press_enter(self):
-        """模拟按下回车键"""
-        win32api.keybd_event(win32con.VK_RETURN, 0, 0, 0)  # 按下回车
-        win32api.Sleep(50)
-        win32api.keybd_event(win32con.VK_RETURN, 0, win32con.KEYEVENTF_KEYUP, 0)  # 释放回车
-            
-    def _set_clipboard_text(self, text):
-        """设置剪贴板文本内容"""
-        win32clipboard.OpenClipboard()
-        win32clipboard.EmptyClipboard()
-        win32clipboard.SetClipboardText(text)
-        win32clipboard.CloseClipboard()
@@ -2,15 +2,12 @@ import cv2
 import numpy as np
 import threading
 import time
-from PIL import Image
-import win32gui
-import win32con
-import win32ui
 from typing import Dict, List, Tuple, Optional, Union, Callable
 import os
 import json
 
 from ..process_module import ProcessModule
+from core.frame_capture import RECOGNITION_MAX_AGE
 from utils.model_loader import YOLOModelLoader
 from gui.utils import switch_to_window
 
@@ -46,64 +43,6 @@ class ItemRecognitionModule(ProcessModule):
             self.logger.error(f"读取配置文件失败: {str(e)}")
             return 'Path of Exile 2'
 
-    def _find_window(self, window_name):
-        """查找指定名称的窗口句柄"""
-        return win32gui.FindWindow(None, window_name)
-
-    def _get_window_rect(self, hwnd):
-        """获取窗口矩形区域"""
-        return win32gui.GetWindowRect(hwnd)
-
-    def _grab_screen(self, rect):
-        """截取指定区域的屏幕图像"""
-        width = rect[2] - rect[0]
-        height = rect[3] - rect[1]
-        
-        # 创建设备上下文
-        hwnd_dc = win32gui.GetWindowDC(0)
-        mfc_dc = win32gui.GetDC(0)
-        save_dc = win32gui.CreateCompatibleDC(mfc_dc)
-        
-        # 创建win32ui位图对象
-        bmp = win32ui.CreateBitmap()
-        bmp.CreateCompatibleBitmap(win32ui.CreateDCFromHandle(mfc_dc), width, height)
-        
-        # 选择到设备上下文
-        old_bitmap = win32ui.CreateDCFromHandle(save_dc).SelectObject(bmp)
-        
-        # 复制屏幕内容到位图
-        win32gui.BitBlt(save_dc, 0, 0, width, height, 
-                       mfc_dc, rect[0], rect[1], win32con.SRCCOPY)
-                       
-        # 获取位图数据
-        bmp.Paint(win32ui.CreateDCFromHandle(save_dc), (0, 0, width, height))
-        bits = bmp.GetBitmapBits(True)
-        
-        # 转换为PIL图像
-        img = Image.frombuffer(
-            'RGB',
-            (width, height),
-            bits,
-            'raw',
-            'BGRX',
-            0,
-            1
-        )
-        
-        # 清理win32ui对象
-        win32ui.CreateDCFromHandle(save_dc).SelectObject(old_bitmap)
-        
-        # 清理资源
-        win32gui.DeleteDC(save_dc)
-        win32gui.ReleaseDC(0, hwnd_dc)
-        win32gui.ReleaseDC(0, mfc_dc)
-        
-        return img
-
-    def _convert_to_cv(self, pil_image):
-        """将PIL图像转换为OpenCV格式"""
-        return cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-    
     def _divide_image(self, image):
         """将图像划分为四等分，返回左上和左下区域"""
         height, width = image.shape[:2]
@@ -202,15 +141,12 @@ class ItemRecognitionModule(ProcessModule):
                 time.sleep(0.1)
         
         # 获取游戏窗口截图
-        window_name = self._get_window_name()
-        hwnd = self._find_window(window_name)
-        if not hwnd:
+        frame = self.capture.get_frame(max_age=RECOGNITION_MAX_AGE)
+        if frame is None:
+            window_name = self._get_window_name()
             self.logger.error(f"未找到游戏窗口: {window_name}")
             return {'success': False, 'error': f"未找到游戏窗口: {window_name}"}
-            
-        rect = self._get_window_rect(hwnd)
-        original_image = self._grab_screen(rect)
-        original_cv = self._convert_to_cv(original_image)
+        original_cv = frame.image
         
         # 划分图像区域，只处理左上和左下
         top_left, bottom_left = self._divide_image(original_cv)
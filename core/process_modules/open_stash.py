@@ -1,21 +1,36 @@
 import cv2
 import numpy as np
-from PIL import Image
-import win32gui
-import win32con
-import win32api
-import time
+import os
 
 from core.process_module import ProcessModule
-from gui.pages.recognition_base_page import RecognitionBasePage
-from gui.utils import switch_to_window
+from core.frame_capture import RECOGNITION_MAX_AGE
+from core.vision.scale_memory import get_scale_memory
+from core.vision.parallel_match import get_scale_matcher
+from core.vision.template_bank import get_template_bank
+from core.vision.roi_memory import get_roi_memory
+
+STASH_TEMPLATE_PATH = "assets/rec/stash_cn.png"
+# 匹配得分达到该值即认为找到仓库，不再等待其余尺度
+CERTAIN_SCORE = 0.9
+
+
+def stash_scales(template_w, img_w, count=20):
+    """仓库按钮模板的缩放系数序列，范围按窗口宽度计算"""
+    min_scale = max(0.3, template_w / img_w * 0.5)
+    max_scale = min(3.0, img_w / template_w * 0.5)
+    return np.linspace(min_scale, max_scale, count)
 
 
 class OpenStashModule(ProcessModule):
     """打开仓库流程模块"""
     
     def __init__(self):
-        self.recognition_base = None
+        super().__init__()
+        self.template = None
+        self.scale_memory = get_scale_memory()
+        self.matcher = get_scale_matcher()
+        self.templates = get_template_bank()
+        self.roi_memory = get_roi_memory()
 
     def name(self) -> str:
         return "打开仓库"
@@ -25,70 +40,59 @@ class OpenStashModule(ProcessModule):
 
     def run(self, **kwargs):
         """运行模块，识别并点击仓库"""
-        if not self.recognition_base:
-            # 创建一个RecognitionBasePage实例来使用其功能
-            self.recognition_base = RecognitionBasePage(None, self._log_callback, self._status_callback)
-            self.recognition_base.set_template("assets/rec/stash_cn.png")
-
-        if not self.recognition_base.validate_template():
+        if self.template is None and not self._load_template():
             return False
 
         try:
-            # 获取游戏窗口
-            window_name = self.recognition_base._get_window_name()
-            hwnd = self.recognition_base._find_window(window_name)
-            if not hwnd:
-                print(f"未找到游戏窗口: {window_name}")
+            # 获取游戏窗口截图
+            platform = self.platform
+            window_name = self._get_window_name()
+            frame = self.capture.get_frame(max_age=RECOGNITION_MAX_AGE)
+            if frame is None:
+                self.logger.error(f"未找到游戏窗口: {window_name}")
                 return False
 
-            rect = self.recognition_base._get_window_rect(hwnd)
-            original_image = self.recognition_base._grab_screen(rect)
-            original_cv = self.recognition_base._convert_to_cv(original_image)
+            original_cv = frame.image
 
-            # 转换为灰度图进行匹配
+            # 转换为灰度图进行匹配（模板库中已是灰度图）
             gray_img = cv2.cvtColor(original_cv, cv2.COLOR_BGR2GRAY)
-            gray_template = cv2.cvtColor(self.recognition_base.template, cv2.COLOR_BGR2GRAY)
 
             # 获取模板原始尺寸
-            template_h, template_w = gray_template.shape
-
-            # 计算合适的缩放范围
-            img_h, img_w = gray_img.shape
-            min_scale = max(0.3, template_w / img_w * 0.5)
-            max_scale = min(3.0, img_w / template_w * 0.5)
-
-            # 生成缩放系数序列
-            scales = np.linspace(min_scale, max_scale, 20)
-
-            # 多尺度模板匹配
-            max_val_overall = 0
-            max_loc_overall = None
-            best_scale = None
-            best_w = None
-            best_h = None
-
-            for scale in scales:
-                # 调整模板大小
-                scaled_w = int(template_w * scale)
-                scaled_h = int(template_h * scale)
-                if scaled_w < 10 or scaled_h < 10:
-                    continue
-                resized_template = cv2.resize(gray_template, (scaled_w, scaled_h))
-
-                # 执行模板匹配
-                result = cv2.matchTemplate(gray_img, resized_template, cv2.TM_CCOEFF_NORMED)
-                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-
-                if max_val > max_val_overall:
-                    max_val_overall = max_val
-                    max_loc_overall = max_loc
-                    best_scale = scale
-                    best_w = scaled_w
-                    best_h = scaled_h
+            template_h, template_w = self.template.shape
 
             # 设置匹配阈值
             threshold = 0.7
 
+            # 生成缩放系数序列
+            img_h, img_w = gray_img.shape
+            scales = stash_scales(template_w, img_w)
+
+            def search_region(roi):
+                x1, y1, x2, y2 = roi
+                region = gray_img[y1:y2, x1:x2]
+
+                # 多尺度模板匹配，各尺度在线程池中并行，出现确定的匹配时不再等待其余尺度
+                def sweep(indices):
+                    max_val, max_loc, scale, size = self.matcher.best_match(
+                        region, self.template, scales[indices], certain=CERTAIN_SCORE)
+                    if size is None:
+                        return (0, None, None, None, None), None
+                    return (max_val, (max_loc[0] + x1, max_loc[1] + y1), scale, size[0], size[1]), scale
+
+                # 先尝试该窗口尺寸下记住的尺度，置信度不足时扫描全部尺度
+                best = self.scale_memory.search(
+                    STASH_TEMPLATE_PATH, (img_w, img_h), scales, sweep,
+                    confident=lambda best: best[0] >= threshold)
+                if best[0] < threshold:
+                    return best, None
+                return best, (best[1][0], best[1][1], best[3], best[4])
+
+            # 先在之前找到仓库按钮的区域附近搜索，找不到时搜索整张截图
+            max_val_overall, max_loc_overall, best_scale, best_w, best_h = self.roi_memory.search(
+                STASH_TEMPLATE_PATH, (img_w, img_h), search_region)
+            # 新尺寸的模板缩放结果写入模板库缓存
+            self.templates.save()
+
             if max_val_overall >= threshold:
                 # 获取匹配位置
                 top_left = max_loc_overall
@@ -98,51 +102,44 @@ class OpenStashModule(ProcessModule):
                 relative_x = top_left[0] + best_w//2
                 relative_y = top_left[1] + best_h//2
 
-                # 将窗口置于前台 - 使用通用切换窗口函数
-                switch_to_window(window_name)
+                # 将窗口置于前台
+                platform.activate_window(window_name)
                 # 等待窗口激活
-                time.sleep(0.2)
+                platform.sleep(0.2)
 
                 # 获取窗口左上角坐标
-                window_rect = win32gui.GetWindowRect(hwnd)
-                window_x = window_rect[0]
-                window_y = window_rect[1]
+                window_x, window_y = frame.rect[:2]
 
                 # 计算屏幕坐标
                 screen_x = window_x + relative_x
                 screen_y = window_y + relative_y
 
-                # 保存当前鼠标位置
-                old_pos = win32api.GetCursorPos()
-
-                # 移动鼠标并双击
-                win32api.SetCursorPos((screen_x, screen_y))
-                # 第一次点击
-                win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-                time.sleep(0.05)
-                win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-                # 短暂延迟
-                time.sleep(0.1)
-                # 第二次点击
-                win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-                time.sleep(0.05)
-                win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-
-                # 恢复鼠标位置
-                win32api.SetCursorPos(old_pos)
+                # 移动鼠标并双击，完成后恢复鼠标位置
+                platform.double_click((screen_x, screen_y))
 
                 return True
                 
             return False
 
         except Exception as e:
-            print(f"打开仓库失败: {str(e)}")
+            self.logger.error(f"打开仓库失败: {str(e)}")
+            return False
+
+    def _load_template(self):
+        """加载仓库按钮模板图片"""
+        if not os.path.exists(STASH_TEMPLATE_PATH):
+            self._log_callback(f"模板文件不存在: {STASH_TEMPLATE_PATH}", "ERROR")
+            return False
+        self.template = self.templates.get(STASH_TEMPLATE_PATH)
+        if self.template is None:
+            self._log_callback(f"无法加载模板图片: {STASH_TEMPLATE_PATH}", "ERROR")
             return False
+        return True
 
     def _log_callback(self, message, level="INFO"):
-        """日志回调"""
-        print(f"[{level}] {message}")
+        """日志回调，按级别写入模块日志"""
+        getattr(self.logger, level.lower(), self.logger.info)(message)
 
     def _status_callback(self, message):
         """状态回调"""
-        print(message)
+        self.logger.info(message)
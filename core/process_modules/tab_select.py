@@ -1,28 +1,26 @@
 import cv2
-import numpy as np
-import time
-import win32gui
-import win32api
-import win32con
-from PIL import Image, ImageDraw
 from core.process_module import ProcessModule
-from gui.pages.recognition_base_page import RecognitionBasePage
-from gui.utils import switch_to_window
-from utils.model_loader import OCRModelLoader
+from core.frame_capture import RECOGNITION_MAX_AGE
+from core.vision.roi_memory import get_roi_memory
+
+# 区域记忆中标签栏的目标名称，所有Tab共用
+TAB_STRIP_TARGET = "tab_strip"
 
 class TabSelectModule(ProcessModule):
     """Tab选择流程模块"""
     
     def __init__(self):
-        self.recognition_base = None
+        super().__init__()
         self.preview_image = None
         self.show_preview = False
-        self._ocr_loader = OCRModelLoader()  # OCR 模型加载器
+        self._ocr_loader = None  # OCR 模型加载器，首次识别时创建
+        self.roi_memory = get_roi_memory()
 
     @classmethod
     def pre_init(cls):
         """预初始化 OCR，在程序启动后台线程中调用"""
         # 使用OCRModelLoader异步加载OCR模型
+        from utils.model_loader import OCRModelLoader
         ocr_loader = OCRModelLoader()
         ocr_loader.load_model_async()
 
@@ -34,6 +32,11 @@ class TabSelectModule(ProcessModule):
         
     def _get_ocr(self):
         """获取 OCR 实例"""
+        if self._ocr_loader is None:
+            # 模型加载器依赖torch，延迟到首次识别时导入
+            from utils.model_loader import OCRModelLoader
+            self._ocr_loader = OCRModelLoader()
+        
         # 从OCRModelLoader获取模型实例
         if self._ocr_loader.is_loaded():
             return self._ocr_loader.get_model()
@@ -62,156 +65,144 @@ class TabSelectModule(ProcessModule):
             self._log_callback("未指定Tab文本", "ERROR")
             return False, None
             
-        if not self.recognition_base:
-            # 创建一个RecognitionBasePage实例来使用其功能
-            self.recognition_base = RecognitionBasePage(None, self._log_callback, self._status_callback)
-        
         self.show_preview = show_preview
         
         try:
             # 获取游戏窗口
-            window_name = self.recognition_base._get_window_name()
-            hwnd = self.recognition_base._find_window(window_name)
+            platform = self.platform
+            window_name = self._get_window_name()
+            hwnd = platform.find_window(window_name)
             if not hwnd:
-                print(f"未找到游戏窗口: {window_name}")
+                self.logger.error(f"未找到游戏窗口: {window_name}")
                 return False, None
 
             # 切换到游戏窗口
-            switch_to_window(window_name)
+            platform.activate_window(window_name)
             # 等待窗口激活
-            time.sleep(0.2)
+            platform.sleep(0.2)
 
-            # 获取窗口区域并截图
-            rect = self.recognition_base._get_window_rect(hwnd)
-            original_image = self.recognition_base._grab_screen(rect)
-            original_cv = self.recognition_base._convert_to_cv(original_image)
+            # 获取窗口截图
+            frame = self.capture.get_frame(max_age=RECOGNITION_MAX_AGE)
+            if frame is None:
+                self.logger.error(f"未找到游戏窗口: {window_name}")
+                return False, None
+            original_cv = frame.image
             
             # 获取或初始化 OCR 实例
             ocr = self._get_ocr()
+            img_h, img_w = original_cv.shape[:2]
             
-            # 直接使用原始图像进行识别
-            result = ocr.ocr(original_cv, cls=True)
+            def search_region(roi):
+                # 只识别区域内的图像，文本框坐标换算回整张截图
+                x1, y1, x2, y2 = roi
+                match = self._find_tab(ocr.ocr(original_cv[y1:y2, x1:x2], cls=True), tab_text)
+                if match is None:
+                    return None, None
+                x, y, w, h = match
+                box = (x + x1, y + y1, w, h)
+                return box, box
             
-            # 查找匹配的文本
-            found = False
-            click_x, click_y = 0, 0
-            
-            # 提取识别到的文本列表用于调试
-            recognized_texts = []
-            if result is not None and len(result) > 0:
-                for line in result[0]:
-                    if len(line) >= 2 and isinstance(line[1], tuple) and len(line[1]) >= 1:
-                        recognized_texts.append(line[1][0])
-            
-            # 打印识别到的所有文本，用于调试
-            print(f"识别到的文本列表: {recognized_texts}")
-            print(f"正在查找文本: {tab_text}")
-            
-            # 遍历识别结果查找匹配文本
-            if result is not None and len(result) > 0:
-                for line in result[0]:
-                    if len(line) >= 2 and isinstance(line[1], tuple) and len(line[1]) >= 2:
-                        text = line[1][0].strip()
-                        confidence = line[1][1]
-                        
-                        # 使用更精确的匹配方式
-                        # 1. 完全匹配
-                        exact_match = text.lower() == tab_text.lower()
-                        # 2. 文本包含匹配（仅当搜索文本长度大于3时）
-                        contains_match = len(tab_text) > 3 and tab_text.lower() in text.lower()
-                        # 3. 计算相似度（针对短文本）
-                        similarity_match = False
-                        
-                        # 对于短文本，计算字符重叠率
-                        if len(tab_text) <= 3 and not exact_match:
-                            # 计算两个字符串的字符重叠率
-                            tab_chars = set(tab_text.lower())
-                            text_chars = set(text.lower())
-                            overlap = len(tab_chars.intersection(text_chars))
-                            similarity = overlap / len(tab_chars) if tab_chars else 0
-                            similarity_match = similarity > 0.8 and len(text) <= len(tab_text) + 2
-                        
-                        if exact_match or contains_match or similarity_match:
-                            # 对于非完全匹配，要求更高的置信度
-                            min_confidence = 0.8 if exact_match else 0.9
-                            
-                            if confidence < min_confidence:
-                                print(f"匹配文本 '{text}' 置信度过低: {confidence}，需要 {min_confidence}")
-                                continue
-                                
-                            print(f"找到匹配文本: '{text}', 置信度: {confidence}")
-                            
-                            # 获取文本框的坐标（PaddleOCR返回四个角点坐标）
-                            box = line[0]
-                            # 计算边界框
-                            x_coords = [int(point[0]) for point in box]
-                            y_coords = [int(point[1]) for point in box]
-                            x = min(x_coords)
-                            y = min(y_coords)
-                            w = max(x_coords) - x
-                            h = max(y_coords) - y
-                            
-                            # 计算点击位置（文本框中心）
-                            click_x = x + w // 2
-                            click_y = y + h // 2
-                    
-                            # 如果需要预览，在原图上标记识别区域
-                            if self.show_preview:
-                                # 转换回PIL图像用于绘制
-                                pil_image = Image.fromarray(cv2.cvtColor(original_cv, cv2.COLOR_BGR2RGB))
-                                draw = ImageDraw.Draw(pil_image)
-                                # 绘制红色矩形框
-                                draw.rectangle([x, y, x+w, y+h], outline="red", width=2)
-                                # 标记点击位置
-                                draw.ellipse([click_x-5, click_y-5, click_x+5, click_y+5], fill="red")
-                                # 保存预览图
-                                self.preview_image = pil_image
-                            
-                            found = True
-                            break
+            # 标签栏横向排列，先在之前找到标签的行附近识别，找不到时识别整张截图
+            box = self.roi_memory.search(TAB_STRIP_TARGET, (img_w, img_h), search_region, span_x=True)
+            found = box is not None
+            if found:
+                x, y, w, h = box
+                
+                # 计算点击位置（文本框中心）
+                click_x = x + w // 2
+                click_y = y + h // 2
+                
+                # 如果需要预览，在原图上标记识别区域
+                if self.show_preview:
+                    from PIL import Image, ImageDraw
+                    # 转换回PIL图像用于绘制
+                    pil_image = Image.fromarray(cv2.cvtColor(original_cv, cv2.COLOR_BGR2RGB))
+                    draw = ImageDraw.Draw(pil_image)
+                    # 绘制红色矩形框
+                    draw.rectangle([x, y, x+w, y+h], outline="red", width=2)
+                    # 标记点击位置
+                    draw.ellipse([click_x-5, click_y-5, click_x+5, click_y+5], fill="red")
+                    # 保存预览图
+                    self.preview_image = pil_image
             
             if not found:
-                print(f"未找到匹配的Tab文本: {tab_text}")
+                self.logger.warning(f"未找到匹配的Tab文本: {tab_text}")
                 return False, self.preview_image if self.show_preview else None
             
             # 获取窗口左上角坐标
-            window_rect = win32gui.GetWindowRect(hwnd)
-            window_x = window_rect[0]
-            window_y = window_rect[1]
+            window_x, window_y = frame.rect[:2]
             
             # 计算屏幕坐标
             screen_x = window_x + click_x
             screen_y = window_y + click_y
             
-            # 保存当前鼠标位置
-            old_pos = win32api.GetCursorPos()
-            
-            # 移动鼠标并双击
-            win32api.SetCursorPos((screen_x, screen_y))
-            # 第一次点击
-            win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-            time.sleep(0.05)
-            win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-            # 短暂延迟
-            time.sleep(0.1)
-            # 第二次点击
-            win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-            time.sleep(0.05)
-            win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-            
-            # 恢复鼠标位置
-            win32api.SetCursorPos(old_pos)
+            # 移动鼠标并双击，完成后恢复鼠标位置
+            platform.double_click((screen_x, screen_y))
             
             return True, self.preview_image if self.show_preview else None
                 
         except Exception as e:
-            print(f"Tab选择失败: {str(e)}")
+            self.logger.error(f"Tab选择失败: {str(e)}")
             return False, self.preview_image if self.show_preview else None
 
+    def _find_tab(self, result, tab_text):
+        """
+        在OCR结果中查找Tab文本
+        :param result: PaddleOCR识别结果
+        :param tab_text: 要查找的Tab文本
+        :return: 文本框 (x, y, w, h)，未找到时返回None
+        """
+        # 遍历识别结果查找匹配文本
+        if result is not None and len(result) > 0:
+            for line in result[0]:
+                if len(line) >= 2 and isinstance(line[1], tuple) and len(line[1]) >= 2:
+                    text = line[1][0].strip()
+                    confidence = line[1][1]
+                    
+                    # 使用更精确的匹配方式
+                    # 1. 完全匹配
+                    exact_match = text.lower() == tab_text.lower()
+                    # 2. 文本包含匹配（仅当搜索文本长度大于3时）
+                    contains_match = len(tab_text) > 3 and tab_text.lower() in text.lower()
+                    # 3. 计算相似度（针对短文本）
+                    similarity_match = False
+                    
+                    # 对于短文本，计算字符重叠率
+                    if len(tab_text) <= 3 and not exact_match:
+                        # 计算两个字符串的字符重叠率
+                        tab_chars = set(tab_text.lower())
+                        text_chars = set(text.lower())
+                        overlap = len(tab_chars.intersection(text_chars))
+                        similarity = overlap / len(tab_chars) if tab_chars else 0
+                        similarity_match = similarity > 0.8 and len(text) <= len(tab_text) + 2
+                    
+                    if exact_match or contains_match or similarity_match:
+                        # 对于非完全匹配，要求更高的置信度
+                        min_confidence = 0.8 if exact_match else 0.9
+                        
+                        if confidence < min_confidence:
+                            self.logger.debug(f"匹配文本 '{text}' 置信度过低: {confidence}，需要 {min_confidence}")
+                            continue
+                            
+                        self.logger.debug(f"找到匹配文本: '{text}', 置信度: {confidence}")
+                        
+                        # 获取文本框的坐标（PaddleOCR返回四个角点坐标）
+                        box = line[0]
+                        # 计算边界框
+                        x_coords = [int(point[0]) for point in box]
+                        y_coords = [int(point[1]) for point in box]
+                        x = min(x_coords)
+                        y = min(y_coords)
+                        w = max(x_coords) - x
+                        h = max(y_coords) - y
+                        
+                        return x, y, w, h
+        return None
+
     def _log_callback(self, message, level="INFO"):
-        """日志回调"""
-        print(f"[{level}] {message}")
+        """日志回调，按级别写入模块日志"""
+        getattr(self.logger, level.lower(), self.logger.info)(message)
 
     def _status_callback(self, message):
         """状态回调"""
-        print(message)
+        self.logger.info(message)
@@ -1,56 +1,51 @@
 import cv2
 import numpy as np
-from PIL import Image
-import win32gui
-import win32con
-import win32api
-import win32ui
-import ctypes
-from ctypes import (Structure, c_ulong, c_ushort, c_short, c_long, 
-                   POINTER, sizeof, CFUNCTYPE, c_void_p, windll, byref)
-import json
 from ..process_module import ProcessModule
-from gui.utils import switch_to_window
+from core.frame_capture import RECOGNITION_MAX_AGE
+from core.vision.pyramid import pyramid_match, exhaustive_match
+from core.vision.peaks import match_pos, match_size
+from core.platforms.macro import ctrl_click_macro
+from core.vision.scale_memory import get_scale_memory
+from core.vision.grid_cache import GridCache
+from core.vision.parallel_match import get_scale_matcher
+from core.vision.template_bank import get_template_bank
+from core.vision.occupancy import occupancy_map
 
-ULONG_PTR = POINTER(c_ulong)
+WISDOM_TEMPLATE_PATH = "assets/rec/wisdom.png"
 
-class MOUSEINPUT(Structure):
-    _fields_ = [
-        ("dx", c_long),
-        ("dy", c_long),
-        ("mouseData", c_ulong),
-        ("dwFlags", c_ulong),
-        ("time", c_ulong),
-        ("dwExtraInfo", ULONG_PTR)
-    ]
+def select_anchor_corners(marker_matches, region_width, height):
+    """
+    从wisdom匹配结果中选出网格左上角和右下角的锚点
+    :param marker_matches: MATCH_DTYPE结构化数组 (x, y, w, h, scale, score)
+    :param region_width: 搜索区域（窗口左半部分）的宽度
+    :param height: 搜索区域的高度
+    :return: (左上角锚点, 右下角锚点)，找不到时返回None
+    """
+    xs, ys, confident = marker_matches['x'], marker_matches['y'], marker_matches['score'] > 0.75
+    top_left_candidates = marker_matches[(xs < region_width * 0.5) & (ys < height * 0.5) & confident]
+    bottom_right_candidates = marker_matches[(xs > region_width * 0.2) & (ys > height * 0.2) & confident]
+    
+    if not len(top_left_candidates) or not len(bottom_right_candidates):
+        return None
+    
+    # 选择最佳的锚点
+    top_left_marker = top_left_candidates[np.argmin(top_left_candidates['x'] + top_left_candidates['y'])]
+    bottom_right_marker = bottom_right_candidates[np.argmax(bottom_right_candidates['x'] + bottom_right_candidates['y'])]
+    return top_left_marker, bottom_right_marker
 
-class KEYBDINPUT(Structure):
-    _fields_ = [
-        ("wVk", c_ushort),
-        ("wScan", c_ushort),
-        ("dwFlags", c_ulong),
-        ("time", c_ulong),
-        ("dwExtraInfo", ULONG_PTR)
-    ]
-
-class _INPUT_UNION(ctypes.Union):
-    _fields_ = [
-        ("mi", MOUSEINPUT),
-        ("ki", KEYBDINPUT)
-    ]
-
-class INPUT(Structure):
-    _fields_ = [
-        ("type", c_ulong),
-        ("_input", _INPUT_UNION)
-    ]
 
 class TakeOutItemModule(ProcessModule):
     """取出物品模块 - 根据给定位置取出仓库物品"""
     def __init__(self):
         super().__init__()
         # 加载wisdom定位锚点模板
-        self.wisdom_template = cv2.imread("assets/rec/wisdom.png")
+        self.templates = get_template_bank()
+        self.wisdom_template = self.templates.get(WISDOM_TEMPLATE_PATH)
+        self.scale_memory = get_scale_memory()
+        self.grid_cache = GridCache()
+        self.matcher = get_scale_matcher()
+        # 点击前检查目标格子中是否有物品，空格子不点击
+        self.check_occupancy = True
         
         if self.wisdom_template is None:
             self.logger.warning("⚠️ wisdom模板图片加载失败")
@@ -71,81 +66,168 @@ class TakeOutItemModule(ProcessModule):
             return False
             
         preview_callback = kwargs.get('preview_callback') if preview_enabled else None
-        result = self.process(p1_num, p2_num, preview_callback)
+        result = self.process(p1_num, p2_num, preview_callback, grid=kwargs.get('grid'))
         # 如果返回值是图像数组，说明处理成功；如果是False，说明处理失败
         return isinstance(result, np.ndarray)
 
-    def _get_window_name(self):
-        """获取游戏窗口名称"""
+    def locate_grid(self):
+        """
+        截图并通过wisdom锚点定位仓库网格，不执行任何点击
+        
+        Returns:
+            dict or None: 网格信息 {hwnd, window_name, image, gray, start, end, cols, rows, cell}，定位失败返回None
+            （gray为截图左半部分的灰度图，坐标与image一致）
+        """
         try:
-            with open('config.json', 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                return config.get('game_window', 'Path of Exile 2')
+            # 获取游戏窗口截图
+            window_name = self._get_window_name()
+            frame = self.capture.get_frame(max_age=RECOGNITION_MAX_AGE)
+            if frame is None:
+                self.logger.error(f"未找到游戏窗口: {window_name}")
+                return None
+                
+            hwnd = frame.hwnd
+            original_cv = frame.image
+            
+            # 获取图像尺寸和中心线
+            img_h, img_w = original_cv.shape[:2]
+            window_center_x = img_w // 2
+            
+            # 只处理左半部分（仓位区域）
+            left_region = original_cv[:, :window_center_x]
+            gray_left = cv2.cvtColor(left_region, cv2.COLOR_BGR2GRAY)
+            
+            # 先用缓存的网格校验，面板位置未变时跳过多尺度锚点识别
+            geometry = self.grid_cache.validate(gray_left, self.wisdom_template, frame.rect)
+            if geometry is None:
+                geometry = self._detect_geometry(gray_left, self.wisdom_template, img_w, img_h)
+                if geometry is None:
+                    return None
+                self.grid_cache.store(frame.rect, geometry)
+                # 新尺寸的模板缩放结果写入模板库缓存
+                self.templates.save()
+            
+            # 计算网格参数
+            (grid_start_x, grid_start_y), bottom_right = geometry['anchors']
+            bottom_right_size = geometry['anchor_sizes'][1]
+            grid_end_x = bottom_right[0] + bottom_right_size[0]
+            grid_end_y = bottom_right[1] + bottom_right_size[1]
+            grid_cols = geometry['cols']
+            grid_rows = geometry['rows']
+            
+            # 计算单元格大小
+            cell_width = (grid_end_x - grid_start_x) / grid_cols
+            cell_height = (grid_end_y - grid_start_y) / grid_rows
+            
+            return {
+                'hwnd': hwnd,
+                'window_name': window_name,
+                'image': original_cv,
+                'gray': gray_left,
+                'start': (grid_start_x, grid_start_y),
+                'end': (grid_end_x, grid_end_y),
+                'cols': grid_cols,
+                'rows': grid_rows,
+                'cell': (cell_width, cell_height)
+            }
+            
         except Exception as e:
-            self.logger.error(f"读取配置文件失败: {str(e)}")
-            return 'Path of Exile 2'
-
-    def _find_window(self, window_name):
-        """查找指定名称的窗口句柄"""
-        return win32gui.FindWindow(None, window_name)
-
-    def _get_window_rect(self, hwnd):
-        """获取窗口矩形区域"""
-        return win32gui.GetWindowRect(hwnd)
+            self.logger.error(f"定位仓库网格出错: {str(e)}")
+            return None
 
-    def _grab_screen(self, rect):
-        """截取指定区域的屏幕图像"""
-        width = rect[2] - rect[0]
-        height = rect[3] - rect[1]
+    def _detect_geometry(self, gray_left, wisdom, img_w, img_h):
+        """
+        多尺度识别wisdom锚点并判断大仓/小仓
+        :return: 网格几何信息 {stash_type, anchors, anchor_size, cols, rows}，识别失败返回None
+        """
+        # 识别wisdom锚点：先在降采样图上搜索全部尺度，再在原图候选区域精匹配
+        region_width = gray_left.shape[1]
+        wisdom_scales = np.linspace(0.2, 2.5, 35)
+        wisdom_threshold = 0.65
+        
+        def sweep(indices):
+            marker_matches = pyramid_match(gray_left, wisdom, wisdom_scales[indices], wisdom_threshold,
+                                           matcher=self.matcher)
+            corners = select_anchor_corners(marker_matches, region_width, img_h)
+            return (marker_matches, corners), corners[0]['scale'] if corners else None
+        
+        # 先只匹配该窗口尺寸下记住的尺度附近，锚点不完整时扫描全部尺度
+        marker_matches, corners = self.scale_memory.search(
+            WISDOM_TEMPLATE_PATH, (img_w, img_h), wisdom_scales, sweep,
+            confident=lambda result: result[1] is not None)
+        if len(marker_matches) < 2:
+            # 粗匹配漏检时退回逐尺度全图匹配
+            marker_matches = exhaustive_match(gray_left, wisdom, wisdom_scales, wisdom_threshold,
+                                              matcher=self.matcher)
+            corners = select_anchor_corners(marker_matches, region_width, img_h)
         
-        # 创建设备上下文
-        hwnd_dc = win32gui.GetWindowDC(0)
-        mfc_dc = win32gui.GetDC(0)
-        save_dc = win32gui.CreateCompatibleDC(mfc_dc)
+        if len(marker_matches) < 2:
+            self.logger.warning("未找到足够的wisdom定位锚点")
+            return None
         
-        # 创建win32ui位图对象
-        bmp = win32ui.CreateBitmap()
-        bmp.CreateCompatibleBitmap(win32ui.CreateDCFromHandle(mfc_dc), width, height)
+        # 选择左上角和右下角的标记点
+        if corners is None:
+            self.logger.warning("未能定位到正确的wisdom定位锚点位置")
+            return None
+        top_left_marker, bottom_right_marker = corners
         
-        # 选择到设备上下文
-        old_bitmap = win32ui.CreateDCFromHandle(save_dc).SelectObject(bmp)
+        # 计算网格范围
+        grid_start_x, grid_start_y = match_pos(top_left_marker)
+        grid_end_x = int(bottom_right_marker['x'] + bottom_right_marker['w'])
+        grid_end_y = int(bottom_right_marker['y'] + bottom_right_marker['h'])
         
-        # 复制屏幕内容到位图
-        win32gui.BitBlt(save_dc, 0, 0, width, height, 
-                       mfc_dc, rect[0], rect[1], win32con.SRCCOPY)
-                       
-        # 获取位图数据
-        bmp.Paint(win32ui.CreateDCFromHandle(save_dc), (0, 0, width, height))
-        bits = bmp.GetBitmapBits(True)
+        # 判断是大仓还是小仓
+        dx = grid_end_x - grid_start_x
+        dy = grid_end_y - grid_start_y
+        cell_size = (top_left_marker['w'] + top_left_marker['h']) / 2
         
-        # 转换为PIL图像
-        img = Image.frombuffer(
-            'RGB',
-            (width, height),
-            bits,
-            'raw',
-            'BGRX',
-            0,
-            1
-        )
+        approx_grid_width = dx / cell_size
+        approx_grid_height = dy / cell_size
         
-        # 清理win32ui对象
-        win32ui.CreateDCFromHandle(save_dc).SelectObject(old_bitmap)
-        # 注意：不再调用 bmp.DeleteObject()，因为 PyCBitmap 对象没有这个方法
-        # Python 的垃圾回收会处理 bmp 对象
+        score_24 = abs(approx_grid_width - 24) + abs(approx_grid_height - 24)
+        score_12 = abs(approx_grid_width - 12) + abs(approx_grid_height - 12)
         
-        # 清理资源
-        win32gui.DeleteDC(save_dc)
-        win32gui.ReleaseDC(0, hwnd_dc)
-        win32gui.ReleaseDC(0, mfc_dc)
+        is_big_stash = score_24 < score_12
+        grid_cols = 24 if is_big_stash else 12
+        grid_rows = 24 if is_big_stash else 12
         
-        return img
+        return {
+            'stash_type': 'quad' if is_big_stash else 'normal',
+            'anchors': [match_pos(top_left_marker), match_pos(bottom_right_marker)],
+            'anchor_sizes': [match_size(top_left_marker), match_size(bottom_right_marker)],
+            'cols': grid_cols,
+            'rows': grid_rows
+        }
 
-    def _convert_to_cv(self, pil_image):
-        """将PIL图像转换为OpenCV格式"""
-        return cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+    def is_cell_occupied(self, grid, p1_num, p2_num, refresh=False):
+        """
+        根据占用图判断目标格子中是否有物品
+        两个锚点格子中放着wisdom，锚点格子读不出物品时说明占用图不可靠（面板被遮挡、网格偏移等），
+        此时不做判断，按有物品处理
+        :param grid: locate_grid 返回的网格信息
+        :param refresh: 重新截图检查（网格是预先定位的，其中的截图可能已过时），只沿用网格位置
+        :return: 目标格子为空时返回False
+        """
+        if refresh:
+            frame = self.capture.get_frame(max_age=RECOGNITION_MAX_AGE)
+            if frame is None or frame.image.shape != grid['image'].shape:
+                self.logger.debug("无法获取与网格一致的截图，跳过格子占用检查")
+                return True
+            image = frame.image
+            gray = cv2.cvtColor(image[:, :image.shape[1] // 2], cv2.COLOR_BGR2GRAY)
+        else:
+            gray = grid.get('gray')
+            if gray is None:
+                gray = cv2.cvtColor(grid['image'], cv2.COLOR_BGR2GRAY)
+        occupied = occupancy_map(gray, grid)
+        if not (occupied[0, 0] and occupied[-1, -1]):
+            self.logger.debug("锚点格子未识别为有物品，跳过格子占用检查")
+            return True
+        col = (p1_num - 1) % grid['cols']
+        row = (p2_num - 1) % grid['rows']
+        return bool(occupied[row, col])
 
-    def process(self, p1_num, p2_num, preview_callback=None):
+    def process(self, p1_num, p2_num, preview_callback=None, grid=None):
         """
         执行取出物品操作
         
@@ -153,123 +235,28 @@ class TakeOutItemModule(ProcessModule):
             p1_num: 第一个位置的格子编号
             p2_num: 第二个位置的格子编号
             preview_callback: 用于更新预览图像的回调函数(可选)
+            grid: 预先定位的网格信息(可选)，为None时重新截图定位
         
         Returns:
             bool or numpy.ndarray: 如果识别成功返回处理后的图像，否则返回False
         """
         try:
-            # 获取游戏窗口截图
-            window_name = self._get_window_name()
-            hwnd = self._find_window(window_name)
-            if not hwnd:
-                self.logger.error(f"未找到游戏窗口: {window_name}")
+            # 预先定位的网格只沿用位置，占用检查需要重新截图
+            prepared = grid is not None
+            if grid is None:
+                grid = self.locate_grid()
+            if not grid:
                 return False
-                
-            rect = self._get_window_rect(hwnd)
-            original_image = self._grab_screen(rect)
-            original_cv = self._convert_to_cv(original_image)
             
-            # 获取图像尺寸和中心线
+            hwnd = grid['hwnd']
+            window_name = grid['window_name']
+            original_cv = grid['image']
+            grid_start_x, grid_start_y = grid['start']
+            grid_end_x, grid_end_y = grid['end']
+            grid_cols = grid['cols']
+            grid_rows = grid['rows']
+            cell_width, cell_height = grid['cell']
             img_h, img_w = original_cv.shape[:2]
-            window_center_x = img_w // 2
-            
-            # 只处理左半部分（仓位区域）
-            left_region = original_cv[:, :window_center_x]
-            gray_left = cv2.cvtColor(left_region, cv2.COLOR_BGR2GRAY)
-            
-            # 识别wisdom锚点
-            wisdom_gray = cv2.cvtColor(self.wisdom_template, cv2.COLOR_BGR2GRAY)
-            marker_matches = []
-            best_scale_map = {}
-            
-            wisdom_scales = np.linspace(0.2, 2.5, 35)
-            wisdom_threshold = 0.65
-            
-            for scale in wisdom_scales:
-                scaled_wisdom_w = min(int(wisdom_gray.shape[1] * scale), gray_left.shape[1] - 1)
-                scaled_wisdom_h = min(int(wisdom_gray.shape[0] * scale), gray_left.shape[0] - 1)
-                if scaled_wisdom_w < 10 or scaled_wisdom_h < 10:
-                    continue
-                    
-                resized_wisdom = cv2.resize(wisdom_gray, (scaled_wisdom_w, scaled_wisdom_h))
-                result = cv2.matchTemplate(gray_left, resized_wisdom, cv2.TM_CCOEFF_NORMED)
-                locations = np.where(result >= wisdom_threshold)
-                
-                for loc in zip(*locations[::-1]):
-                    pos_key = f"{loc[0]}_{loc[1]}"
-                    curr_val = result[loc[1], loc[0]]
-                    
-                    if pos_key in best_scale_map:
-                        if curr_val > best_scale_map[pos_key]['value']:
-                            best_scale_map[pos_key] = {
-                                'scale': scale,
-                                'value': curr_val,
-                                'size': (resized_wisdom.shape[1], resized_wisdom.shape[0])
-                            }
-                    else:
-                        best_scale_map[pos_key] = {
-                            'scale': scale,
-                            'value': curr_val,
-                            'size': (resized_wisdom.shape[1], resized_wisdom.shape[0])
-                        }
-            
-            # 转换最佳匹配为marker_matches
-            for pos_key, match_info in best_scale_map.items():
-                x, y = map(int, pos_key.split('_'))
-                marker_matches.append({
-                    'pos': (x, y),
-                    'scale': match_info['scale'],
-                    'size': match_info['size'],
-                    'value': match_info['value']
-                })
-            
-            if len(marker_matches) < 2:
-                self.logger.warning("未找到足够的wisdom定位锚点")
-                return False
-            
-            # 根据位置筛选左上角和右下角的标记点
-            top_left_candidates = [m for m in marker_matches if 
-                                 m['pos'][0] < window_center_x * 0.5 and
-                                 m['pos'][1] < img_h * 0.5 and
-                                 m['value'] > 0.75]
-            
-            bottom_right_candidates = [m for m in marker_matches if 
-                                     m['pos'][0] > window_center_x * 0.2 and
-                                     m['pos'][1] > img_h * 0.2 and
-                                     m['value'] > 0.75]
-            
-            if not top_left_candidates or not bottom_right_candidates:
-                self.logger.warning("未能定位到正确的wisdom定位锚点位置")
-                return False
-            
-            # 选择最佳的锚点
-            top_left_marker = min(top_left_candidates, key=lambda x: x['pos'][0] + x['pos'][1])
-            bottom_right_marker = max(bottom_right_candidates, key=lambda x: x['pos'][0] + x['pos'][1])
-            
-            # 计算网格参数
-            grid_start_x = top_left_marker['pos'][0]
-            grid_start_y = top_left_marker['pos'][1]
-            grid_end_x = bottom_right_marker['pos'][0] + bottom_right_marker['size'][0]
-            grid_end_y = bottom_right_marker['pos'][1] + bottom_right_marker['size'][1]
-            
-            # 判断是大仓还是小仓
-            dx = grid_end_x - grid_start_x
-            dy = grid_end_y - grid_start_y
-            cell_size = (top_left_marker['size'][0] + top_left_marker['size'][1]) / 2
-            
-            approx_grid_width = dx / cell_size
-            approx_grid_height = dy / cell_size
-            
-            score_24 = abs(approx_grid_width - 24) + abs(approx_grid_height - 24)
-            score_12 = abs(approx_grid_width - 12) + abs(approx_grid_height - 12)
-            
-            is_big_stash = score_24 < score_12
-            grid_cols = 24 if is_big_stash else 12
-            grid_rows = 24 if is_big_stash else 12
-            
-            # 计算单元格大小
-            cell_width = dx / grid_cols
-            cell_height = dy / grid_rows
             
             # 计算目标点击位置 num1列 num2行
             def get_cell_center(num1, num2):
@@ -281,50 +268,32 @@ class TakeOutItemModule(ProcessModule):
             
             x1, y1 = get_cell_center(p1_num, p2_num)
             
+            if self.check_occupancy and not self.is_cell_occupied(grid, p1_num, p2_num, refresh=prepared):
+                self.logger.warning(f"目标格子为空，取消点击: 第{p1_num}列 第{p2_num}行")
+                return False
+            
             # 转换为屏幕坐标并执行点击
-            rect = win32gui.GetWindowRect(hwnd)
+            platform = self.platform
+            rect = platform.get_window_rect(hwnd)
             screen_x1 = int(x1) + rect[0]
             screen_y1 = int(y1) + rect[1]
             
             try:
-                # 确保窗口处于活动状态 - 使用通用切换窗口函数
-                switch_result = switch_to_window(window_name)
+                # 确保窗口处于活动状态
+                switch_result = platform.activate_window(window_name)
                 if not switch_result:
                     self.logger.warning(f"切换到游戏窗口失败，尝试继续执行")
                 
-                # 获取客户区位置
-                client_rect = win32gui.GetClientRect(hwnd)
-                client_x, client_y = win32gui.ClientToScreen(hwnd, (0, 0))
-                
-                def click_at(x, y):
-                    # 转换为客户区相对坐标
-                    rel_x = x - client_x
-                    rel_y = y - client_y
-                    
-                    # 移动鼠标并点击
-                    win32api.SetCursorPos((x, y))
-                    win32api.Sleep(50)
-                    win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-                    win32api.Sleep(50)
-                    win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-                
-                # 按下Ctrl键
-                win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-                win32api.Sleep(100)
-                
-                # 点击指定位置
-                click_at(screen_x1, screen_y1)
-                win32api.Sleep(300)
-                
-                # 释放Ctrl键
-                win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+                # 按住Ctrl点击指定位置，整个动作编译为批量输入
+                elapsed = platform.run_macro(ctrl_click_macro((screen_x1, screen_y1), platform.timing))
+                self.logger.debug(f"Ctrl点击输入耗时: {elapsed * 1000:.1f}ms")
                 
             except Exception as e:
                 self.logger.error(f"点击操作失败: {str(e)}")
                 return False
             
             # 制作预览图
-            preview_scale = 800 / original_image.width
+            preview_scale = 800 / img_w
             processed_image = original_cv.copy()
             
             # 绘制网格线
@@ -348,8 +317,8 @@ class TakeOutItemModule(ProcessModule):
             # 如果提供了预览回调，则调用它
             if preview_callback:
                 preview_image = cv2.resize(processed_image, 
-                                         (int(original_image.width * preview_scale),
-                                          int(original_image.height * preview_scale)))
+                                         (int(img_w * preview_scale),
+                                          int(img_h * preview_scale)))
                 preview_callback(preview_image)
             
             return processed_image
@@ -1,17 +1,62 @@
 from abc import ABC, abstractmethod
+from types import MappingProxyType
 
 class PushBase(ABC):
     """推送基类，定义推送接口"""
-    
+
+    # 推送渠道名称，用于按渠道限流等处理
+    channel = None
+
     def __init__(self, config, log_callback=None):
         """
         初始化推送器
         :param config: 配置对象
         :param log_callback: 日志回调函数
         """
-        self.config = config
         self.log_callback = log_callback or (lambda msg, level: None)
-        
+        self.timeout = 10  # 单次推送请求超时（秒），由推送分发器按预算调整
+        self.reload_config(config)
+
+    def reload_config(self, config):
+        """
+        生成渠道配置的只读快照并预先验证，仅在构造和配置变更通知时调用
+        :param config: 配置对象
+        :return: (success, message)
+        """
+        self.config = config
+        settings = MappingProxyType(dict(config.get(self.channel, {}) or {}))
+        success, message = self.check_settings(settings)
+
+        self.settings = settings
+        self.config_valid = success
+        self.config_message = message
+        if success:
+            self.prepare(settings)
+        return success, message
+
+    def validate_config(self):
+        """
+        返回预先验证的配置结果
+        :return: (success, message)
+        """
+        return self.config_valid, self.config_message
+
+    @abstractmethod
+    def check_settings(self, settings):
+        """
+        验证渠道配置快照
+        :param settings: 只读的渠道配置
+        :return: (success, message)
+        """
+        pass
+
+    def prepare(self, settings):
+        """
+        根据已验证的配置预先构造请求地址和请求体模板
+        :param settings: 只读的渠道配置
+        """
+        pass
+
     @abstractmethod
     def send(self, keyword, content):
         """
@@ -21,7 +66,7 @@ class PushBase(ABC):
         :return: (success, message)
         """
         pass
-        
+
     @abstractmethod
     def test(self):
         """
@@ -29,11 +74,3 @@ class PushBase(ABC):
         :return: (success, message)
         """
         pass
-        
-    @abstractmethod
-    def validate_config(self):
-        """
-        验证推送配置
-        :return: (success, message)
-        """
-        pass
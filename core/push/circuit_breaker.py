@@ -0,0 +1,120 @@
+import threading
+import time
+from enum import Enum
+
+
+class BreakerState(Enum):
+    """熔断器状态枚举"""
+    CLOSED = "正常"
+    OPEN = "熔断"
+    HALF_OPEN = "探测中"
+
+
+class CircuitBreaker:
+    """单个推送渠道的熔断器，连续失败后熔断，冷却后用下一条推送试探恢复"""
+
+    def __init__(self, failure_threshold=3, recovery_timeout_ms=60000,
+                 max_recovery_timeout_ms=600000, clock=None):
+        """
+        初始化熔断器
+        :param failure_threshold: 连续失败多少次后熔断
+        :param recovery_timeout_ms: 熔断后首次探测的等待时间（毫秒）
+        :param max_recovery_timeout_ms: 探测连续失败时等待时间翻倍的上限（毫秒）
+        :param clock: 时间函数，默认time.monotonic
+        """
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.base_recovery_timeout = recovery_timeout_ms / 1000
+        self.max_recovery_timeout = max(max_recovery_timeout_ms, recovery_timeout_ms) / 1000
+        self.clock = clock or time.monotonic
+        self.lock = threading.Lock()
+
+        self.state = BreakerState.CLOSED
+        self.consecutive_failures = 0
+        self.recovery_timeout = self.base_recovery_timeout
+        self.opened_at = None
+
+        # 成功率的指数加权移动平均，作为健康度的基础
+        self.success_ewma = 1.0
+        self.ewma_alpha = 0.2
+        self.total_successes = 0
+        self.total_failures = 0
+
+    def allow_request(self):
+        """是否允许正常推送"""
+        with self.lock:
+            return self.state == BreakerState.CLOSED
+
+    def try_begin_probe(self):
+        """熔断冷却时间已到时进入半开状态，返回是否应当发起一次探测"""
+        with self.lock:
+            if self.state != BreakerState.OPEN:
+                return False
+            if self.clock() - self.opened_at < self.recovery_timeout:
+                return False
+            self.state = BreakerState.HALF_OPEN
+            return True
+
+    def cancel_probe(self):
+        """探测未能发起（如被限流），回到熔断状态等待下一次机会"""
+        with self.lock:
+            if self.state == BreakerState.HALF_OPEN:
+                self.state = BreakerState.OPEN
+
+    def record_success(self):
+        """记录一次推送成功，半开状态下探测成功则恢复"""
+        with self.lock:
+            self.total_successes += 1
+            self.success_ewma += self.ewma_alpha * (1.0 - self.success_ewma)
+            self.consecutive_failures = 0
+            self.state = BreakerState.CLOSED
+            self.recovery_timeout = self.base_recovery_timeout
+            self.opened_at = None
+
+    def record_failure(self):
+        """记录一次推送失败，达到阈值或探测失败时熔断"""
+        with self.lock:
+            self.total_failures += 1
+            self.success_ewma += self.ewma_alpha * (0.0 - self.success_ewma)
+            self.consecutive_failures += 1
+
+            if self.state == BreakerState.HALF_OPEN:
+                # 探测失败，延长下一次探测的等待时间
+                self.recovery_timeout = min(self.recovery_timeout * 2, self.max_recovery_timeout)
+                self._open()
+            elif self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def reset(self):
+        """重置为正常状态（如渠道配置已变更）"""
+        with self.lock:
+            self.state = BreakerState.CLOSED
+            self.consecutive_failures = 0
+            self.recovery_timeout = self.base_recovery_timeout
+            self.opened_at = None
+
+    def _open(self):
+        """进入熔断状态（调用方需持有锁）"""
+        self.state = BreakerState.OPEN
+        self.opened_at = self.clock()
+
+    def health_score(self):
+        """健康度评分，0~1，熔断时为0"""
+        with self.lock:
+            if self.state == BreakerState.OPEN:
+                return 0.0
+            if self.state == BreakerState.HALF_OPEN:
+                return round(self.success_ewma * 0.5, 3)
+            return round(self.success_ewma, 3)
+
+    def get_stats(self):
+        """获取熔断器状态"""
+        score = self.health_score()
+        with self.lock:
+            return {
+                'state': self.state.value,
+                'health': score,
+                'consecutive_failures': self.consecutive_failures,
+                'successes': self.total_successes,
+                'failures': self.total_failures,
+                'recovery_timeout_ms': int(self.recovery_timeout * 1000)
+            }
@@ -0,0 +1,135 @@
+import threading
+from .rate_limiter import PRIORITY_MESSAGE
+from .circuit_breaker import CircuitBreaker
+
+# 单次推送的超时时间上下限（秒）
+MIN_SEND_TIMEOUT = 3.0
+MAX_SEND_TIMEOUT = 10.0
+
+
+class PushDispatcher:
+    """推送分发器，负责把消息按优先级分发到各推送渠道"""
+
+    def __init__(self, limiter=None, log_callback=None, breaker_config=None, dispatch_budget_ms=30000):
+        """
+        初始化推送分发器
+        :param limiter: PushRateLimiter实例，为None时不限流
+        :param log_callback: 日志回调函数
+        :param breaker_config: 熔断器参数 {failure_threshold, recovery_timeout_ms, max_recovery_timeout_ms}
+        :param dispatch_budget_ms: 一条消息分发到所有渠道的总超时预算（毫秒）
+        """
+        self.handlers = []
+        self.breakers = {}
+        self.limiter = limiter
+        self.log_callback = log_callback or (lambda msg, level: None)
+        self.breaker_config = breaker_config or {}
+        self.dispatch_budget = dispatch_budget_ms / 1000
+        self.lock = threading.Lock()  # 保护处理器的超时设置和发送
+
+    @classmethod
+    def from_config(cls, config, limiter=None, log_callback=None):
+        """从配置对象创建推送分发器"""
+        return cls(
+            limiter=limiter,
+            log_callback=log_callback,
+            breaker_config=config.get('push_circuit_breaker', {}),
+            dispatch_budget_ms=config.get('push_dispatch_budget_ms', 30000)
+        )
+
+    @staticmethod
+    def channel_of(handler):
+        """获取推送处理器对应的渠道名称"""
+        return getattr(handler, 'channel', None) or handler.__class__.__name__.lower()
+
+    def add_handler(self, handler):
+        """添加推送处理器"""
+        if handler:
+            self.handlers.append(handler)
+            channel = self.channel_of(handler)
+            if channel not in self.breakers:
+                self.breakers[channel] = CircuitBreaker(**self.breaker_config)
+
+    def reload_config(self, config):
+        """
+        配置变更时刷新所有推送处理器的配置快照
+        任何配置保存都会触发通知，只有渠道配置快照确实变化时才重置该渠道的熔断状态，
+        否则失效的渠道会被无关的配置修改重新启用
+        """
+        for handler in self.handlers:
+            if hasattr(handler, 'reload_config'):
+                previous = dict(getattr(handler, 'settings', None) or {})
+                success, msg = handler.reload_config(config)
+                if dict(getattr(handler, 'settings', None) or {}) != previous:
+                    self.breakers[self.channel_of(handler)].reset()
+                if not success:
+                    self.log_callback(f"{self.channel_of(handler)} 配置验证失败: {msg}", "ERROR")
+
+    def _send_timeout(self, active_count):
+        """把分发预算平分给可用渠道，熔断渠道的份额分给健康渠道"""
+        if active_count <= 0:
+            return MAX_SEND_TIMEOUT
+        share = self.dispatch_budget / active_count
+        return min(MAX_SEND_TIMEOUT, max(MIN_SEND_TIMEOUT, share))
+
+    def dispatch(self, title, content, priority=PRIORITY_MESSAGE):
+        """
+        发送推送消息到所有处理器
+        熔断渠道冷却结束后，用当前这条真实消息作为半开试探，成功则恢复该渠道，
+        不额外发送测试消息，也不会丢掉试探时的这条推送
+        :param title: 推送标题（触发的关键词）
+        :param content: 推送内容
+        :param priority: 推送优先级
+        :return: 至少有一个渠道推送成功时返回True
+        """
+        results = []
+        active_handlers = []
+        for handler in self.handlers:
+            breaker = self.breakers[self.channel_of(handler)]
+            if breaker.allow_request():
+                active_handlers.append((handler, False))
+            elif breaker.try_begin_probe():
+                active_handlers.append((handler, True))
+            else:
+                # 熔断中的渠道不占用分发预算
+                results.append(False)
+
+        timeout = self._send_timeout(len(active_handlers))
+        for handler, probing in active_handlers:
+            channel = self.channel_of(handler)
+            breaker = self.breakers[channel]
+            if self.limiter:
+                allowed, _ = self.limiter.acquire(channel, priority)
+                if not allowed:
+                    if probing:
+                        breaker.cancel_probe()
+                    results.append(False)
+                    continue
+
+            try:
+                # 处理器的超时属性是共享状态，设置和发送需在同一把锁内完成
+                with self.lock:
+                    handler.timeout = timeout
+                    result, msg = handler.send(title, content)
+                results.append(result)
+                if not result:
+                    self.log_callback(f"推送消息失败: {msg}", "ERROR")
+            except Exception as e:
+                self.log_callback(f"推送消息失败: {str(e)}", "ERROR")
+                result = False
+                results.append(False)
+
+            if result:
+                breaker.record_success()
+                if probing:
+                    self.log_callback(f"{channel} 推送恢复，已恢复该渠道", "INFO")
+            else:
+                breaker.record_failure()
+                if probing:
+                    self.log_callback(f"{channel} 推送试探失败，继续暂停该渠道", "WARN")
+                elif not breaker.allow_request():
+                    self.log_callback(f"{channel} 推送连续失败，已暂停该渠道", "WARN")
+        return any(results)
+
+    def get_health(self):
+        """获取各渠道的熔断状态和健康度"""
+        return {channel: breaker.get_stats() for channel, breaker in self.breakers.items()}
@@ -1,31 +1,67 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from .base import PushBase
 
-class EmailPusher:
-    def init(self, config, logger=None):
+class EmailPusher(PushBase):
+    """邮件推送实现"""
+
+    channel = 'email'
+
+    def __init__(self, config, log_callback=None):
         """初始化邮件推送器
         Args:
-        config: 包含邮箱配置信息的字典
-        logger: 日志记录函数
+        config: 包含邮箱配置信息的配置对象
+        log_callback: 日志记录函数
         """
-        self.config = config.get('email', {})
-        self.logger = logger or (lambda msg, level: None)
+        super().__init__(config, log_callback)
+
+    def check_settings(self, settings):
+        """验证邮箱配置"""
+        required = {
+            'smtp_server': '请配置SMTP服务器',
+            'smtp_port': '请配置SMTP端口',
+            'sender_email': '请配置发件人邮箱',
+            'email_password': '请配置邮箱密码/授权码',
+            'receiver_email': '请配置收件人邮箱'
+        }
+
+        for field, message in required.items():
+            if not settings.get(field):
+                return False, message
+
+        try:
+            int(settings['smtp_port'])
+        except (TypeError, ValueError):
+            return False, "SMTP端口必须是数字"
+
+        return True, "邮箱配置验证通过"
+
+    def prepare(self, settings):
+        """预先解析SMTP连接参数"""
+        self.smtp_server = settings['smtp_server']
+        self.smtp_port = int(settings['smtp_port'])
+        self.sender_email = settings['sender_email']
+        self.email_password = settings['email_password']
+        self.receiver_email = settings['receiver_email']
+        # smtp_ssl为False时使用明文SMTP（如本地模拟推送服务器）
+        self.smtp_class = smtplib.SMTP_SSL if settings.get('smtp_ssl', True) else smtplib.SMTP
 
     def _create_smtp_client(self):
         """创建SMTP客户端连接"""
         try:
-            server = smtplib.SMTP_SSL(self.config['smtp_server'], 
-                                    int(self.config['smtp_port']))
-            server.login(self.config['sender_email'], 
-                       self.config['email_password'])
+            server = self.smtp_class(self.smtp_server, self.smtp_port, timeout=self.timeout)
+            server.login(self.sender_email, self.email_password)
             return server
         except Exception as e:
-            self.logger(f"创建SMTP连接失败: {str(e)}", "ERROR")
+            self.log_callback(f"创建SMTP连接失败: {str(e)}", "ERROR")
             return None
 
     def test(self):
         """测试邮件发送"""
+        if not self.config_valid:
+            return False, self.config_message
+
         try:
             server = self._create_smtp_client()
             if not server:
@@ -34,8 +70,8 @@ class EmailPusher:
             # 创建测试邮件
             msg = MIMEText("这是一条测试推送，如果您收到说明邮件推送配置正确。", 'plain', 'utf-8')
             msg['Subject'] = 'POE2交易助手 - 邮件推送测试'
-            msg['From'] = self.config['sender_email']
-            msg['To'] = self.config['receiver_email']
+            msg['From'] = self.sender_email
+            msg['To'] = self.receiver_email
 
             # 发送测试邮件
             server.send_message(msg)
@@ -55,8 +91,10 @@ class EmailPusher:
             success: 是否发送成功
             message: 结果信息
         """
-        if not self.config.get('enabled', True):
+        if not self.settings.get('enabled', True):
             return False, "邮箱推送未启用"
+        if not self.config_valid:
+            return False, self.config_message
 
         try:
             server = self._create_smtp_client()
@@ -66,8 +104,8 @@ class EmailPusher:
             # 创建邮件
             msg = MIMEMultipart()
             msg['Subject'] = f'POE2交易助手 - {title}'
-            msg['From'] = self.config['sender_email']
-            msg['To'] = self.config['receiver_email']
+            msg['From'] = self.sender_email
+            msg['To'] = self.receiver_email
 
             # 添加HTML内容和纯文本内容
             text_content = MIMEText(content, 'plain', 'utf-8')
@@ -83,5 +121,5 @@ class EmailPusher:
 
         except Exception as e:
             error_msg = f"邮件发送失败: {str(e)}"
-            self.logger(error_msg, "ERROR")
-            return False, error_msg
\ No newline at end of file
+            self.log_callback(error_msg, "ERROR")
+            return False, error_msg
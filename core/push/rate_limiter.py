@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# 推送优先级通道，数值越小优先级越高
+PRIORITY_TRADE = 0  # 交易模式消息
+PRIORITY_MESSAGE = 1  # 消息模式消息
+
+# 各推送渠道的默认限流参数
+# capacity: 令牌桶容量（允许的突发条数）
+# refill_per_minute: 每分钟补充的令牌数
+# daily_quota: 每日配额，0表示不限
+# trade_reserve_ratio: 为交易消息预留的令牌/配额比例，消息模式不能占用这部分
+DEFAULT_LIMITS = {
+    'wxpusher': {'capacity': 20, 'refill_per_minute': 20, 'daily_quota': 0, 'trade_reserve_ratio': 0.3},
+    'serverchan': {'capacity': 5, 'refill_per_minute': 5, 'daily_quota': 0, 'trade_reserve_ratio': 0.4},
+    'qmsgchan': {'capacity': 10, 'refill_per_minute': 10, 'daily_quota': 0, 'trade_reserve_ratio': 0.3},
+    'email': {'capacity': 10, 'refill_per_minute': 5, 'daily_quota': 0, 'trade_reserve_ratio': 0.3},
+}
+
+DEFAULT_STATE_FILE = 'push_limiter_state.json'
+DEFAULT_SAVE_INTERVAL = 5.0  # 限流状态写盘的最短间隔（秒）
+
+
+class TokenBucket:
+    """单个推送渠道的令牌桶，附带每日配额计数"""
+
+    def __init__(self, capacity, refill_per_minute, daily_quota=0, trade_reserve_ratio=0.3):
+        self.capacity = max(1.0, float(capacity))
+        self.refill_rate = max(0.0, float(refill_per_minute)) / 60.0  # 每秒补充数
+        self.daily_quota = max(0, int(daily_quota))
+        self.trade_reserve_ratio = min(max(float(trade_reserve_ratio), 0.0), 1.0)
+
+        self.tokens = self.capacity
+        self.updated_at = None
+        self.day = None
+        self.used_today = 0
+
+    def _refill(self, now):
+        """根据经过的时间补充令牌并处理跨天"""
+        if self.updated_at is not None and now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+        today = datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+        if self.day != today:
+            self.day = today
+            self.used_today = 0
+
+    def try_acquire(self, priority, now):
+        """尝试为指定优先级获取一个令牌
+
+        Returns:
+            tuple: (是否允许发送, 拒绝原因)
+        """
+        self._refill(now)
+
+        # 交易消息可以使用全部令牌，消息模式必须给交易消息留出预留部分
+        if priority == PRIORITY_TRADE:
+            min_tokens = 1.0
+            quota_limit = self.daily_quota
+        else:
+            min_tokens = 1.0 + self.capacity * self.trade_reserve_ratio
+            quota_limit = int(self.daily_quota * (1 - self.trade_reserve_ratio))
+
+        if self.daily_quota and self.used_today >= quota_limit:
+            return False, "已达到每日推送配额"
+        if self.tokens < min_tokens:
+            return False, "推送频率超过限制"
+
+        self.tokens -= 1.0
+        self.used_today += 1
+        return True, ""
+
+    def to_dict(self):
+        """导出可持久化的状态"""
+        return {
+            'tokens': self.tokens,
+            'updated_at': self.updated_at,
+            'day': self.day,
+            'used_today': self.used_today
+        }
+
+    def load_dict(self, data):
+        """从持久化状态恢复"""
+        self.tokens = min(self.capacity, float(data.get('tokens', self.capacity)))
+        self.updated_at = data.get('updated_at')
+        self.day = data.get('day')
+        self.used_today = int(data.get('used_today', 0))
+
+
+class PushRateLimiter:
+    """按渠道限流的推送限流器，交易消息优先于普通关键词消息"""
+
+    def __init__(self, limits=None, state_file=DEFAULT_STATE_FILE, log_callback=None, clock=None,
+                 save_interval=DEFAULT_SAVE_INTERVAL):
+        """
+        初始化限流器
+        :param limits: 渠道限流参数 {channel: {capacity, refill_per_minute, daily_quota, trade_reserve_ratio}}
+        :param state_file: 限流状态持久化文件，为None时不持久化
+        :param log_callback: 日志回调函数
+        :param clock: 时间函数，默认time.time
+        :param save_interval: 状态写盘的最短间隔（秒），期间的变化在下一次写盘或flush()时保存
+        """
+        self.log_callback = log_callback or (lambda msg, level: None)
+        self.clock = clock or time.time
+        self.state_file = state_file
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # 串行化写盘，不占用限流锁
+        self.dirty = False
+        self.last_saved = None
+
+        self.limits = {channel: dict(params) for channel, params in DEFAULT_LIMITS.items()}
+        for channel, params in (limits or {}).items():
+            if isinstance(params, dict):
+                self.limits.setdefault(channel, {}).update(params)
+
+        self.buckets = {}
+        self.rejected = {}  # 被限流的次数 {channel: {priority: count}}
+        self._load_state()
+
+    @classmethod
+    def from_config(cls, config, log_callback=None):
+        """从配置对象创建限流器"""
+        return cls(
+            limits=config.get('push_rate_limit', {}),
+            state_file=config.get('push_limiter_state_file', DEFAULT_STATE_FILE),
+            log_callback=log_callback
+        )
+
+    def _get_bucket(self, channel):
+        """获取渠道的令牌桶，不存在时按默认参数创建"""
+        bucket = self.buckets.get(channel)
+        if bucket is None:
+            params = self.limits.get(channel) or DEFAULT_LIMITS['wxpusher']
+            bucket = TokenBucket(**params)
+            self.buckets[channel] = bucket
+        return bucket
+
+    def acquire(self, channel, priority=PRIORITY_MESSAGE):
+        """
+        为一次推送申请令牌
+        :param channel: 推送渠道名称
+        :param priority: 优先级，PRIORITY_TRADE 或 PRIORITY_MESSAGE
+        :return: (allowed, message)
+        """
+        with self.lock:
+            allowed, reason = self._get_bucket(channel).try_acquire(priority, self.clock())
+            if not allowed:
+                lane = self.rejected.setdefault(channel, {})
+                lane[priority] = lane.get(priority, 0) + 1
+            self.dirty = True
+            now = self.clock()
+            due = self.last_saved is None or now - self.last_saved >= self.save_interval
+
+        if due:
+            self.flush()
+
+        if not allowed:
+            lane_name = "交易" if priority == PRIORITY_TRADE else "消息"
+            self.log_callback(f"{channel} {lane_name}推送被限流: {reason}", "WARN")
+        return allowed, reason
+
+    def get_stats(self):
+        """获取各渠道的令牌余量、当日用量和限流次数"""
+        with self.lock:
+            now = self.clock()
+            stats = {}
+            for channel, bucket in self.buckets.items():
+                bucket._refill(now)
+                stats[channel] = {
+                    'tokens': round(bucket.tokens, 2),
+                    'used_today': bucket.used_today,
+                    'daily_quota': bucket.daily_quota,
+                    'rejected': dict(self.rejected.get(channel, {}))
+                }
+            return stats
+
+    def _load_state(self):
+        """加载持久化的限流状态，保证重启后每日配额仍然有效"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            for channel, data in state.items():
+                if isinstance(data, dict):
+                    self._get_bucket(channel).load_dict(data)
+        except Exception as e:
+            self.log_callback(f"加载推送限流状态失败: {str(e)}", "ERROR")
+
+    def flush(self):
+        """把尚未保存的限流状态写入文件，退出或停止监控时调用"""
+        if not self.state_file:
+            return
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                state = {channel: bucket.to_dict() for channel, bucket in self.buckets.items()}
+                self.dirty = False
+                self.last_saved = self.clock()
+            try:
+                tmp_file = f"{self.state_file}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_file, self.state_file)
+            except Exception as e:
+                with self.lock:
+                    self.dirty = True
+                self.log_callback(f"保存推送限流状态失败: {str(e)}", "ERROR")
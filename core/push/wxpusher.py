@@ -3,62 +3,61 @@ from .base import PushBase
 
 class WxPusher(PushBase):
     """WxPusher推送实现"""
-    
+
+    channel = 'wxpusher'
+    default_api_url = "http://wxpusher.zjiecode.com/api/send/message"
+
     def __init__(self, config, log_callback=None):
+        self.session = requests.Session()
         super().__init__(config, log_callback)
-        self.api_url = "http://wxpusher.zjiecode.com/api/send/message"
-        
-    def validate_config(self):
+
+    def check_settings(self, settings):
         """验证WxPusher配置"""
-        wxpusher_config = self.config.get('wxpusher', {})
-        app_token = wxpusher_config.get('app_token')
-        uid = wxpusher_config.get('uid')
-        
-        if not app_token:
+        if not settings.get('app_token'):
             return False, "请配置WxPusher的APP Token"
-        if not uid:
+        if not settings.get('uid'):
             return False, "请配置WxPusher的用户UID"
-            
+
         return True, "WxPusher配置验证通过"
-        
+
+    def prepare(self, settings):
+        """预先构造请求地址和请求体模板"""
+        # api_url可在配置中覆盖，便于连接本地模拟推送服务器
+        self.api_url = settings.get('api_url') or self.default_api_url
+        self.payload_template = {
+            "appToken": settings['app_token'],
+            "contentType": 1,
+            "uids": [settings['uid']]
+        }
+
     def send(self, keyword, content):
         """发送WxPusher推送"""
+        if not self.config_valid:
+            return False, self.config_message
+
         try:
-            # 验证配置
-            success, msg = self.validate_config()
-            if not success:
-                self.log_callback(msg, "ERROR")
-                return False, msg
-                
             # 构造消息
             message = f"🔔 日志报警 [{keyword}]\n{content}"
             self.log_callback(f"WxPusher推送内容: {message}", "ALERT")
-            
+
             # 发送请求
-            response = requests.post(
-                self.api_url,
-                json={
-                    "appToken": self.config.get('wxpusher', {}).get('app_token'),
-                    "content": message,
-                    "contentType": 1,
-                    "uids": [self.config.get('wxpusher', {}).get('uid')]
-                },
-                timeout=10
-            )
-            
+            payload = dict(self.payload_template)
+            payload["content"] = message
+            response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+
             # 处理响应
             result = response.json()
             if result["code"] != 1000:
                 raise Exception(result["msg"])
-                
+
             self.log_callback("WxPusher推送成功", "INFO")
             return True, "推送成功"
-            
+
         except Exception as e:
             error_msg = f"WxPusher推送失败: {str(e)}"
             self.log_callback(error_msg, "ERROR")
             return False, error_msg
-            
+
     def test(self):
         """测试WxPusher配置"""
         return self.send("测试", "这是一条测试消息")
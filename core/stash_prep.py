@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+
+
+class StashPreparation:
+    """等待买家进入区域期间，在后台预先打开仓库、选择标签页并定位仓库网格
+
+    每一步之间检查取消标志，买家未进入时调用cancel()可及时停止；
+    仓库是否已打开由stash_opened记录，由调用方在取消后关闭仓库。
+    """
+
+    def __init__(self, open_stash, tab_select, take_out_item, tab=None,
+                 stash_interval=1.0, tab_interval=0.5, clock=None):
+        """
+        初始化仓库预备
+        :param open_stash: 打开仓库模块
+        :param tab_select: 选择标签页模块
+        :param take_out_item: 取出物品模块，使用其locate_grid()定位网格
+        :param tab: 仓库标签页名称，为空时跳过选择
+        :param stash_interval: 打开仓库后的等待时间（秒）
+        :param tab_interval: 切换标签页后的等待时间（秒）
+        :param clock: 时间函数，默认time.monotonic
+        """
+        self.open_stash = open_stash
+        self.tab_select = tab_select
+        self.take_out_item = take_out_item
+        self.tab = tab
+        self.stash_interval = stash_interval
+        self.tab_interval = tab_interval
+        self.clock = clock or time.monotonic
+        self.logger = logging.getLogger("StashPreparation")
+
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+        # 预备结果
+        self.stash_opened = False
+        self.tab_selected = False
+        self.grid = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        """在后台线程中开始预备"""
+        self.started_at = self.clock()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        """依次执行打开仓库、选择标签页和定位网格"""
+        try:
+            if self.cancel_event.is_set():
+                return
+            if not self.open_stash.run():
+                self.error = "打开仓库失败"
+                return
+            self.stash_opened = True
+            if self.cancel_event.wait(self.stash_interval):
+                return
+
+            if self.tab:
+                if not self.tab_select.run(tab_text=self.tab):
+                    self.error = "选择仓库标签页失败"
+                    return
+                self.tab_selected = True
+                if self.cancel_event.wait(self.tab_interval):
+                    return
+
+            self.grid = self.take_out_item.locate_grid()
+            if not self.grid:
+                self.error = "定位仓库网格失败"
+        except Exception as e:
+            self.error = str(e)
+            self.logger.error(f"仓库预备出错: {str(e)}")
+        finally:
+            self.finished_at = self.clock()
+
+    def wait(self, timeout=None):
+        """等待预备结束，返回是否已结束"""
+        if self.thread:
+            self.thread.join(timeout)
+            return not self.thread.is_alive()
+        return True
+
+    def cancel(self, timeout=None):
+        """取消预备并等待后台线程退出（正在执行的单个步骤会先完成）"""
+        self.cancel_event.set()
+        return self.wait(timeout)
+
+    @property
+    def ready(self):
+        """仓库、标签页和网格均已准备好"""
+        return self.grid is not None and (self.tab_selected or not self.tab)
+
+    @property
+    def elapsed(self):
+        """预备耗时（秒），未结束时为None"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
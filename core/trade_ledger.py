@@ -0,0 +1,343 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_LEDGER_FILE = 'trade_ledger.db'
+# meta表中旧版本config.json统计数据（基线）的键
+LEGACY_STATS_KEY = 'legacy_stats'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    user TEXT,
+    item TEXT,
+    price REAL,
+    currency TEXT,
+    tab TEXT,
+    p1 TEXT,
+    p2 TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_requests_ts ON requests(ts);
+CREATE INDEX IF NOT EXISTS idx_requests_currency_ts ON requests(currency, ts);
+
+CREATE TABLE IF NOT EXISTS trades (
+    uid TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    user TEXT,
+    item TEXT,
+    price REAL,
+    currency TEXT,
+    outcome TEXT,
+    reason TEXT,
+    duration_ms REAL,
+    time_saved_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trades_started ON trades(started_at);
+CREATE INDEX IF NOT EXISTS idx_trades_outcome ON trades(outcome, started_at);
+
+CREATE TABLE IF NOT EXISTS spans (
+    trade_uid TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    kind TEXT,
+    offset_ms REAL,
+    duration_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_spans_trade ON spans(trade_uid);
+CREATE INDEX IF NOT EXISTS idx_spans_stage ON spans(stage);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _to_float(value):
+    """把报价转换为数字，无法解析时返回None"""
+    try:
+        return float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _clean(value):
+    """去除字段首尾空白，空值返回None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+class TradeLedger:
+    """SQLite交易账本
+
+    记录每条交易请求、每笔交易的结果和分阶段耗时。写入先进入队列，
+    由后台线程批量提交（WAL模式），调用方（监控线程、交易线程）不会被磁盘IO阻塞；
+    读取使用独立连接，WAL模式下不会与写入互相阻塞。
+    """
+
+    def __init__(self, db_path=DEFAULT_LEDGER_FILE, batch_size=100, flush_interval=1.0):
+        """
+        初始化交易账本
+        :param db_path: 数据库文件路径
+        :param batch_size: 单次事务最多提交的写入数
+        :param flush_interval: 收到第一条写入后最多等待多久提交（秒）
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger("TradeLedger")
+
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+        self.read_conn = self._connect(check_same_thread=False)
+        self.read_lock = threading.Lock()
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer.start()
+
+    def _connect(self, check_same_thread=True):
+        """创建数据库连接并启用WAL"""
+        conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---------- 写入（异步批量） ----------
+
+    def _enqueue(self, sql, params):
+        """把写入放入队列"""
+        if self.closed:
+            return
+        self.queue.put((sql, params))
+
+    def _writer_loop(self):
+        """后台写入线程：攒批后在一个事务中提交"""
+        conn = self._connect()
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                stop = False
+                while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        next_item = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if next_item is None:
+                        stop = True
+                        break
+                    batch.append(next_item)
+
+                self._commit(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        """提交一批写入，flush标记在提交后置位"""
+        events = []
+        try:
+            with conn:
+                for item in batch:
+                    if isinstance(item, threading.Event):
+                        events.append(item)
+                        continue
+                    sql, params = item
+                    if params and isinstance(params[0], (list, tuple)):
+                        conn.executemany(sql, params)
+                    else:
+                        conn.execute(sql, params)
+        except Exception as e:
+            self.logger.error(f"交易账本写入失败: {str(e)}")
+        finally:
+            for event in events:
+                event.set()
+
+    def flush(self, timeout=5.0):
+        """等待此前的写入全部提交"""
+        if self.closed:
+            return True
+        event = threading.Event()
+        self.queue.put(event)
+        return event.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """提交剩余写入并关闭账本"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.writer.join(timeout)
+        with self.read_lock:
+            self.read_conn.close()
+
+    def record_request(self, parsed, ts=None):
+        """
+        记录一条交易请求
+        :param parsed: 交易消息解析结果 {user, item, price, currency, tab, p1_num, p2_num}
+        :param ts: 时间戳，默认当前时间
+        """
+        self._enqueue(
+            "INSERT INTO requests (ts, user, item, price, currency, tab, p1, p2) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (ts or time.time(), _clean(parsed.get('user')), _clean(parsed.get('item')),
+             _to_float(parsed.get('price')), _clean(parsed.get('currency')),
+             _clean(parsed.get('tab')), _clean(parsed.get('p1_num')), _clean(parsed.get('p2_num')))
+        )
+
+    def record_trade(self, uid, parsed, outcome, started_at, ended_at=None,
+                     reason=None, spans=None, time_saved=None):
+        """
+        记录一笔交易的结果和分阶段耗时
+        :param uid: 交易唯一ID
+        :param parsed: 交易消息解析结果
+        :param outcome: 结果 completed / failed
+        :param started_at: 开始时间戳
+        :param ended_at: 结束时间戳，默认当前时间
+        :param reason: 失败原因
+        :param spans: TradeTracer记录的阶段列表
+        :param time_saved: 流水线预备节省的时间（秒）
+        """
+        ended_at = ended_at or time.time()
+        self._enqueue(
+            "INSERT OR REPLACE INTO trades (uid, started_at, ended_at, user, item, price, currency, "
+            "outcome, reason, duration_ms, time_saved_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (uid, started_at, ended_at, _clean(parsed.get('user')), _clean(parsed.get('item')),
+             _to_float(parsed.get('price')), _clean(parsed.get('currency')), outcome, reason,
+             (ended_at - started_at) * 1000,
+             time_saved * 1000 if time_saved is not None else None)
+        )
+        if spans:
+            self._enqueue(
+                "INSERT INTO spans (trade_uid, stage, kind, offset_ms, duration_ms) VALUES (?, ?, ?, ?, ?)",
+                [(uid, s['stage'], s.get('kind'), s.get('offset_ms'), s.get('duration_ms')) for s in spans]
+            )
+
+    def reset_stats(self):
+        """重置统计起点，历史记录保留"""
+        self._enqueue(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('stats_since', ?)",
+            (str(time.time()),)
+        )
+
+    def import_legacy_stats(self, currency_stats, message_count=0, ts=None):
+        """
+        把旧版本保存在config.json中的通货统计和交易消息数导入为统计基线，只导入一次
+        基线时间为导入时刻，统计起点在基线之前（未重置过统计）时计入汇总，重置统计后不再计入
+        :param currency_stats: {currency: amount}
+        :param message_count: 交易消息数
+        :param ts: 基线时间戳，默认当前时间
+        :return: 是否导入
+        """
+        if self._legacy_stats() is not None:
+            return False
+        totals = {}
+        for currency, amount in (currency_stats or {}).items():
+            amount = _to_float(amount)
+            if _clean(currency) and amount and amount > 0:
+                totals[_clean(currency)] = amount
+        try:
+            message_count = max(0, int(message_count or 0))
+        except (TypeError, ValueError):
+            message_count = 0
+        if not totals and not message_count:
+            return False
+        baseline = {'ts': ts or time.time(), 'currency_stats': totals, 'message_count': message_count}
+        self._enqueue("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                      (LEGACY_STATS_KEY, json.dumps(baseline, ensure_ascii=False)))
+        self.flush()
+        return True
+
+    # ---------- 查询 ----------
+
+    def _query(self, sql, params=()):
+        """执行查询"""
+        with self.read_lock:
+            return self.read_conn.execute(sql, params).fetchall()
+
+    def stats_since(self):
+        """统计起点时间戳，未重置过时为0"""
+        rows = self._query("SELECT value FROM meta WHERE key = 'stats_since'")
+        return float(rows[0][0]) if rows else 0.0
+
+    def _legacy_stats(self):
+        """导入的旧版本统计基线，未导入时为None"""
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (LEGACY_STATS_KEY,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def _baseline(self, since):
+        """统计起点不晚于基线时间时返回基线，否则返回None"""
+        baseline = self._legacy_stats()
+        if baseline is None or since > baseline['ts']:
+            return None
+        return baseline
+
+    def request_count(self, since=None):
+        """统计起点之后的交易请求数（含旧版本统计基线）"""
+        since = self.stats_since() if since is None else since
+        count = self._query("SELECT COUNT(*) FROM requests WHERE ts >= ?", (since,))[0][0]
+        baseline = self._baseline(since)
+        return count + baseline['message_count'] if baseline else count
+
+    def currency_totals(self, since=None):
+        """统计起点之后各通货的报价总数 {currency: amount}（含旧版本统计基线）"""
+        since = self.stats_since() if since is None else since
+        rows = self._query(
+            "SELECT currency, SUM(price) FROM requests "
+            "WHERE ts >= ? AND currency IS NOT NULL AND price > 0 GROUP BY currency",
+            (since,)
+        )
+        totals = {currency: total for currency, total in rows}
+        baseline = self._baseline(since)
+        if baseline:
+            for currency, amount in baseline['currency_stats'].items():
+                totals[currency] = totals.get(currency, 0.0) + amount
+        return totals
+
+    def outcome_counts(self, since=None):
+        """统计起点之后各交易结果的数量 {outcome: count}"""
+        since = self.stats_since() if since is None else since
+        rows = self._query(
+            "SELECT outcome, COUNT(*) FROM trades WHERE started_at >= ? GROUP BY outcome",
+            (since,)
+        )
+        return dict(rows)
+
+    def recent_trades(self, limit=50):
+        """最近的交易记录，按开始时间从新到旧"""
+        rows = self._query(
+            "SELECT uid, started_at, ended_at, user, item, price, currency, outcome, reason, "
+            "duration_ms, time_saved_ms FROM trades ORDER BY started_at DESC LIMIT ?",
+            (limit,)
+        )
+        keys = ('uid', 'started_at', 'ended_at', 'user', 'item', 'price', 'currency',
+                'outcome', 'reason', 'duration_ms', 'time_saved_ms')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def trade_spans(self, uid):
+        """某笔交易的分阶段耗时"""
+        rows = self._query(
+            "SELECT stage, kind, offset_ms, duration_ms FROM spans WHERE trade_uid = ? ORDER BY offset_ms",
+            (uid,)
+        )
+        return [dict(zip(('stage', 'kind', 'offset_ms', 'duration_ms'), row)) for row in rows]
@@ -0,0 +1,72 @@
+import re
+from enum import Enum
+from typing import Optional
+
+
+class TradeEvent(Enum):
+    """交易过程中需要识别的游戏日志事件"""
+    JOINED = "进入区域"
+    ACCEPTED = "接受交易"
+    COMPLETED = "交易完成"
+    CANCELLED = "交易取消"
+
+
+# 固定的日志结尾短语 -> (短语前需要紧跟的内容模板, 事件)，{user}为买家名称
+SUFFIX_RULES = (
+    ("進入了此區域。", "{user} ", TradeEvent.JOINED),
+    ("已接受交易。", "{user} ", TradeEvent.ACCEPTED),
+    ("的交易完成。", "與 {user} ", TradeEvent.COMPLETED),
+    ("交易取消。", "", TradeEvent.CANCELLED),
+)
+
+
+def _is_name_char(ch):
+    """是否可能是角色名的一部分"""
+    return ch.isalnum() or ch == '_'
+
+
+class TradeLogMatcher:
+    """单笔交易的日志匹配器，交易开始时按买家名称构建一次
+
+    按固定的中文结尾短语分派，每行日志只需几次endswith比较即可分类，
+    买家名称按字面比较，不受正则特殊字符影响。
+    """
+
+    def __init__(self, user):
+        """
+        初始化匹配器
+        :param user: 买家角色名
+        """
+        self.user = user
+        self.rules = tuple(
+            (suffix, prefix.format(user=user), event)
+            for suffix, prefix, event in SUFFIX_RULES
+        )
+        # 供临时日志触发器使用的等价正则（名称已转义）
+        self.join_regex = re.compile(
+            r"(?<![\w])" + re.escape(user) + r" 進入了此區域。\s*$"
+        )
+
+    def classify(self, line) -> Optional[TradeEvent]:
+        """
+        对一行日志分类
+        :param line: 日志行
+        :return: 对应的交易事件，与当前交易无关时返回None
+        """
+        line = line.rstrip()
+        for suffix, prefix, event in self.rules:
+            if not line.endswith(suffix):
+                continue
+            head = line[:-len(suffix)]
+            if not head.endswith(prefix):
+                return None
+            # 名称前必须是分隔符，避免 XBuyer 误匹配 Buyer
+            start = len(head) - len(prefix)
+            if prefix and start > 0 and _is_name_char(head[start - 1]):
+                return None
+            return event
+        return None
+
+    def matches(self, line, event) -> bool:
+        """日志行是否为指定事件"""
+        return self.classify(line) == event
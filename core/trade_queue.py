@@ -0,0 +1,259 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+# 默认通货折算比例，以崇高石(exalted)为基准单位，可在配置 auto_trade.currency_rates 中覆盖
+DEFAULT_CURRENCY_RATES = {
+    'exalted': 1.0,
+    'chaos': 5.0,
+    'divine': 100.0,
+}
+
+PRIORITY_PRICE = 'price'  # 按折算价格从高到低，同价按到达时间
+PRIORITY_FIFO = 'fifo'    # 按到达时间先到先得
+
+WAIT_SAMPLE_SIZE = 200  # 等待时间统计保留的样本数
+
+
+def price_value(price, currency, rates):
+    """
+    把报价折算为基准通货数量
+    :param price: 报价数量（字符串或数字）
+    :param currency: 通货名称
+    :param rates: {通货名称(小写): 折合基准通货数量}
+    :return: 折算后的数量，无法解析或未知通货返回0
+    """
+    try:
+        amount = float(str(price).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return 0.0
+    rate = rates.get(str(currency or '').strip().lower())
+    if rate is None:
+        return 0.0
+    return amount * rate
+
+
+@dataclass
+class PendingTrade:
+    """等待处理的交易请求"""
+    buyer: str
+    message: str
+    template: str
+    parsed: dict
+    value: float
+    arrived_at: float
+    last_seen: float
+    version: int = 0
+    merged: int = 0
+
+
+@dataclass
+class _QueueStats:
+    """队列累计统计"""
+    enqueued: int = 0
+    merged: int = 0
+    expired: int = 0
+    dropped: int = 0
+    dequeued: int = 0
+    waits: deque = field(default_factory=lambda: deque(maxlen=WAIT_SAMPLE_SIZE))
+
+
+class TradeQueue:
+    """待处理交易请求的优先队列
+
+    同一买家的请求合并为一条（保留最早的到达时间，内容更新为最新请求），
+    超过有效期未被处理的请求自动过期。pop()阻塞在条件变量上，
+    有请求入队或队列关闭时立即返回。
+    """
+
+    def __init__(self, ttl_seconds=120, max_size=20, priority=PRIORITY_PRICE,
+                 currency_rates=None, clock=None, on_discard=None):
+        """
+        初始化交易队列
+        :param ttl_seconds: 请求有效期（秒），从买家最后一次发送算起
+        :param max_size: 最大排队数量，满时淘汰优先级最低的请求
+        :param priority: 排序方式 PRIORITY_PRICE / PRIORITY_FIFO
+        :param currency_rates: 通货折算比例，默认DEFAULT_CURRENCY_RATES
+        :param clock: 时间函数，默认time.monotonic
+        :param on_discard: 请求未被处理就离开队列（被淘汰、过期或清空）时的回调，参数为PendingTrade，
+                           在队列锁内调用，不能再操作队列
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max(1, int(max_size))
+        self.priority = priority
+        self.currency_rates = {}
+        self.set_currency_rates(currency_rates)
+        self.clock = clock or time.monotonic
+        self.on_discard = on_discard
+
+        self.condition = threading.Condition()
+        self.pending = {}  # {buyer: PendingTrade}
+        self.heap = []     # [(排序键, version, buyer)]，合并或移除后的旧条目延迟删除
+        self.sequence = itertools.count()
+        self.closed = False
+        self.stats = _QueueStats()
+
+    def set_currency_rates(self, rates):
+        """更新通货折算比例（名称不区分大小写）"""
+        merged = dict(DEFAULT_CURRENCY_RATES)
+        merged.update({str(k).strip().lower(): float(v) for k, v in (rates or {}).items()})
+        self.currency_rates = merged
+
+    def _sort_key(self, entry):
+        """计算排序键，越小越优先"""
+        if self.priority == PRIORITY_FIFO:
+            return (entry.arrived_at,)
+        return (-entry.value, entry.arrived_at)
+
+    def _push_heap(self, entry):
+        """把请求的当前版本放入堆，版本号全局唯一（调用方需持有锁）"""
+        entry.version = next(self.sequence)
+        heapq.heappush(self.heap, (self._sort_key(entry), entry.version, entry.buyer))
+
+    def push(self, buyer, message, template, parsed):
+        """
+        加入交易请求
+        :return: 'added' / 'merged' / 'dropped'
+        """
+        buyer = (buyer or '').strip()
+        now = self.clock()
+        value = price_value(parsed.get('price'), parsed.get('currency'), self.currency_rates)
+
+        with self.condition:
+            self._expire(now)
+            entry = self.pending.get(buyer)
+            if entry:
+                # 同一买家重复发送，保留排队位置，内容以最新请求为准
+                entry.message = message
+                entry.template = template
+                entry.parsed = parsed
+                entry.value = value
+                entry.last_seen = now
+                entry.merged += 1
+                self.stats.merged += 1
+                self._push_heap(entry)
+                self.condition.notify_all()
+                return 'merged'
+
+            entry = PendingTrade(buyer, message, template, parsed, value, now, now)
+            if len(self.pending) >= self.max_size:
+                lowest = max(self.pending.values(), key=self._sort_key)
+                if self._sort_key(entry) >= self._sort_key(lowest):
+                    self.stats.dropped += 1
+                    return 'dropped'
+                del self.pending[lowest.buyer]
+                self.stats.dropped += 1
+                self._discarded(lowest)
+
+            self.pending[buyer] = entry
+            self.stats.enqueued += 1
+            self._push_heap(entry)
+            self.condition.notify_all()
+            return 'added'
+
+    def pop(self, timeout=None) -> Optional[PendingTrade]:
+        """
+        取出优先级最高的有效请求
+        :param timeout: 最长等待时间（秒），None表示一直等待
+        :return: PendingTrade，超时或队列已关闭返回None
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while True:
+                if self.closed:
+                    return None
+                now = self.clock()
+                self._expire(now)
+                entry = self._pop_valid()
+                if entry:
+                    self.stats.dequeued += 1
+                    self.stats.waits.append(now - entry.arrived_at)
+                    return entry
+
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return None
+                # 有排队请求时在最早的过期时间醒来清理
+                if self.pending:
+                    next_expiry = min(e.last_seen for e in self.pending.values()) + self.ttl_seconds - now
+                    remaining = next_expiry if remaining is None else min(remaining, next_expiry)
+                self.condition.wait(remaining)
+
+    def _pop_valid(self):
+        """弹出堆顶的有效条目，跳过已合并或已删除的旧条目（调用方需持有锁）"""
+        while self.heap:
+            _, version, buyer = heapq.heappop(self.heap)
+            entry = self.pending.get(buyer)
+            if entry and entry.version == version:
+                del self.pending[buyer]
+                return entry
+        return None
+
+    def _expire(self, now):
+        """移除超过有效期的请求（调用方需持有锁）"""
+        expired = [buyer for buyer, e in self.pending.items() if now - e.last_seen > self.ttl_seconds]
+        for buyer in expired:
+            self._discarded(self.pending.pop(buyer))
+        self.stats.expired += len(expired)
+        if not self.pending:
+            self.heap.clear()
+
+    def _discarded(self, entry):
+        """通知请求未被处理就离开了队列（调用方需持有锁）"""
+        if self.on_discard:
+            self.on_discard(entry)
+
+    def remove(self, buyer):
+        """移除指定买家的请求"""
+        with self.condition:
+            return self.pending.pop((buyer or '').strip(), None) is not None
+
+    def clear(self):
+        """清空所有请求，未处理的请求逐个通过on_discard通知"""
+        with self.condition:
+            for entry in self.pending.values():
+                self._discarded(entry)
+            self.pending.clear()
+            self.heap.clear()
+
+    def close(self):
+        """关闭队列并唤醒等待线程"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def open(self):
+        """重新打开队列"""
+        with self.condition:
+            self.closed = False
+
+    def __len__(self):
+        with self.condition:
+            return len(self.pending)
+
+    def get_stats(self):
+        """获取队列深度和等待时间统计"""
+        with self.condition:
+            now = self.clock()
+            self._expire(now)
+            waits = sorted(self.stats.waits)
+            oldest = max((now - e.arrived_at for e in self.pending.values()), default=0.0)
+            return {
+                'depth': len(self.pending),
+                'max_size': self.max_size,
+                'enqueued': self.stats.enqueued,
+                'merged': self.stats.merged,
+                'expired': self.stats.expired,
+                'dropped': self.stats.dropped,
+                'dequeued': self.stats.dequeued,
+                'oldest_wait_ms': int(oldest * 1000),
+                'avg_wait_ms': int(sum(waits) / len(waits) * 1000) if waits else 0,
+                'p90_wait_ms': int(waits[min(len(waits) - 1, int(len(waits) * 0.9))] * 1000) if waits else 0,
+                'max_wait_ms': int(waits[-1] * 1000) if waits else 0,
+            }
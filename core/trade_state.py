@@ -0,0 +1,121 @@
+import threading
+from enum import Enum
+
+
+class TradeState(Enum):
+    """交易状态枚举"""
+    IDLE = "空闲"
+    INVITING = "等待入组"
+    JOINED = "已入组"
+    STASH_OPENED = "仓库已打开"
+    ITEMS_TAKEN = "物品已取出"
+    TRADE_REQUESTED = "已发起交易"
+    TRADE_ACCEPTED = "交易已接受"
+    TRADE_COMPLETED = "交易完成"
+    TRADE_CANCELLED = "交易取消"
+    TRADE_FAILED = "交易失败"
+
+
+# 交易流程中允许的状态转换，TRADE_FAILED可以从任意非空闲状态进入
+TRANSITIONS = {
+    TradeState.IDLE: {TradeState.INVITING},
+    TradeState.INVITING: {TradeState.JOINED},
+    TradeState.JOINED: {TradeState.STASH_OPENED},
+    TradeState.STASH_OPENED: {TradeState.ITEMS_TAKEN, TradeState.TRADE_REQUESTED},
+    TradeState.ITEMS_TAKEN: {TradeState.TRADE_REQUESTED},
+    TradeState.TRADE_REQUESTED: {TradeState.TRADE_ACCEPTED, TradeState.TRADE_COMPLETED,
+                                 TradeState.TRADE_CANCELLED},
+    TradeState.TRADE_ACCEPTED: {TradeState.TRADE_COMPLETED, TradeState.TRADE_CANCELLED},
+    TradeState.TRADE_COMPLETED: {TradeState.IDLE},
+    TradeState.TRADE_CANCELLED: {TradeState.IDLE},
+    TradeState.TRADE_FAILED: {TradeState.IDLE},
+}
+
+# 交易结束状态，等待交易结果时任一状态出现即返回
+FINAL_STATES = (TradeState.TRADE_COMPLETED, TradeState.TRADE_CANCELLED, TradeState.TRADE_FAILED)
+
+
+class TradeStateMachine:
+    """线程安全的交易状态机
+
+    日志线程在解析到对应日志时调用transition()推进状态，交易线程通过wait_for()
+    阻塞在条件变量上，状态变化时立即被唤醒，无需轮询。
+    """
+
+    def __init__(self, on_change=None):
+        """
+        初始化状态机
+        :param on_change: 状态变化回调 (old_state, new_state)，在锁内按转换顺序调用，需保持轻量
+        """
+        self.condition = threading.Condition()
+        self.state = TradeState.IDLE
+        self.fail_reason = None
+        self.on_change = on_change
+
+    def transition(self, new_state, expected=None):
+        """
+        尝试转换到新状态
+        :param new_state: 目标状态
+        :param expected: 可选，当前状态必须属于其中之一
+        :return: 是否转换成功
+        """
+        with self.condition:
+            old_state = self.state
+            if expected is not None and old_state not in expected:
+                return False
+            if new_state not in TRANSITIONS[old_state]:
+                return False
+            self.state = new_state
+            if new_state == TradeState.IDLE:
+                self.fail_reason = None
+            self._notify(old_state, new_state)
+        return True
+
+    def fail(self, reason):
+        """把进行中的交易标记为失败并唤醒等待线程，空闲或已结束时返回False"""
+        with self.condition:
+            old_state = self.state
+            if old_state == TradeState.IDLE or old_state in FINAL_STATES:
+                return False
+            self.state = TradeState.TRADE_FAILED
+            self.fail_reason = reason
+            self._notify(old_state, TradeState.TRADE_FAILED)
+        return True
+
+    def reset(self):
+        """无条件回到空闲状态"""
+        with self.condition:
+            old_state = self.state
+            self.state = TradeState.IDLE
+            self.fail_reason = None
+            if old_state != TradeState.IDLE:
+                self._notify(old_state, TradeState.IDLE)
+
+    def _notify(self, old_state, new_state):
+        """唤醒等待线程并回调状态变化（调用方需持有锁）"""
+        self.condition.notify_all()
+        if self.on_change:
+            self.on_change(old_state, new_state)
+
+    def wait_for(self, states, timeout):
+        """
+        阻塞等待进入指定状态之一，交易被标记失败时也会立即返回
+        :param states: 等待的状态集合
+        :param timeout: 超时时间（秒）
+        :return: 返回时的状态，超时返回None
+        """
+        targets = set(states) | {TradeState.TRADE_FAILED}
+        with self.condition:
+            if self.condition.wait_for(lambda: self.state in targets, timeout):
+                return self.state
+            return None
+
+    def is_failed(self):
+        """交易是否已被标记为失败（如被禁用或监控停止中断）"""
+        with self.condition:
+            return self.state == TradeState.TRADE_FAILED
+
+    def get(self):
+        """获取当前状态"""
+        with self.condition:
+            return self.state
@@ -0,0 +1,149 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from core.trade_state import TradeState, FINAL_STATES
+
+DEFAULT_TRACE_FILE = 'trade_traces.jsonl'
+DEFAULT_MAX_FILE_BYTES = 5 * 1024 * 1024
+
+SPAN_STATE = 'state'    # 在某个交易状态停留的时间
+SPAN_MODULE = 'module'  # 一次流程模块调用
+SPAN_TRADE = 'trade'    # 整笔交易
+
+TOTAL_STAGE = '整笔交易'
+
+
+def percentile(sorted_values, pct):
+    """最近秩法计算百分位数，sorted_values需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class TradeTracer:
+    """交易分阶段耗时追踪
+
+    每笔交易记录各状态的停留时间和各流程模块的调用耗时，
+    最近的样本按阶段保存在有界缓冲区中用于计算百分位数，
+    设置了file_path时，每笔交易结束后以JSON行追加写入该文件。
+    """
+
+    def __init__(self, window=200, file_path=None,
+                 max_file_bytes=DEFAULT_MAX_FILE_BYTES, clock=None):
+        """
+        初始化追踪器
+        :param window: 每个阶段保留的最近样本数
+        :param file_path: 追踪记录文件路径（如DEFAULT_TRACE_FILE），为None时只保存在内存中
+        :param max_file_bytes: 文件超过该大小时轮转为 .1 备份
+        :param clock: 单调时间函数，默认time.monotonic
+        """
+        self.window = window
+        self.file_path = file_path
+        self.max_file_bytes = max_file_bytes
+        self.clock = clock or time.monotonic
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger("TradeTracer")
+
+        self.samples = {}  # {阶段: deque([耗时毫秒])}
+        self.current = None
+        self.trade_started = None
+        self.state_since = None
+
+    def begin_trade(self, user):
+        """开始记录一笔交易"""
+        with self.lock:
+            now = self.clock()
+            self.current = {
+                'user': user,
+                'started_at': time.time(),
+                'spans': []
+            }
+            self.trade_started = now
+            self.state_since = now
+
+    def _record(self, stage, kind, start, end):
+        """记录一个阶段（调用方需持有锁）"""
+        duration_ms = (end - start) * 1000
+        self.samples.setdefault(stage, deque(maxlen=self.window)).append(duration_ms)
+        if self.current is not None:
+            self.current['spans'].append({
+                'stage': stage,
+                'kind': kind,
+                'offset_ms': round((start - self.trade_started) * 1000, 1),
+                'duration_ms': round(duration_ms, 1)
+            })
+
+    def on_state_change(self, old_state, new_state):
+        """状态变化时记录上一个状态的停留时间"""
+        with self.lock:
+            if self.current is None:
+                return
+            now = self.clock()
+            if old_state != TradeState.IDLE and old_state not in FINAL_STATES:
+                self._record(old_state.value, SPAN_STATE, self.state_since, now)
+            self.state_since = now
+
+    @contextmanager
+    def span(self, stage):
+        """记录一次流程模块调用的耗时"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            end = self.clock()
+            with self.lock:
+                self._record(stage, SPAN_MODULE, start, end)
+
+    def add_span(self, stage, start, end):
+        """记录一段在其他线程中完成的模块耗时（start/end需与clock同一时间基准）"""
+        with self.lock:
+            self._record(stage, SPAN_MODULE, start, end)
+
+    def end_trade(self, outcome, reason=None):
+        """结束当前交易，写入整笔耗时并落盘"""
+        with self.lock:
+            if self.current is None:
+                return None
+            now = self.clock()
+            self._record(TOTAL_STAGE, SPAN_TRADE, self.trade_started, now)
+            trace = self.current
+            trace['outcome'] = outcome
+            if reason:
+                trace['reason'] = reason
+            self.current = None
+
+        self._write(trace)
+        return trace
+
+    def _write(self, trace):
+        """追加写入追踪记录文件"""
+        if not self.file_path:
+            return
+        try:
+            if os.path.exists(self.file_path) and os.path.getsize(self.file_path) > self.max_file_bytes:
+                os.replace(self.file_path, self.file_path + '.1')
+            with open(self.file_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trace, ensure_ascii=False) + '\n')
+        except Exception as e:
+            self.logger.error(f"写入交易追踪记录失败: {str(e)}")
+
+    def get_percentiles(self):
+        """获取各阶段最近样本的 p50/p90/p99 耗时（毫秒）"""
+        with self.lock:
+            snapshot = {stage: sorted(values) for stage, values in self.samples.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'p50': round(percentile(values, 50), 1),
+                'p90': round(percentile(values, 90), 1),
+                'p99': round(percentile(values, 99), 1)
+            }
+            for stage, values in snapshot.items() if values
+        }
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import cv2
+
+from core.vision.template_bank import as_template
+
+
+def match_at(gray, template, pos, pad):
+    """
+    只在预期位置附近的小区域内做单尺度匹配
+    :param gray: 灰度截图
+    :param template: 已缩放到目标尺寸的灰度模板
+    :param pos: 模板左上角的预期位置 (x, y)
+    :param pad: 预期位置四周扩展的像素
+    :return: (得分, 匹配位置)，区域超出截图时返回 (0.0, None)
+    """
+    img_h, img_w = gray.shape[:2]
+    tpl_h, tpl_w = template.shape[:2]
+    x1 = max(0, int(pos[0]) - pad)
+    y1 = max(0, int(pos[1]) - pad)
+    x2 = min(img_w, int(pos[0]) + tpl_w + pad)
+    y2 = min(img_h, int(pos[1]) + tpl_h + pad)
+    if x2 - x1 < tpl_w or y2 - y1 < tpl_h:
+        return 0.0, None
+    result = cv2.matchTemplate(gray[y1:y2, x1:x2], template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, max_loc = cv2.minMaxLoc(result)
+    return float(max_val), (max_loc[0] + x1, max_loc[1] + y1)
+
+
+class GridCache:
+    """仓库网格几何缓存
+
+    仓库面板在交易之间几乎不会移动，按 (窗口宽×高, 仓库类型) 缓存上次定位到的锚点位置、尺寸
+    和网格行列数。再次定位时只在缓存的锚点位置附近做一次单尺度匹配校验，通过即直接复用，
+    失败才重新做完整的多尺度锚点识别。
+    """
+
+    def __init__(self, threshold=0.65, pad=6):
+        """
+        :param threshold: 校验匹配的最低得分
+        :param pad: 校验区域在缓存锚点四周扩展的像素，允许面板轻微偏移
+        """
+        self.threshold = threshold
+        self.pad = pad
+        self.lock = threading.Lock()
+        self.entries = {}  # {(宽, 高): {仓库类型: 几何信息}}，最近命中的类型在前
+        self.stats = {'lookups': 0, 'hits': 0, 'hits_s': 0.0, 'misses_s': 0.0, 'stores': 0}
+
+    @staticmethod
+    def window_key(rect):
+        """窗口矩形 -> 缓存键，网格坐标相对窗口，窗口移动不影响缓存"""
+        return int(rect[2] - rect[0]), int(rect[3] - rect[1])
+
+    def store(self, rect, geometry):
+        """
+        缓存定位结果
+        :param rect: 窗口矩形 (left, top, right, bottom)
+        :param geometry: {'stash_type', 'anchors': [(x, y), ...], 'anchor_sizes': [(w, h), ...], 'cols', 'rows'}
+        """
+        with self.lock:
+            self._put(rect, geometry)
+            self.stats['stores'] += 1
+
+    def _put(self, rect, geometry):
+        """写入缓存并把该仓库类型移到最前（调用方需持有锁）"""
+        key = self.window_key(rect)
+        types = {geometry['stash_type']: dict(geometry)}
+        types.update((stash_type, cached) for stash_type, cached in self.entries.get(key, {}).items()
+                     if stash_type != geometry['stash_type'])
+        self.entries[key] = types
+
+    def invalidate(self, rect=None):
+        """清除某个窗口尺寸（为None时全部）的缓存"""
+        with self.lock:
+            if rect is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(self.window_key(rect), None)
+
+    def validate(self, gray, template, rect):
+        """
+        用缓存的锚点校验当前截图
+        :param gray: 与定位时相同区域的灰度截图
+        :param template: 原始尺寸的灰度锚点模板或BankTemplate
+        :param rect: 窗口矩形
+        :return: 校验通过的几何信息（锚点位置已按本次匹配修正），未命中返回None
+        """
+        start = time.perf_counter()
+        template = as_template(template)
+        with self.lock:
+            candidates = [dict(geometry) for geometry in self.entries.get(self.window_key(rect), {}).values()]
+
+        found = None
+        for geometry in candidates:
+            anchors = []
+            for pos, size in zip(geometry['anchors'], geometry['anchor_sizes']):
+                resized = template.resize(size)
+                score, matched = match_at(gray, resized, pos, self.pad)
+                if score < self.threshold:
+                    break
+                anchors.append(matched)
+            else:
+                geometry['anchors'] = anchors
+                found = geometry
+                break
+
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.stats['lookups'] += 1
+            if found is not None:
+                self.stats['hits'] += 1
+                self.stats['hits_s'] += elapsed
+                self._put(rect, found)
+            else:
+                self.stats['misses_s'] += elapsed
+        return found
+
+    def get_stats(self):
+        """{lookups, hits, hit_rate, avg_validate_ms, stores}"""
+        with self.lock:
+            lookups = self.stats['lookups']
+            return {
+                'lookups': lookups,
+                'hits': self.stats['hits'],
+                'hit_rate': round(self.stats['hits'] / lookups, 3) if lookups else 0.0,
+                'avg_validate_ms': round((self.stats['hits_s'] + self.stats['misses_s']) / lookups * 1000, 2)
+                if lookups else 0.0,
+                'stores': self.stats['stores']
+            }
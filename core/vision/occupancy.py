@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+
+# 格子内部（去掉边框后）灰度标准差或边缘能量超过阈值即认为有物品；
+# 空格子是平坦的深色底纹，阈值取得偏低，宁可把空格子误判为有物品也不漏判物品
+STD_THRESHOLD = 6.0
+EDGE_THRESHOLD = 4.0
+
+
+def cell_features(gray, start, cell, cols, rows, block=16, margin=0.15):
+    """
+    一次性计算全部格子的统计特征
+    网格区域先按INTER_AREA缩放为每格block×block像素，再reshape为 (行, 列, block, block) 的块，
+    去掉每格四周margin比例的边框后在块上做向量化统计。
+    :param gray: 灰度截图
+    :param start: 网格左上角 (x, y)
+    :param cell: 格子尺寸 (宽, 高)，可以是小数
+    :param cols: 列数
+    :param rows: 行数
+    :return: (均值, 标准差, 边缘能量)，均为 (行, 列) 的float32数组
+    """
+    x0, y0 = start
+    x1 = int(round(x0 + cols * cell[0]))
+    y1 = int(round(y0 + rows * cell[1]))
+    region = gray[max(0, int(round(y0))):y1, max(0, int(round(x0))):x1]
+    resized = cv2.resize(region, (cols * block, rows * block), interpolation=cv2.INTER_AREA)
+    blocks = resized.reshape(rows, block, cols, block).transpose(0, 2, 1, 3).astype(np.float32)
+    trim = int(block * margin)
+    inner = blocks[:, :, trim:block - trim, trim:block - trim]
+
+    mean = inner.mean(axis=(2, 3))
+    std = inner.std(axis=(2, 3))
+    edge = (np.abs(np.diff(inner, axis=2)).mean(axis=(2, 3)) +
+            np.abs(np.diff(inner, axis=3)).mean(axis=(2, 3))) / 2
+    return mean, std, edge
+
+
+def occupancy_map(gray, grid, std_threshold=STD_THRESHOLD, edge_threshold=EDGE_THRESHOLD):
+    """
+    仓库格子占用图
+    :param gray: 灰度截图
+    :param grid: TakeOutItemModule.locate_grid 返回的网格信息（使用 start, cell, cols, rows）
+    :return: (行, 列) 的bool数组，True表示格子中有物品
+    """
+    _, std, edge = cell_features(gray, grid['start'], grid['cell'], grid['cols'], grid['rows'])
+    return (std > std_threshold) | (edge > edge_threshold)
@@ -0,0 +1,113 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cv2
+
+from core.vision.template_bank import as_template
+
+# 并行匹配的默认线程数，超过8个核心后收益很小
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class MultiScaleMatcher:
+    """多尺度模板匹配线程池
+
+    cv2.resize 和 cv2.matchTemplate 执行期间会释放GIL，各尺度的匹配可以在有界线程池中并行。
+    线程数为1时退化为普通的串行循环。
+    """
+
+    def __init__(self, max_workers=None):
+        """
+        :param max_workers: 线程数，默认 min(8, CPU核心数)
+        """
+        self.max_workers = max(1, int(max_workers or DEFAULT_WORKERS))
+        self.executor = None
+        if self.max_workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scale-match')
+
+    def map(self, func, items):
+        """对每一项执行func，按输入顺序返回结果列表"""
+        items = list(items)
+        if self.executor is None or len(items) < 2:
+            return [func(item) for item in items]
+        return list(self.executor.map(func, items))
+
+    def best_match(self, gray, template, scales, certain=None, min_size=10):
+        """
+        在每个尺度上匹配整张图，取得分最高的尺度
+        :param gray: 灰度截图
+        :param template: 灰度模板或BankTemplate
+        :param scales: 模板缩放比例序列，按可能性从高到低排列时提前结束更早
+        :param certain: 出现不低于该得分的尺度时不再等待其余尺度，为None时匹配全部尺度
+        :param min_size: 缩放后模板的最小边长，更小的尺度跳过
+        :return: (得分, 位置, 尺度, (宽, 高))，没有可匹配的尺度时返回 (0, None, None, None)
+        """
+        template = as_template(template)
+        tpl_h, tpl_w = template.shape[:2]
+        img_h, img_w = gray.shape[:2]
+
+        def match_scale(index):
+            scale = scales[index]
+            scaled_w = int(tpl_w * scale)
+            scaled_h = int(tpl_h * scale)
+            if scaled_w < min_size or scaled_h < min_size or scaled_w > img_w or scaled_h > img_h:
+                return None
+            resized = template.resize((scaled_w, scaled_h))
+            result = cv2.matchTemplate(gray, resized, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            return max_val, max_loc, scale, (scaled_w, scaled_h), index
+
+        found = []
+        if self.executor is None or len(scales) < 2:
+            for index in range(len(scales)):
+                match = match_scale(index)
+                if match is None:
+                    continue
+                found.append(match)
+                if certain is not None and match[0] >= certain:
+                    break
+        else:
+            futures = [self.executor.submit(match_scale, index) for index in range(len(scales))]
+            for future in as_completed(futures):
+                match = future.result()
+                if match is None:
+                    continue
+                found.append(match)
+                if certain is not None and match[0] >= certain:
+                    # 未开始的尺度直接取消，已在运行的让其自然结束
+                    for pending in futures:
+                        pending.cancel()
+                    break
+
+        if not found:
+            return 0, None, None, None
+        # 得分相同时取靠前的尺度，与串行循环一致
+        best = max(found, key=lambda match: (match[0], -match[4]))
+        return best[:4]
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_scale_matcher() -> MultiScaleMatcher:
+    """获取共享的多尺度匹配线程池"""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = MultiScaleMatcher()
+        return _matcher
+
+
+def set_scale_matcher(matcher):
+    """替换共享的多尺度匹配线程池（如串行的MultiScaleMatcher(1)），返回之前的实例"""
+    global _matcher
+    with _matcher_lock:
+        previous, _matcher = _matcher, matcher
+        return previous
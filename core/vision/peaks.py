@@ -0,0 +1,100 @@
+import cv2
+import numpy as np
+
+# 模板匹配候选: 左上角位置、缩放后模板尺寸、尺度和得分
+MATCH_DTYPE = np.dtype([
+    ('x', np.int32), ('y', np.int32),
+    ('w', np.int32), ('h', np.int32),
+    ('scale', np.float32), ('score', np.float32)
+])
+
+# 单尺度候选超过该数量时先做3×3局部极大值过滤
+DENSE_PEAKS = 2048
+
+
+def empty_matches():
+    return np.empty(0, dtype=MATCH_DTYPE)
+
+
+def _greedy_suppress(cx, cy, reach_x, reach_y):
+    """
+    按顺序（调用方已按得分降序排列）贪心保留点，去掉与已保留点在x、y方向距离都小于其抑制范围的点
+    :return: 保留点的序号列表
+    """
+    alive = np.ones(len(cx), dtype=bool)
+    kept = []
+    index = 0
+    while index < len(cx):
+        kept.append(index)
+        rest = slice(index + 1, None)
+        alive[rest] &= ~((np.abs(cx[rest] - cx[index]) < reach_x[index]) &
+                         (np.abs(cy[rest] - cy[index]) < reach_y[index]))
+        following = np.flatnonzero(alive[rest])
+        if len(following) == 0:
+            break
+        index += 1 + following[0]
+    return kept
+
+
+def extract_peaks(result, threshold, scale=1.0, size=(0, 0), offset=(0, 0), radius=0, max_peaks=None):
+    """
+    从matchTemplate结果中提取不低于阈值的候选
+    :param result: matchTemplate输出的得分图
+    :param threshold: 最低得分
+    :param scale: 本次匹配的模板尺度
+    :param size: 缩放后模板尺寸 (w, h)
+    :param offset: 得分图左上角在整张截图中的位置，ROI匹配时使用
+    :param radius: 大于0时做单尺度内的非极大值抑制，radius邻域内只保留得分最高的点；
+                   为0时保留全部超过阈值的点
+    :param max_peaks: 最多保留的候选数（得分最高的）
+    :return: MATCH_DTYPE结构化数组，按得分降序
+    """
+    mask = result >= threshold
+    if radius > 0 and np.count_nonzero(mask) > DENSE_PEAKS:
+        # 候选很多时先只保留3×3局部极大值（radius邻域内的最高点必然是3×3局部极大值），减少贪心抑制的点数
+        mask &= result >= cv2.dilate(result, np.ones((3, 3), np.uint8))
+    ys, xs = np.nonzero(mask)
+    scores = result[ys, xs]
+    order = np.argsort(-scores, kind='stable')
+    ys, xs, scores = ys[order], xs[order], scores[order]
+
+    if radius > 0 and len(scores) > 1:
+        reach = np.full(len(scores), radius + 1)
+        kept = _greedy_suppress(xs, ys, reach, reach)
+        ys, xs, scores = ys[kept], xs[kept], scores[kept]
+    if max_peaks is not None:
+        ys, xs, scores = ys[:max_peaks], xs[:max_peaks], scores[:max_peaks]
+
+    matches = np.empty(len(scores), dtype=MATCH_DTYPE)
+    matches['x'] = xs + offset[0]
+    matches['y'] = ys + offset[1]
+    matches['w'] = size[0]
+    matches['h'] = size[1]
+    matches['scale'] = scale
+    matches['score'] = scores
+    return matches
+
+
+def non_max_suppression(matches, overlap=0.5):
+    """
+    贪心非极大值抑制：按得分从高到低保留候选，去掉中心落在已保留候选附近的其余候选
+    :param matches: MATCH_DTYPE结构化数组（可由多个尺度的结果拼接）
+    :param overlap: 抑制范围占已保留候选宽高的比例
+    :return: 保留的候选，按得分降序；得分相同时保留靠前（尺度靠前）的
+    """
+    if len(matches) == 0:
+        return matches
+    matches = matches[np.argsort(-matches['score'], kind='stable')]
+    kept = _greedy_suppress(matches['x'] + matches['w'] / 2.0, matches['y'] + matches['h'] / 2.0,
+                            matches['w'] * overlap, matches['h'] * overlap)
+    return matches[kept]
+
+
+def match_pos(match):
+    """候选的左上角位置 (x, y)"""
+    return int(match['x']), int(match['y'])
+
+
+def match_size(match):
+    """候选的模板尺寸 (w, h)"""
+    return int(match['w']), int(match['h'])
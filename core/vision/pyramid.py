@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+
+from core.vision.peaks import extract_peaks, non_max_suppression, empty_matches
+from core.vision.template_bank import as_template
+
+
+def build_pyramid(gray, max_factor=8):
+    """
+    构建降采样金字塔
+    :param gray: 灰度图
+    :param max_factor: 最大降采样倍数（2的幂）
+    :return: {倍数: 图像}，倍数1为原图
+    """
+    levels = {1: gray}
+    factor = 2
+    while factor <= max_factor:
+        previous = levels[factor // 2]
+        if min(previous.shape[:2]) < 32:
+            break
+        levels[factor] = cv2.pyrDown(previous)
+        factor *= 2
+    return levels
+
+
+def _coarse_factor(levels, template_size, min_size):
+    """缩放后模板在该层不小于min_size像素的最大降采样倍数"""
+    best = 1
+    for factor in sorted(levels):
+        if min(template_size) / factor >= min_size:
+            best = factor
+    return best
+
+
+def _map(matcher, func, items):
+    """有多尺度匹配线程池时并行执行，否则串行，按输入顺序返回结果"""
+    if matcher is None:
+        return [func(item) for item in items]
+    return matcher.map(func, items)
+
+
+def _merge(found):
+    found = [matches for matches in found if matches is not None]
+    return non_max_suppression(np.concatenate(found)) if found else empty_matches()
+
+
+def exhaustive_match(gray, template, scales, threshold, matcher=None):
+    """
+    逐尺度在整张原图上匹配（金字塔匹配的参照和兜底）
+    :param matcher: MultiScaleMatcher，各尺度并行匹配，为None时串行
+    :return: 与pyramid_match相同格式的匹配结果
+    """
+    template = as_template(template)
+    img_h, img_w = gray.shape[:2]
+    tpl_h, tpl_w = template.shape[:2]
+
+    def match_scale(scale):
+        scaled_w = min(int(tpl_w * scale), img_w - 1)
+        scaled_h = min(int(tpl_h * scale), img_h - 1)
+        if scaled_w < 10 or scaled_h < 10:
+            return None
+        resized = template.resize((scaled_w, scaled_h))
+        result = cv2.matchTemplate(gray, resized, cv2.TM_CCOEFF_NORMED)
+        return extract_peaks(result, threshold, scale, (scaled_w, scaled_h),
+                             radius=min(scaled_w, scaled_h) // 2)
+
+    return _merge(_map(matcher, match_scale, scales))
+
+
+def pyramid_match(gray, template, scales, threshold, max_factor=4, min_size=12,
+                  coarse_margin=0.2, top_scales=3, max_peaks=20, pad=4, matcher=None):
+    """
+    由粗到细的多尺度模板匹配
+
+    先在降采样图上用缩小的模板搜索全部尺度，取粗匹配得分最高的几个尺度（及其相邻尺度）
+    和它们的候选位置，再只在原图上候选位置附近的小区域内按原尺度精匹配。
+    缩放后的模板在降采样图上会小于min_size时，该尺度的粗匹配直接在原图上进行。
+
+    :param gray: 灰度截图
+    :param template: 灰度模板或BankTemplate（复用缓存的缩放结果）
+    :param scales: 模板缩放比例序列
+    :param threshold: 原图上的匹配阈值
+    :param max_factor: 粗匹配的最大降采样倍数
+    :param min_size: 粗匹配时缩放后模板的最小边长（像素）
+    :param coarse_margin: 粗匹配阈值比原阈值低的幅度
+    :param top_scales: 精匹配的尺度数
+    :param max_peaks: 每个尺度保留的粗匹配候选数
+    :param pad: 精匹配区域在候选位置周围额外扩展的像素
+    :param matcher: MultiScaleMatcher，粗匹配和精匹配的各尺度并行执行，为None时串行
+    :return: MATCH_DTYPE结构化数组 (x, y, w, h, scale, score)，经非极大值抑制后按得分降序
+    """
+    levels = build_pyramid(gray, max_factor)
+    template = as_template(template)
+    img_h, img_w = gray.shape[:2]
+    tpl_h, tpl_w = template.shape[:2]
+    coarse_threshold = threshold - coarse_margin
+
+    # 粗匹配：每个尺度在合适的金字塔层上搜索
+    def coarse_scale(index):
+        scale = scales[index]
+        scaled_w = min(int(tpl_w * scale), img_w - 1)
+        scaled_h = min(int(tpl_h * scale), img_h - 1)
+        if scaled_w < 10 or scaled_h < 10:
+            return None
+        factor = _coarse_factor(levels, (scaled_w, scaled_h), min_size)
+        level = levels[factor]
+        small = template.resize((max(1, scaled_w // factor), max(1, scaled_h // factor)), cv2.INTER_AREA)
+        if small.shape[0] >= level.shape[0] or small.shape[1] >= level.shape[1]:
+            return None
+        result = cv2.matchTemplate(level, small, cv2.TM_CCOEFF_NORMED)
+        peaks = extract_peaks(result, coarse_threshold if factor > 1 else threshold,
+                              radius=1, max_peaks=max_peaks)
+        if not len(peaks):
+            return None
+        return index, peaks['score'][0], factor, peaks
+
+    # [(尺度序号, 最高分, 降采样倍数, 候选)]
+    coarse = [item for item in _map(matcher, coarse_scale, range(len(scales))) if item is not None]
+    if not coarse:
+        return empty_matches()
+
+    # 得分最高的尺度及其相邻尺度进入精匹配
+    by_index = {item[0]: item for item in coarse}
+    selected = set()
+    for index, _, _, _ in sorted(coarse, key=lambda item: -item[1])[:top_scales]:
+        selected.update(i for i in (index - 1, index, index + 1) if i in by_index)
+
+    def refine_scale(index):
+        _, _, factor, peaks = by_index[index]
+        scale = scales[index]
+        scaled_w = min(int(tpl_w * scale), img_w - 1)
+        scaled_h = min(int(tpl_h * scale), img_h - 1)
+        resized = template.resize((scaled_w, scaled_h))
+        found = []
+        for px, py in zip(peaks['x'].tolist(), peaks['y'].tolist()):
+            # 粗匹配位置映射回原图，周围扩展一个降采样单元
+            margin = factor + pad
+            x1 = max(0, px * factor - margin)
+            y1 = max(0, py * factor - margin)
+            x2 = min(img_w, px * factor + scaled_w + margin)
+            y2 = min(img_h, py * factor + scaled_h + margin)
+            if x2 - x1 < scaled_w or y2 - y1 < scaled_h:
+                continue
+            result = cv2.matchTemplate(gray[y1:y2, x1:x2], resized, cv2.TM_CCOEFF_NORMED)
+            found.append(extract_peaks(result, threshold, scale, (scaled_w, scaled_h), offset=(x1, y1),
+                                       radius=min(scaled_w, scaled_h) // 2))
+        return np.concatenate(found) if found else None
+
+    return _merge(_map(matcher, refine_scale, sorted(selected)))
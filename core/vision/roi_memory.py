@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import threading
+
+DEFAULT_ROI_FILE = 'roi_memory.json'
+
+
+class RoiMemory:
+    """识别目标的搜索区域记忆
+
+    仓库按钮、标签栏等目标在同一分辨率下只出现在固定的几处位置。按 (目标, 窗口宽×高) 记录
+    每次找到目标的位置，下次先只在这些位置外扩一圈的区域内搜索，找不到时才退回整张截图。
+    记忆持久化到JSON文件，重启后仍然有效。
+    """
+
+    def __init__(self, state_file=DEFAULT_ROI_FILE, pad_ratio=0.5, min_pad=16, max_boxes=8):
+        """
+        :param state_file: 持久化文件路径，为None时只保存在内存中
+        :param pad_ratio: 搜索区域在记录位置四周外扩的比例（相对目标宽高）
+        :param min_pad: 最少外扩的像素
+        :param max_boxes: 每个目标每种分辨率最多记录的位置数，超过时丢弃最早的
+        """
+        self.state_file = state_file
+        self.pad_ratio = pad_ratio
+        self.min_pad = min_pad
+        self.max_boxes = max_boxes
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.boxes = {}  # {键: [[x, y, w, h], ...]}
+        self.stats = {}  # {目标: 命中/面积统计}
+        self._load_state()
+
+    @staticmethod
+    def key(target, frame_size):
+        return f"{target}@{int(frame_size[0])}x{int(frame_size[1])}"
+
+    def region(self, target, frame_size, span_x=False):
+        """
+        记录位置外扩后的搜索区域
+        :param frame_size: 截图 (宽, 高)
+        :param span_x: 搜索区域横向覆盖整个截图（标签栏等横向排列的目标）
+        :return: (x1, y1, x2, y2)，没有记录时返回None
+        """
+        with self.lock:
+            boxes = self.boxes.get(self.key(target, frame_size))
+            if not boxes:
+                return None
+            width, height = int(frame_size[0]), int(frame_size[1])
+            x1 = min(box[0] - max(self.min_pad, box[2] * self.pad_ratio) for box in boxes)
+            y1 = min(box[1] - max(self.min_pad, box[3] * self.pad_ratio) for box in boxes)
+            x2 = max(box[0] + box[2] + max(self.min_pad, box[2] * self.pad_ratio) for box in boxes)
+            y2 = max(box[1] + box[3] + max(self.min_pad, box[3] * self.pad_ratio) for box in boxes)
+        if span_x:
+            x1, x2 = 0, width
+        return max(0, int(x1)), max(0, int(y1)), min(width, int(x2)), min(height, int(y2))
+
+    def record(self, target, frame_size, box):
+        """记录找到目标的位置 (x, y, w, h)，与已有记录重合时不重复保存"""
+        key = self.key(target, frame_size)
+        box = [int(value) for value in box]
+        with self.lock:
+            boxes = self.boxes.setdefault(key, [])
+            for existing in boxes:
+                if abs(existing[0] - box[0]) <= self.min_pad and abs(existing[1] - box[1]) <= self.min_pad and \
+                        abs(existing[2] - box[2]) <= self.min_pad and abs(existing[3] - box[3]) <= self.min_pad:
+                    return
+            boxes.append(box)
+            del boxes[:-self.max_boxes]
+            self._save_state()
+
+    def forget(self, target=None):
+        """清除某个目标（为None时全部）的记忆"""
+        with self.lock:
+            if target is None:
+                self.boxes.clear()
+            else:
+                prefix = f"{target}@"
+                self.boxes = {k: v for k, v in self.boxes.items() if not k.startswith(prefix)}
+            self._save_state()
+
+    def search(self, target, frame_size, search, span_x=False):
+        """
+        先在记录的区域内搜索，找不到时搜索整张截图
+        :param target: 目标名称
+        :param frame_size: 截图 (宽, 高)
+        :param search: 函数 search((x1, y1, x2, y2)) -> (结果, 目标位置(x, y, w, h)或None)，位置为整张截图坐标
+        :param span_x: 搜索区域横向覆盖整个截图
+        :return: 搜索结果
+        """
+        width, height = int(frame_size[0]), int(frame_size[1])
+        frame_area = width * height
+        searched = 0
+        roi = self.region(target, frame_size, span_x)
+        if roi is not None:
+            result, box = search(roi)
+            searched += (roi[2] - roi[0]) * (roi[3] - roi[1])
+            if box is not None:
+                self._record_stats(target, True, frame_area, searched)
+                self.record(target, frame_size, box)
+                return result
+
+        result, box = search((0, 0, width, height))
+        searched += frame_area
+        self._record_stats(target, False, frame_area, searched)
+        if box is not None:
+            self.record(target, frame_size, box)
+        return result
+
+    def _record_stats(self, target, hit, frame_area, searched):
+        with self.lock:
+            stats = self.stats.setdefault(target, {'lookups': 0, 'hits': 0, 'frame_px': 0, 'searched_px': 0})
+            stats['lookups'] += 1
+            stats['hits'] += 1 if hit else 0
+            stats['frame_px'] += frame_area
+            stats['searched_px'] += searched
+
+    def get_stats(self):
+        """
+        {目标: {lookups, hits, hit_rate, searched_px, saved_px, saved_ratio}}
+        saved_px为相对每次都搜索整张截图少搜索的像素数，未命中时区域搜索的面积计为额外开销
+        """
+        with self.lock:
+            result = {}
+            for target, stats in self.stats.items():
+                saved = stats['frame_px'] - stats['searched_px']
+                result[target] = {
+                    'lookups': stats['lookups'],
+                    'hits': stats['hits'],
+                    'hit_rate': round(stats['hits'] / stats['lookups'], 3) if stats['lookups'] else 0.0,
+                    'searched_px': stats['searched_px'],
+                    'saved_px': saved,
+                    'saved_ratio': round(saved / stats['frame_px'], 3) if stats['frame_px'] else 0.0
+                }
+            return result
+
+    def _load_state(self):
+        """加载持久化的区域记忆"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.boxes = {key: [[int(value) for value in box] for box in boxes] for key, boxes in state.items()}
+        except Exception as e:
+            self.logger.error(f"加载区域记忆失败: {str(e)}")
+
+    def _save_state(self):
+        """持久化区域记忆（调用方需持有锁）"""
+        if not self.state_file:
+            return
+        try:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.boxes, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            self.logger.error(f"保存区域记忆失败: {str(e)}")
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_roi_memory() -> RoiMemory:
+    """获取共享的区域记忆，首次使用时从默认文件加载"""
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = RoiMemory()
+        return _memory
+
+
+def set_roi_memory(memory):
+    """设置共享的区域记忆（如不落盘的RoiMemory(None)），返回之前的实例"""
+    global _memory
+    with _memory_lock:
+        previous, _memory = _memory, memory
+        return previous
@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import threading
+import time
+
+DEFAULT_SCALE_FILE = 'scale_memory.json'
+
+
+class ScaleMemory:
+    """多尺度模板匹配的尺度记忆
+
+    游戏界面缩放只随窗口尺寸和设置变化，按 (模板, 窗口宽×高) 记住上次匹配成功的尺度，
+    下次先只匹配该尺度及相邻的一个步长，置信度不足时才退回全部尺度的扫描。
+    记忆持久化到JSON文件，重启后仍然有效。
+    """
+
+    def __init__(self, state_file=DEFAULT_SCALE_FILE, radius=1):
+        """
+        :param state_file: 持久化文件路径，为None时只保存在内存中
+        :param radius: 记住的尺度两侧额外尝试的步数
+        """
+        self.state_file = state_file
+        self.radius = radius
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.scales = {}  # {键: 尺度}
+        self.stats = {}   # {模板: 命中/扫描统计}
+        self._load_state()
+
+    @staticmethod
+    def key(template, window_size):
+        return f"{template}@{int(window_size[0])}x{int(window_size[1])}"
+
+    def lookup(self, template, window_size):
+        """记住的尺度，没有记录时返回None"""
+        with self.lock:
+            return self.scales.get(self.key(template, window_size))
+
+    def remember(self, template, window_size, scale):
+        """记住匹配成功的尺度，发生变化时写入文件"""
+        key = self.key(template, window_size)
+        scale = round(float(scale), 6)
+        with self.lock:
+            if self.scales.get(key) == scale:
+                return
+            self.scales[key] = scale
+            self._save_state()
+
+    def forget(self, template=None):
+        """清除某个模板（为None时全部）的记忆"""
+        with self.lock:
+            if template is None:
+                self.scales.clear()
+            else:
+                prefix = f"{template}@"
+                self.scales = {k: v for k, v in self.scales.items() if not k.startswith(prefix)}
+            self._save_state()
+
+    def search(self, template, window_size, scales, sweep, confident):
+        """
+        先匹配记住的尺度附近，置信度不足时扫描全部尺度
+        :param template: 模板名称
+        :param window_size: 窗口 (宽, 高)
+        :param scales: 全部尺度序列
+        :param sweep: 函数 sweep(尺度序号列表) -> (匹配结果, 最佳尺度)，最佳尺度为None表示未匹配
+        :param confident: 函数 confident(匹配结果) -> 结果是否可信
+        :return: 匹配结果
+        """
+        remembered = self.lookup(template, window_size)
+        if remembered is not None:
+            nearest = min(range(len(scales)), key=lambda i: abs(scales[i] - remembered))
+            indices = [i for i in range(nearest - self.radius, nearest + self.radius + 1)
+                       if 0 <= i < len(scales)]
+            start = time.perf_counter()
+            result, best_scale = sweep(indices)
+            elapsed = time.perf_counter() - start
+            if best_scale is not None and confident(result):
+                self._record(template, 'hits', elapsed)
+                self.remember(template, window_size, best_scale)
+                return result
+            self._record(template, 'misses', elapsed)
+
+        start = time.perf_counter()
+        result, best_scale = sweep(list(range(len(scales))))
+        self._record(template, 'sweeps', time.perf_counter() - start)
+        if best_scale is not None and confident(result):
+            self.remember(template, window_size, best_scale)
+        return result
+
+    def _record(self, template, kind, elapsed):
+        with self.lock:
+            stats = self.stats.setdefault(template, {
+                'hits': 0, 'misses': 0, 'sweeps': 0,
+                'hits_s': 0.0, 'misses_s': 0.0, 'sweeps_s': 0.0
+            })
+            stats[kind] += 1
+            stats[f'{kind}_s'] += elapsed
+
+    def get_stats(self):
+        """
+        {模板: {lookups, hits, hit_rate, sweeps, avg_hit_ms, avg_sweep_ms, saved_ms}}
+        saved_ms按全尺度扫描的平均耗时估算命中节省的时间
+        """
+        with self.lock:
+            result = {}
+            for template, stats in self.stats.items():
+                lookups = stats['hits'] + stats['misses']
+                avg_hit = stats['hits_s'] / stats['hits'] if stats['hits'] else 0.0
+                avg_sweep = stats['sweeps_s'] / stats['sweeps'] if stats['sweeps'] else 0.0
+                saved = stats['hits'] * (avg_sweep - avg_hit) - stats['misses_s'] if avg_sweep else 0.0
+                result[template] = {
+                    'lookups': lookups,
+                    'hits': stats['hits'],
+                    'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+                    'sweeps': stats['sweeps'],
+                    'avg_hit_ms': round(avg_hit * 1000, 1),
+                    'avg_sweep_ms': round(avg_sweep * 1000, 1),
+                    'saved_ms': round(max(0.0, saved) * 1000, 1)
+                }
+            return result
+
+    def _load_state(self):
+        """加载持久化的尺度记忆"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.scales = {key: float(value) for key, value in state.items()}
+        except Exception as e:
+            self.logger.error(f"加载尺度记忆失败: {str(e)}")
+
+    def _save_state(self):
+        """持久化尺度记忆（调用方需持有锁）"""
+        if not self.state_file:
+            return
+        try:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.scales, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            self.logger.error(f"保存尺度记忆失败: {str(e)}")
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_scale_memory() -> ScaleMemory:
+    """获取共享的尺度记忆，首次使用时从默认文件加载"""
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = ScaleMemory()
+        return _memory
+
+
+def set_scale_memory(memory):
+    """设置共享的尺度记忆（如不落盘的ScaleMemory(None)），返回之前的实例"""
+    global _memory
+    with _memory_lock:
+        previous, _memory = _memory, memory
+        return previous
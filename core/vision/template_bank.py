@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import os
+import re
+import struct
+import threading
+import zipfile
+
+import cv2
+import numpy as np
+
+DEFAULT_BANK_DIR = os.path.join('cache', 'templates')
+
+
+class BankTemplate:
+    """灰度模板及其各尺寸的缩放结果
+
+    每个 (宽, 高, 插值方式) 只缩放一次，之后直接复用；由TemplateBank加载时缩放结果来自磁盘缓存。
+    也可以直接包装一张灰度图使用，此时缩放结果只保存在内存中。
+    """
+
+    def __init__(self, gray, scaled=None):
+        self.gray = gray
+        self.shape = gray.shape
+        self.scaled = dict(scaled or {})  # {(宽, 高, 插值方式): 图像}
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def resize(self, size, interpolation=cv2.INTER_LINEAR):
+        """缩放到指定尺寸 (宽, 高)，结果只读且会被复用"""
+        key = (int(size[0]), int(size[1]), int(interpolation))
+        image = self.scaled.get(key)
+        if image is None:
+            image = cv2.resize(self.gray, key[:2], interpolation=interpolation)
+            image.flags.writeable = False
+            with self.lock:
+                self.scaled[key] = image
+                self.dirty = True
+        return image
+
+    def prepare(self, sizes, interpolation=cv2.INTER_LINEAR):
+        """预先生成一组尺寸的缩放结果"""
+        for size in sizes:
+            self.resize(size, interpolation)
+        return self
+
+
+def as_template(template):
+    """把灰度图包装为BankTemplate，已是BankTemplate时原样返回"""
+    return template if isinstance(template, BankTemplate) else BankTemplate(template)
+
+
+def _mmap_npz(path):
+    """
+    内存映射未压缩的.npz文件中的每个数组（np.load对.npz不支持mmap_mode）
+    :return: {名称: 只读数组}
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} 已压缩，无法内存映射")
+            # 本地文件头30字节，其后是文件名和扩展字段
+            f.seek(info.header_offset)
+            header = f.read(30)
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[info.filename[:-len('.npy')]] = np.memmap(
+                path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                order='F' if fortran_order else 'C')
+    return arrays
+
+
+class TemplateBank:
+    """识别模板库
+
+    模板第一次使用时读取并转为灰度，按文件内容哈希把灰度图和用过的全部缩放尺寸保存到
+    bank_dir下的未压缩.npz文件；之后（包括重启后）直接内存映射该文件，识别时不再读取、
+    转换或缩放模板。模板文件内容变化后哈希不同，旧缓存自动失效。
+    """
+
+    def __init__(self, bank_dir=DEFAULT_BANK_DIR):
+        """
+        :param bank_dir: 缓存目录，为None时只保存在内存中
+        """
+        self.bank_dir = bank_dir
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.templates = {}  # {模板路径: (文件哈希, BankTemplate)}
+
+    @staticmethod
+    def file_hash(path):
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()[:16]
+
+    def _bank_files(self, path):
+        """该模板已有的缓存文件 [(文件哈希, 缩放尺寸数, 文件名)]"""
+        if not os.path.isdir(self.bank_dir):
+            return []
+        name = os.path.splitext(os.path.basename(path))[0]
+        pattern = re.compile(re.escape(name) + r'-([0-9a-f]{16})-(\d+)\.npz$')
+        files = []
+        for filename in os.listdir(self.bank_dir):
+            match = pattern.match(filename)
+            if match:
+                files.append((match.group(1), int(match.group(2)), os.path.join(self.bank_dir, filename)))
+        return files
+
+    def get(self, path):
+        """
+        获取模板，文件不存在或无法读取时返回None
+        :param path: 模板图片路径
+        :return: BankTemplate
+        """
+        with self.lock:
+            cached = self.templates.get(path)
+            if cached is not None:
+                return cached[1]
+            if not os.path.exists(path):
+                return None
+
+            digest = self.file_hash(path)
+            template = self._load(path, digest)
+            if template is None:
+                image = cv2.imread(path)
+                if image is None:
+                    return None
+                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                gray.flags.writeable = False
+                template = BankTemplate(gray)
+                template.dirty = True
+            self.templates[path] = (digest, template)
+            return template
+
+    def _load(self, path, digest):
+        """从缓存文件内存映射模板，没有缓存或读取失败时返回None"""
+        if not self.bank_dir:
+            return None
+        # 同一哈希取缩放尺寸最多的文件
+        files = sorted((count, bank_file) for file_digest, count, bank_file in self._bank_files(path)
+                       if file_digest == digest)
+        if not files:
+            return None
+        bank_file = files[-1][1]
+        try:
+            arrays = _mmap_npz(bank_file)
+            gray = arrays.pop('gray')
+            scaled = {}
+            for name, image in arrays.items():
+                width, height, interpolation = (int(part) for part in name.split('_')[1:])
+                scaled[(width, height, interpolation)] = image
+            return BankTemplate(gray, scaled)
+        except Exception as e:
+            self.logger.error(f"加载模板缓存失败: {bank_file}, {str(e)}")
+            return None
+
+    def save(self):
+        """
+        把有新缩放尺寸的模板写入缓存文件，并删除同一模板的旧缓存
+        文件名包含缩放尺寸数，写入新文件而不是覆盖正在被内存映射的旧文件（Windows下无法覆盖）
+        """
+        if not self.bank_dir:
+            return
+        with self.lock:
+            pending = [(path, digest, template) for path, (digest, template) in self.templates.items()
+                       if template.dirty]
+        for path, digest, template in pending:
+            with template.lock:
+                arrays = {'gray': template.gray}
+                arrays.update((f"s_{w}_{h}_{interpolation}", image)
+                              for (w, h, interpolation), image in template.scaled.items())
+                template.dirty = False
+            name = os.path.splitext(os.path.basename(path))[0]
+            bank_file = os.path.join(self.bank_dir, f"{name}-{digest}-{len(arrays) - 1}.npz")
+            try:
+                os.makedirs(self.bank_dir, exist_ok=True)
+                tmp_file = f"{bank_file}.tmp"
+                with open(tmp_file, 'wb') as f:
+                    np.savez(f, **arrays)
+                os.replace(tmp_file, bank_file)
+            except Exception as e:
+                self.logger.error(f"保存模板缓存失败: {bank_file}, {str(e)}")
+                continue
+            for _, _, stale_file in self._bank_files(path):
+                if stale_file != bank_file:
+                    try:
+                        os.remove(stale_file)
+                    except OSError:
+                        # 仍被内存映射的文件在Windows下无法删除，下次保存时再清理
+                        pass
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_template_bank() -> TemplateBank:
+    """获取共享的模板库"""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = TemplateBank()
+        return _bank
+
+
+def set_template_bank(bank):
+    """替换共享的模板库（如只在内存中的TemplateBank(None)），返回之前的实例"""
+    global _bank
+    with _bank_lock:
+        previous, _bank = _bank, bank
+        return previous
@@ -0,0 +1,157 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from core.frame_capture import RECOGNITION_MAX_AGE
+
+# 探测区域（相对窗口的比例 x1, y1, x2, y2）
+STASH_REGION = (0.0, 0.0, 0.5, 1.0)       # 左半屏：仓库面板
+INVENTORY_REGION = (0.5, 0.5, 1.0, 1.0)   # 右下：背包
+
+
+@dataclass
+class WaitResult:
+    """一次条件等待的结果"""
+    confirmed: bool   # 超时前条件成立
+    aborted: bool     # 被中断
+    elapsed: float    # 实际等待时间（秒）
+    budget: float     # 最长等待时间（秒），即原固定等待时间
+    polls: int
+
+    @property
+    def saved(self):
+        """与固定等待相比节省的时间（秒）"""
+        return max(0.0, self.budget - self.elapsed) if self.confirmed else 0.0
+
+
+def wait_until(condition, timeout, interval=0.03, should_abort=None, clock=None, sleep=None):
+    """
+    高频轮询条件，成立后立即返回，最长等待timeout秒
+    :param condition: 无参函数，返回True表示界面已就绪
+    :param timeout: 最长等待时间（秒）
+    :param interval: 轮询间隔（秒）
+    :param should_abort: 无参函数，返回True时停止等待
+    :param clock: 时间函数，默认time.monotonic
+    :param sleep: 等待函数，默认time.sleep
+    :return: WaitResult
+    """
+    clock = clock or time.monotonic
+    sleep = sleep or time.sleep
+    start = clock()
+    polls = 0
+    while True:
+        if should_abort and should_abort():
+            return WaitResult(False, True, clock() - start, timeout, polls)
+        polls += 1
+        if condition():
+            return WaitResult(True, False, clock() - start, timeout, polls)
+        remaining = timeout - (clock() - start)
+        if remaining <= 0:
+            return WaitResult(False, False, clock() - start, timeout, polls)
+        sleep(min(interval, remaining))
+
+
+class ScreenChangeProbe:
+    """画面区域变化探针
+
+    arm()在操作前取区域的缩小灰度图作为基准，之后每次调用重新截图并取同一区域，
+    与基准的差异超过阈值、且与上一次采样基本一致（动画已结束）时返回True。
+    差异取约一个背包格子大小的局部窗口平均灰度差的最大值，单个物品入包也能被确认，
+    不会被整个区域的平均值稀释。
+    截图来自共享截图服务：基准可复用刚截取的画面，探测时总是重新截图，
+    确认时的画面留在缓存中供随后的识别模块直接使用。
+    """
+
+    def __init__(self, capture, region=STASH_REGION, threshold=6.0, scale=0.125, window=0.04):
+        """
+        初始化探针
+        :param capture: 共享截图服务（FrameCapture）
+        :param region: 探测区域（相对窗口的比例 x1, y1, x2, y2）
+        :param threshold: 判定为变化的局部平均灰度差
+        :param scale: 比较前的缩小比例
+        :param window: 局部窗口边长（相对窗口高度的比例），约为一个背包格子
+        """
+        self.capture = capture
+        self.region = region
+        self.threshold = threshold
+        self.scale = scale
+        self.window = window
+        self.kernel = 1
+        self.baseline = None
+        self.last = None
+
+    def arm(self):
+        """取基准画面，找不到窗口时返回False（之后的探测始终为False）"""
+        self.baseline = self._sample(RECOGNITION_MAX_AGE)
+        self.last = None
+        return self.baseline is not None
+
+    def _sample(self, max_age=0.0):
+        """取探测区域的缩小灰度图，找不到窗口时返回None"""
+        frame = self.capture.get_frame(max_age=max_age)
+        if frame is None:
+            return None
+        height, width = frame.image.shape[:2]
+        x1, y1, x2, y2 = self.region
+        image = frame.image[int(height * y1):int(height * y2), int(width * x1):int(width * x2)]
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.kernel = max(1, int(round(height * self.window * self.scale)))
+        size = (max(1, int(gray.shape[1] * self.scale)), max(1, int(gray.shape[0] * self.scale)))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def _difference(self, a, b):
+        """两张采样图在所有局部窗口中最大的平均灰度差"""
+        diff = np.abs(a - b).astype(np.float32)
+        kernel = min(self.kernel, diff.shape[0], diff.shape[1])
+        return float(cv2.blur(diff, (kernel, kernel), borderType=cv2.BORDER_REFLECT).max())
+
+    def __call__(self):
+        """画面相对基准已变化并稳定"""
+        if self.baseline is None:
+            return False
+        current = self._sample()
+        if current is None:
+            return False
+        changed = self._difference(current, self.baseline) > self.threshold
+        stable = self.last is not None and self._difference(current, self.last) <= self.threshold / 2
+        self.last = current
+        return changed and stable
+
+
+class WaitStats:
+    """各等待步骤的确认次数和节省时间统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, result):
+        """记录一次等待结果"""
+        with self.lock:
+            stats = self.stages.setdefault(stage, {
+                'count': 0, 'confirmed': 0, 'timeouts': 0, 'waited_ms': 0.0, 'saved_ms': 0.0
+            })
+            stats['count'] += 1
+            if result.confirmed:
+                stats['confirmed'] += 1
+            elif not result.aborted:
+                stats['timeouts'] += 1
+            stats['waited_ms'] += result.elapsed * 1000
+            stats['saved_ms'] += result.saved * 1000
+
+    def get_stats(self):
+        """{步骤: {count, confirmed, timeouts, avg_wait_ms, saved_ms}}"""
+        with self.lock:
+            return {
+                stage: {
+                    'count': stats['count'],
+                    'confirmed': stats['confirmed'],
+                    'timeouts': stats['timeouts'],
+                    'avg_wait_ms': round(stats['waited_ms'] / stats['count'], 1),
+                    'saved_ms': round(stats['saved_ms'], 1)
+                }
+                for stage, stats in self.stages.items()
+            }
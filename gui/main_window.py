@@ -359,6 +359,8 @@ class MainWindow(QMainWindow):
                 self.toggle_monitor()  # 停止监控
             if hasattr(self, 'currency_fetcher'):
                 self.currency_fetcher.stop()
+            if hasattr(self, 'monitor_manager'):
+                self.monitor_manager.shutdown()
             self.tray_icon.stop()  # 删除托盘图标
             event.accept()  # 接受关闭事件
             return
@@ -374,6 +376,8 @@ class MainWindow(QMainWindow):
                 self.toggle_monitor()  # 停止监控
             if hasattr(self, 'currency_fetcher'):
                 self.currency_fetcher.stop()
+            if hasattr(self, 'monitor_manager'):
+                self.monitor_manager.shutdown()
             self.tray_icon.stop()  # 删除托盘图标
             event.accept()  # 接受关闭事件
             
@@ -1,6 +1,8 @@
 import traceback
 from core.log_monitor import LogMonitor
 from core.auto_trade import AutoTrade, TradeConfig
+from core.trade_ledger import TradeLedger
+from core.trade_trace import DEFAULT_TRACE_FILE
 
 class MonitorManager:
     """负责管理监控和自动交易功能"""
@@ -16,29 +18,48 @@ class MonitorManager:
         self.monitor = None
         self.auto_trade = AutoTrade()
         
+        # 交易账本，交易请求和交易结果持久化到SQLite，统计页和历史记录从账本查询
+        self.ledger = None
+        try:
+            self.ledger = TradeLedger()
+            # 旧版本保存在config.json中的统计数据导入账本作为基线，只导入一次
+            if self.ledger.import_legacy_stats(self.config.get('currency_stats'),
+                                               self.config.get('trade_message_count')):
+                self.log_callback("已将配置文件中的统计数据导入交易账本", "SYSTEM")
+            self.auto_trade.set_ledger(self.ledger)
+            self.stats_page.set_ledger(self.ledger)
+            self.auto_trade_page.set_history_provider(lambda: self.ledger.recent_trades(50))
+        except Exception as e:
+            self.log_callback(f"打开交易账本失败: {str(e)}", "ERROR")
+        
         # 配置自动交易回调
         self.auto_trade.set_callbacks(
             self.auto_trade_page.update_trade_status,
             self.auto_trade_page.add_trade_history
         )
+        
+        # 交易队列和分阶段耗时统计显示在自动交易页面
+        self.auto_trade_page.set_queue_stats_provider(self.auto_trade.get_queue_stats)
+        self.auto_trade_page.set_latency_stats_provider(self.auto_trade.get_latency_stats)
+        self.auto_trade_page.set_wait_stats_provider(self.auto_trade.get_wait_stats)
+        
+        # 配置保存后刷新推送处理器的配置快照
+        self.config.add_listener(self._on_config_changed)
     
     def start_monitoring(self, push_config, auto_trade_config):
         """启动监控"""
         try:
             # 创建并初始化监控器
-            self.monitor = LogMonitor(self.config, self.log_callback, self.stats_page)
+            self.monitor = LogMonitor(self.config, self.log_callback, self.stats_page, self.ledger)
             
             # 配置自动交易
             at_config = auto_trade_config.get('auto_trade', {})
             
             # 设置自动交易配置
-            trade_config = TradeConfig(
-                party_timeout_ms=at_config.get('party_timeout_ms', 30000),
-                trade_timeout_ms=at_config.get('trade_timeout_ms', 10000),
-                stash_interval_ms=at_config.get('stash_interval_ms', 1000),
-                trade_interval_ms=at_config.get('trade_interval_ms', 1000)
-            )
+            trade_config = TradeConfig.from_dict(at_config)
             self.auto_trade.set_config(trade_config)
+            # 实际监控时把每笔交易的分阶段耗时写入追踪文件
+            self.auto_trade.tracer.file_path = DEFAULT_TRACE_FILE
             
             # 添加自动交易处理器
             self.monitor.add_handler(self.auto_trade)
@@ -81,6 +102,16 @@ class MonitorManager:
         if hasattr(self, 'auto_trade'):
             self.auto_trade.stop_current_trade()
             
+    def shutdown(self):
+        """退出程序时提交账本中剩余的写入"""
+        if self.ledger:
+            self.ledger.close()
+            
+    def _on_config_changed(self, config):
+        """配置变更通知回调"""
+        if self.monitor:
+            self.monitor.push_dispatcher.reload_config(config)
+            
     def _setup_push_handlers(self, push_config):
         """设置推送处理器"""
         handlers_added = 0
@@ -1,9 +1,11 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                              QLineEdit, QTextEdit, QSpinBox, QFrame)
-from PySide6.QtCore import Qt
+                              QLineEdit, QTextEdit, QSpinBox, QFrame,
+                              QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
+from PySide6.QtCore import Qt, QTimer
 from core.auto_trade import TradeConfig
 from gui.widgets.switch import Switch
 from gui.styles import Styles
+from datetime import datetime
 import json
 
 class AutoTradePage(QWidget):
@@ -11,6 +13,11 @@ class AutoTradePage(QWidget):
         super().__init__(parent)
         self.save_config = save_config
         self.trade_config = TradeConfig()
+        self.extra_config = {}  # 界面上没有对应控件的自动交易配置，保存时原样保留
+        self.queue_stats_provider = None
+        self.latency_stats_provider = None
+        self.wait_stats_provider = None
+        self.history_provider = None
         
         # 创建主布局
         self.main_layout = QVBoxLayout(self)
@@ -107,8 +114,83 @@ class AutoTradePage(QWidget):
         
         config_layout.addLayout(interval_layout)
         
+        # 流水线模式：等待买家进入期间预先打开仓库并定位网格
+        pipeline_layout = QHBoxLayout()
+        pipeline_layout.addWidget(QLabel("等待入组时预备仓库"))
+        self.pipelined_stash_switch = Switch()
+        self.pipelined_stash_switch.stateChanged.connect(self._on_config_changed)
+        pipeline_layout.addWidget(self.pipelined_stash_switch)
+        pipeline_layout.addStretch()
+        config_layout.addLayout(pipeline_layout)
+        
+        # 画面确认：界面就绪后立即继续，间隔配置作为最长等待时间
+        visual_layout = QHBoxLayout()
+        visual_layout.addWidget(QLabel("画面确认后立即继续"))
+        self.visual_confirm_switch = Switch()
+        self.visual_confirm_switch.setChecked(True)
+        self.visual_confirm_switch.stateChanged.connect(self._on_config_changed)
+        visual_layout.addWidget(self.visual_confirm_switch)
+        visual_layout.addStretch()
+        config_layout.addLayout(visual_layout)
+        
         self.main_layout.addWidget(config_frame)
 
+        # 交易队列统计
+        queue_frame = QFrame()
+        queue_frame.setProperty('class', 'card-frame')
+        queue_layout = QHBoxLayout(queue_frame)
+        queue_layout.setContentsMargins(10, 10, 10, 10)
+        
+        # 标题
+        queue_title = QLabel("交易队列")
+        queue_title.setProperty('class', 'card-title')
+        self.main_layout.addWidget(queue_title)
+        
+        self.queue_depth_label = QLabel("排队: 0")
+        self.queue_wait_label = QLabel("等待: 平均 0.0s / P90 0.0s / 最长 0.0s")
+        self.queue_count_label = QLabel("合并: 0  过期: 0  丢弃: 0")
+        queue_layout.addWidget(self.queue_depth_label)
+        queue_layout.addWidget(self.queue_wait_label)
+        queue_layout.addWidget(self.queue_count_label)
+        queue_layout.addStretch()
+        
+        self.main_layout.addWidget(queue_frame)
+        
+        # 分阶段耗时统计
+        latency_frame = QFrame()
+        latency_frame.setProperty('class', 'card-frame')
+        latency_layout = QVBoxLayout(latency_frame)
+        latency_layout.setContentsMargins(10, 10, 10, 10)
+        
+        # 标题
+        latency_title = QLabel("阶段耗时(毫秒)")
+        latency_title.setProperty('class', 'card-title')
+        self.main_layout.addWidget(latency_title)
+        
+        self.latency_table = QTableWidget()
+        self.latency_table.setColumnCount(5)
+        self.latency_table.setHorizontalHeaderLabels(["阶段", "次数", "P50", "P90", "P99"])
+        self.latency_table.setEditTriggers(QAbstractItemView.NoEditTriggers)  # 禁止编辑
+        self.latency_table.setSelectionMode(QAbstractItemView.NoSelection)
+        self.latency_table.verticalHeader().setVisible(False)
+        self.latency_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.latency_table.setFixedHeight(160)
+        self.latency_table.setStyleSheet(Styles().currency_table_style)
+        latency_layout.addWidget(self.latency_table)
+        
+        self.wait_stats_label = QLabel("画面确认: 0/0 次, 累计节省 0.0s")
+        latency_layout.addWidget(self.wait_stats_label)
+        
+        self.main_layout.addWidget(latency_frame)
+        
+        # 定时刷新统计，避免从交易线程直接操作界面
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.refresh_queue_stats)
+        self.stats_timer.timeout.connect(self.refresh_latency_stats)
+        self.stats_timer.timeout.connect(self.refresh_wait_stats)
+        self.stats_timer.timeout.connect(self.load_trade_history)
+        self.stats_timer.start(1000)
+
         # 当前交易状态显示
         status_frame = QFrame()
         status_frame.setProperty('class', 'card-frame')
@@ -153,6 +235,7 @@ class AutoTradePage(QWidget):
             return
             
         auto_trade_config = config.get('auto_trade', {})
+        self.extra_config = dict(auto_trade_config)
         
         # 设置开关状态
         self.auto_trade_switch.setChecked(auto_trade_config.get('enabled', False))
@@ -162,6 +245,8 @@ class AutoTradePage(QWidget):
         self.trade_timeout_input.setValue(auto_trade_config.get('trade_timeout_ms', 10000))
         self.stash_interval_input.setValue(auto_trade_config.get('stash_interval_ms', 1000))
         self.trade_interval_input.setValue(auto_trade_config.get('trade_interval_ms', 1000))
+        self.pipelined_stash_switch.setChecked(auto_trade_config.get('pipelined_stash', False))
+        self.visual_confirm_switch.setChecked(auto_trade_config.get('visual_confirm', True))
         
         # 更新交易配置
         self._update_trade_config()
@@ -170,22 +255,20 @@ class AutoTradePage(QWidget):
         """获取当前配置"""
         return {
             'auto_trade': {
+                **self.extra_config,
                 'enabled': self.auto_trade_switch.isChecked(),
                 'party_timeout_ms': self.party_timeout_input.value(),
                 'trade_timeout_ms': self.trade_timeout_input.value(),
                 'stash_interval_ms': self.stash_interval_input.value(),
-                'trade_interval_ms': self.trade_interval_input.value()
+                'trade_interval_ms': self.trade_interval_input.value(),
+                'pipelined_stash': self.pipelined_stash_switch.isChecked(),
+                'visual_confirm': self.visual_confirm_switch.isChecked()
             }
         }
 
     def _update_trade_config(self):
         """更新交易配置"""
-        self.trade_config = TradeConfig(
-            party_timeout_ms=self.party_timeout_input.value(),
-            trade_timeout_ms=self.trade_timeout_input.value(),
-            stash_interval_ms=self.stash_interval_input.value(),
-            trade_interval_ms=self.trade_interval_input.value()
-        )
+        self.trade_config = TradeConfig.from_dict(self.get_config_data()['auto_trade'])
 
     def _on_switch_changed(self):
         """处理开关状态变化"""
@@ -220,3 +303,87 @@ class AutoTradePage(QWidget):
         self.history_display.verticalScrollBar().setValue(
             self.history_display.verticalScrollBar().maximum()
         )
+
+    def set_history_provider(self, provider):
+        """设置历史交易记录的数据来源（返回账本记录列表的函数），在下次刷新时载入"""
+        self.history_provider = provider
+
+    def load_trade_history(self):
+        """载入账本中的历史交易记录（只载入一次，之后的交易由add_trade_history追加）"""
+        if not self.history_provider:
+            return
+        provider, self.history_provider = self.history_provider, None
+        records = provider()
+        lines = [self._format_ledger_record(record) for record in reversed(records)]
+        if lines:
+            self.history_display.setPlainText("\n".join(lines) + "\n" + self.history_display.toPlainText())
+            self.history_display.verticalScrollBar().setValue(
+                self.history_display.verticalScrollBar().maximum()
+            )
+
+    @staticmethod
+    def _format_ledger_record(record: dict) -> str:
+        """把账本中的交易记录格式化为历史记录行"""
+        started = datetime.fromtimestamp(record['started_at']).strftime('%Y-%m-%d %H:%M:%S')
+        price = f"{record['price']:g} {record['currency']}" if record.get('price') is not None else "-"
+        duration = (record.get('duration_ms') or 0) / 1000
+        if record.get('outcome') == 'completed':
+            return (f"[{started}] 交易完成 - 用户: {record['user']}, 物品: {record['item']}, "
+                    f"价格: {price}, 用时: {duration:.1f}秒")
+        return (f"[{started}] 交易失败 - 用户: {record['user']}, 物品: {record['item']}, "
+                f"价格: {price}, 原因: {record.get('reason') or '-'}")
+
+    def set_queue_stats_provider(self, provider):
+        """设置交易队列统计的数据来源（返回统计字典的函数）"""
+        self.queue_stats_provider = provider
+        self.refresh_queue_stats()
+
+    def refresh_queue_stats(self):
+        """刷新交易队列深度和等待时间显示"""
+        if not self.queue_stats_provider:
+            return
+        stats = self.queue_stats_provider()
+        self.queue_depth_label.setText(f"排队: {stats['depth']}/{stats['max_size']}")
+        self.queue_wait_label.setText(
+            f"等待: 平均 {stats['avg_wait_ms'] / 1000:.1f}s / "
+            f"P90 {stats['p90_wait_ms'] / 1000:.1f}s / "
+            f"最长 {stats['max_wait_ms'] / 1000:.1f}s"
+        )
+        self.queue_count_label.setText(
+            f"合并: {stats['merged']}  过期: {stats['expired']}  丢弃: {stats['dropped']}"
+        )
+
+    def set_latency_stats_provider(self, provider):
+        """设置分阶段耗时统计的数据来源（返回 {阶段: {count, p50, p90, p99}} 的函数）"""
+        self.latency_stats_provider = provider
+        self.refresh_latency_stats()
+
+    def refresh_latency_stats(self):
+        """刷新各阶段的耗时百分位数"""
+        if not self.latency_stats_provider:
+            return
+        stats = self.latency_stats_provider()
+        self.latency_table.setRowCount(len(stats))
+        for row, (stage, values) in enumerate(stats.items()):
+            cells = [stage, str(values['count']),
+                     f"{values['p50']:.0f}", f"{values['p90']:.0f}", f"{values['p99']:.0f}"]
+            for col, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if col > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.latency_table.setItem(row, col, item)
+
+    def set_wait_stats_provider(self, provider):
+        """设置画面确认等待统计的数据来源（返回 {步骤: {count, confirmed, timeouts, avg_wait_ms, saved_ms}} 的函数）"""
+        self.wait_stats_provider = provider
+        self.refresh_wait_stats()
+
+    def refresh_wait_stats(self):
+        """刷新画面确认的次数和累计节省时间"""
+        if not self.wait_stats_provider:
+            return
+        stats = self.wait_stats_provider()
+        count = sum(values['count'] for values in stats.values())
+        confirmed = sum(values['confirmed'] for values in stats.values())
+        saved = sum(values['saved_ms'] for values in stats.values()) / 1000
+        self.wait_stats_label.setText(f"画面确认: {confirmed}/{count} 次, 累计节省 {saved:.1f}s")
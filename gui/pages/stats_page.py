@@ -1,6 +1,6 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                                     QPushButton, QFrame, QScrollArea)
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QPixmap
 from gui.styles import Styles
 import os
@@ -49,6 +49,8 @@ class StatsPage(QWidget):
         self.currency_stats = {}  # 存储通货统计数据
         self.trade_message_count = 0  # 交易消息计数
         self.configured_currencies = []  # 已配置的通货单位
+        self.ledger = None  # 交易账本，设置后统计数据从账本查询
+        self.displayed_stats = None  # 当前显示的数据，未变化时不重建显示项
         
         # 创建主布局
         self.main_layout = QVBoxLayout(self)
@@ -73,9 +75,35 @@ class StatsPage(QWidget):
         
         self.main_layout.addWidget(btn_container)
         
+        # 账本统计刷新定时器
+        self.ledger_timer = QTimer(self)
+        self.ledger_timer.timeout.connect(self.refresh_from_ledger)
+        self.ledger_timer.start(2000)
+        
         # 初始化显示
         self.refresh_stats_display()
         
+    def set_ledger(self, ledger):
+        """设置交易账本，之后统计数据由账本提供（在下次定时刷新时生效）"""
+        self.ledger = ledger
+        
+    def refresh_from_ledger(self):
+        """从账本查询统计数据，有变化时刷新显示"""
+        if not self.ledger:
+            return
+        try:
+            currency_stats = self.ledger.currency_totals()
+            message_count = self.ledger.request_count()
+        except Exception as e:
+            self.log_message(f"查询交易账本失败: {str(e)}", "ERROR")
+            return
+        
+        self.trade_message_count = message_count
+        self.message_count_label.setText(str(message_count))
+        if currency_stats != self.currency_stats:
+            self.currency_stats = currency_stats
+            self.refresh_stats_display()
+        
     def _create_stats_frame(self):
         """创建统计区域"""
         # 交易消息数统计
@@ -148,6 +176,10 @@ class StatsPage(QWidget):
         
     def clear_stats(self):
         """清除所有统计数据"""
+        if self.ledger:
+            # 账本中的历史记录保留，只移动统计起点
+            self.ledger.reset_stats()
+            self.ledger.flush()
         self.currency_stats.clear()
         self.trade_message_count = 0
         self.message_count_label.setText("0")
@@ -165,12 +197,6 @@ class StatsPage(QWidget):
 
     def refresh_stats_display(self):
         """刷新统计显示"""
-        # 清除现有显示（除了stretch）
-        while self.currency_layout.count() > 1:
-            item = self.currency_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-            
         # 获取最新的配置通货单位和统计数据
         if hasattr(self.parent(), 'get_item_config'):
             self.configured_currencies = self.parent().get_item_config()
@@ -179,6 +205,18 @@ class StatsPage(QWidget):
         currencies = set(self.currency_stats.keys())
         currencies.update(self.configured_currencies)
         
+        # 显示内容未变化时不重建
+        snapshot = (tuple(sorted(currencies)), tuple(sorted(self.currency_stats.items())))
+        if snapshot == self.displayed_stats:
+            return
+        self.displayed_stats = snapshot
+        
+        # 清除现有显示（除了stretch）
+        while self.currency_layout.count() > 1:
+            item = self.currency_layout.takeAt(0)
+            if item.widget():
+                item.widget().deleteLater()
+        
         # 重新创建显示项
         for currency in sorted(currencies):
             img_path = self._get_resource_path(f"{currency.lower()}.png")
@@ -187,14 +225,19 @@ class StatsPage(QWidget):
             self.currency_layout.insertWidget(self.currency_layout.count() - 1, item)
             
     def get_config_data(self):
-        """获取页面数据"""
+        """获取页面数据，有交易账本时统计数据由账本保存，不写入配置文件"""
+        if self.ledger:
+            return {}
         return {
             'currency_stats': self.currency_stats,
             'trade_message_count': self.trade_message_count
         }
         
     def set_config_data(self, data):
-        """设置页面数据"""
+        """设置页面数据，有交易账本时统计数据以账本为准"""
+        if self.ledger:
+            self.refresh_from_ledger()
+            return
         self.currency_stats = data.get('currency_stats', {})
         self.trade_message_count = data.get('trade_message_count', 0)
         
@@ -0,0 +1,271 @@
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.push.rate_limiter import PushRateLimiter, PRIORITY_TRADE, PRIORITY_MESSAGE
+from core.push.dispatcher import PushDispatcher
+from core.push.circuit_breaker import CircuitBreaker, BreakerState
+
+class FakeClock:
+    """可手动推进的时钟"""
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class FakePusher:
+    """记录发送内容的推送器"""
+    def __init__(self, channel, success=True):
+        self.channel = channel
+        self.success = success
+        self.sent = []
+
+    def send(self, keyword, content):
+        self.sent.append((keyword, content))
+        return self.success, "ok" if self.success else "failed"
+
+    def test(self):
+        return self.send("测试", "测试消息")
+
+def test_rate_limiter_reserves_tokens_for_trade():
+    """消息模式不能占用为交易消息预留的令牌"""
+    limits = {'serverchan': {'capacity': 5, 'refill_per_minute': 0, 'trade_reserve_ratio': 0.4}}
+    limiter = PushRateLimiter(limits, state_file=None, clock=FakeClock())
+
+    allowed_messages = 0
+    while limiter.acquire('serverchan', PRIORITY_MESSAGE)[0]:
+        allowed_messages += 1
+    assert allowed_messages == 3
+
+    # 剩余令牌只供交易消息使用
+    assert limiter.acquire('serverchan', PRIORITY_TRADE)[0]
+    assert limiter.acquire('serverchan', PRIORITY_TRADE)[0]
+    assert not limiter.acquire('serverchan', PRIORITY_TRADE)[0]
+
+def test_rate_limiter_refill_and_daily_quota():
+    """令牌按时间补充，每日配额跨天重置"""
+    clock = FakeClock()
+    limits = {'qmsgchan': {'capacity': 2, 'refill_per_minute': 60, 'daily_quota': 3, 'trade_reserve_ratio': 0}}
+    limiter = PushRateLimiter(limits, state_file=None, clock=clock)
+
+    assert limiter.acquire('qmsgchan', PRIORITY_TRADE)[0]
+    assert limiter.acquire('qmsgchan', PRIORITY_TRADE)[0]
+    assert not limiter.acquire('qmsgchan', PRIORITY_TRADE)[0]
+
+    clock.now += 1
+    assert limiter.acquire('qmsgchan', PRIORITY_TRADE)[0]
+    clock.now += 1
+    allowed, reason = limiter.acquire('qmsgchan', PRIORITY_TRADE)
+    assert not allowed and "配额" in reason
+
+    clock.now += 24 * 3600
+    assert limiter.acquire('qmsgchan', PRIORITY_TRADE)[0]
+
+def test_rate_limiter_state_survives_restart(tmp_path):
+    """重启后恢复已用配额"""
+    state_file = str(tmp_path / "limiter.json")
+    clock = FakeClock()
+    limits = {'wxpusher': {'capacity': 10, 'refill_per_minute': 0, 'daily_quota': 2, 'trade_reserve_ratio': 0}}
+
+    limiter = PushRateLimiter(limits, state_file=state_file, clock=clock)
+    assert limiter.acquire('wxpusher', PRIORITY_TRADE)[0]
+    assert limiter.acquire('wxpusher', PRIORITY_TRADE)[0]
+
+    limiter.flush()
+
+    restarted = PushRateLimiter(limits, state_file=state_file, clock=clock)
+    assert not restarted.acquire('wxpusher', PRIORITY_TRADE)[0]
+    assert restarted.get_stats()['wxpusher']['used_today'] == 2
+
+def test_rate_limiter_saves_state_on_interval(tmp_path):
+    """状态按间隔写盘，间隔内的变化在flush()时保存"""
+    state_file = tmp_path / "limiter.json"
+    clock = FakeClock()
+    limits = {'wxpusher': {'capacity': 10, 'refill_per_minute': 0, 'daily_quota': 5, 'trade_reserve_ratio': 0}}
+    limiter = PushRateLimiter(limits, state_file=str(state_file), clock=clock, save_interval=5)
+
+    def saved_usage():
+        return json.loads(state_file.read_text(encoding='utf-8'))['wxpusher']['used_today']
+
+    limiter.acquire('wxpusher', PRIORITY_TRADE)
+    assert saved_usage() == 1  # 首次申请立即写盘
+    limiter.acquire('wxpusher', PRIORITY_TRADE)
+    assert saved_usage() == 1
+    clock.now += 5
+    limiter.acquire('wxpusher', PRIORITY_TRADE)
+    assert saved_usage() == 3
+    limiter.acquire('wxpusher', PRIORITY_TRADE)
+    limiter.flush()
+    assert saved_usage() == 4
+    assert not os.path.exists(f"{state_file}.tmp")
+
+def test_dispatcher_skips_limited_channels():
+    """被限流的渠道不发送，其他渠道照常发送"""
+    limits = {'serverchan': {'capacity': 1, 'refill_per_minute': 0, 'trade_reserve_ratio': 0}}
+    limiter = PushRateLimiter(limits, state_file=None, clock=FakeClock())
+    dispatcher = PushDispatcher(limiter)
+    serverchan = FakePusher('serverchan')
+    wxpusher = FakePusher('wxpusher')
+    dispatcher.add_handler(serverchan)
+    dispatcher.add_handler(wxpusher)
+
+    assert dispatcher.dispatch("kw", "first", PRIORITY_TRADE)
+    assert dispatcher.dispatch("kw", "second", PRIORITY_TRADE)
+    assert len(serverchan.sent) == 1
+    assert len(wxpusher.sent) == 2
+
+def test_circuit_breaker_opens_and_recovers():
+    """连续失败后熔断，冷却后探测成功恢复"""
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout_ms=1000, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert not breaker.allow_request()
+    assert breaker.health_score() == 0.0
+
+    assert not breaker.try_begin_probe()
+    clock.now += 1
+    assert breaker.try_begin_probe()
+    assert breaker.state == BreakerState.HALF_OPEN
+
+    # 探测失败，等待时间翻倍
+    breaker.record_failure()
+    assert breaker.state == BreakerState.OPEN
+    clock.now += 1
+    assert not breaker.try_begin_probe()
+    clock.now += 1
+    assert breaker.try_begin_probe()
+
+    breaker.record_success()
+    assert breaker.allow_request()
+    assert breaker.get_stats()['recovery_timeout_ms'] == 1000
+
+def test_dispatcher_skips_open_channel_and_shares_budget():
+    """熔断渠道不再发送，其超时预算分给健康渠道"""
+    dispatcher = PushDispatcher(breaker_config={'failure_threshold': 1, 'recovery_timeout_ms': 3600000},
+                                dispatch_budget_ms=12000)
+    dead = FakePusher('serverchan', success=False)
+    healthy = FakePusher('wxpusher')
+    dispatcher.add_handler(dead)
+    dispatcher.add_handler(healthy)
+
+    assert dispatcher.dispatch("kw", "first")
+    assert healthy.timeout == 6.0
+    assert dispatcher.dispatch("kw", "second")
+    assert healthy.timeout == 10.0
+    assert len(dead.sent) == 1
+    assert len(healthy.sent) == 2
+
+    health = dispatcher.get_health()
+    assert health['serverchan']['state'] == BreakerState.OPEN.value
+    assert health['wxpusher']['health'] == 1.0
+
+def test_pushers_against_mock_server():
+    """所有推送渠道都能向本地模拟服务器投递，错误注入会触发熔断"""
+    from tools.mock_push_server import MockPushServer, FaultInjector
+    from core.push.wxpusher import WxPusher
+    from core.push.serverchan import ServerChan
+    from core.push.qmsgchan import QmsgChan
+    from core.push.email_pusher import EmailPusher
+
+    injector = FaultInjector()
+    server = MockPushServer(injector=injector).start()
+    try:
+        config = server.push_config()
+        dispatcher = PushDispatcher(breaker_config={'failure_threshold': 1, 'recovery_timeout_ms': 3600000})
+        for pusher_class in (WxPusher, ServerChan, QmsgChan, EmailPusher):
+            dispatcher.add_handler(pusher_class(config))
+
+        assert dispatcher.dispatch("kw", "hello")
+        stats = server.stats.snapshot()
+        assert set(stats) == {'wxpusher', 'serverchan', 'qmsgchan', 'email'}
+        assert all(channel['ok'] == 1 for channel in stats.values())
+
+        injector.error_rate = 1.0
+        assert not dispatcher.dispatch("kw", "fail")
+        assert not dispatcher.dispatch("kw", "skipped")
+        assert server.stats.total_requests() == 8
+        assert all(h['state'] == BreakerState.OPEN.value for h in dispatcher.get_health().values())
+    finally:
+        server.stop()
+
+def test_pusher_config_snapshot_and_reload():
+    """配置在构造时验证一次，只有变更通知才会刷新"""
+    from core.config import Config
+    from core.push.serverchan import ServerChan
+
+    config = Config(config_file=os.devnull)
+    pusher = ServerChan(config)
+    assert pusher.validate_config() == (False, "请配置Server酱的SendKey")
+    assert pusher.send("kw", "content") == (False, "请配置Server酱的SendKey")
+
+    # 直接修改配置不影响已生成的快照
+    config.config['serverchan']['send_key'] = 'SCTkey'
+    assert not pusher.validate_config()[0]
+
+    dispatcher = PushDispatcher()
+    dispatcher.add_handler(pusher)
+    config.add_listener(dispatcher.reload_config)
+    config.notify_listeners()
+    assert pusher.validate_config()[0]
+    assert pusher.send_url == "https://sctapi.ftqq.com/SCTkey.send"
+
+    # 与该渠道无关的配置保存不会重新启用已熔断的渠道，渠道配置变化时才重置
+    breaker = dispatcher.breakers[dispatcher.channel_of(pusher)]
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    config.config['keywords'] = ['unrelated']
+    config.notify_listeners()
+    assert not breaker.allow_request()
+    config.config['serverchan']['send_key'] = 'SCTother'
+    config.notify_listeners()
+    assert breaker.allow_request()
+
+def test_config_listener_errors_are_logged(caplog):
+    """监听器出错时记录日志，其他监听器照常收到通知"""
+    from core.config import Config
+    config = Config(config_file=os.devnull)
+    called = []
+
+    def broken(_):
+        raise RuntimeError("boom")
+
+    config.add_listener(broken)
+    config.add_listener(called.append)
+    config.notify_listeners()
+    assert called == [config]
+    assert any("boom" in record.getMessage() for record in caplog.records)
+
+def test_dispatcher_uses_real_message_as_half_open_trial():
+    """冷却结束后用真实消息试探熔断渠道，不发送测试消息"""
+    clock = FakeClock(now=0.0)
+    dispatcher = PushDispatcher(breaker_config={'failure_threshold': 1, 'recovery_timeout_ms': 1000, 'clock': clock})
+    flaky = FakePusher('serverchan', success=False)
+    dispatcher.add_handler(flaky)
+
+    assert not dispatcher.dispatch("kw", "first")
+    assert not dispatcher.dispatch("kw", "skipped")
+    assert flaky.sent == [("kw", "first")]
+
+    clock.now = 2.0
+    flaky.success = True
+    assert dispatcher.dispatch("kw", "trial")
+    assert flaky.sent == [("kw", "first"), ("kw", "trial")]
+    assert dispatcher.get_health()['serverchan']['state'] == BreakerState.CLOSED.value
+
+    # 试探失败时重新熔断，冷却时间翻倍
+    flaky.success = False
+    assert not dispatcher.dispatch("kw", "fails")
+    clock.now = 3.5
+    assert not dispatcher.dispatch("kw", "failed trial")
+    clock.now = 5.0
+    assert not dispatcher.dispatch("kw", "still open")
+    clock.now = 5.6
+    flaky.success = True
+    assert dispatcher.dispatch("kw", "second trial")
+    assert ("测试", "测试消息") not in flaky.sent
+    assert flaky.sent[-2:] == [("kw", "failed trial"), ("kw", "second trial")]
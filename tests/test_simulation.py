@@ -0,0 +1,361 @@
+import sys
+import os
+import threading
+import time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import numpy as np
+import pytest
+
+from core.platforms.base import set_platform, KEY_CTRL, KEY_ESC
+from core.platforms.simulation import SimulationPlatform, SimRule, RULE_COMMAND
+from core.platforms.macro import InputTiming, chat_command_macro, ctrl_click_macro
+from core.platforms.gdi_capture import bgrx_view, bgrx_to_bgr
+from core.process_modules.game_command import GameCommandModule
+import core.auto_trade
+from core.auto_trade import AutoTrade, TradeConfig
+from core.visual_wait import ScreenChangeProbe, STASH_REGION, INVENTORY_REGION
+from core.frame_capture import FrameCapture, PlatformFrameSource, get_frame_capture
+from core.vision.scale_memory import ScaleMemory, set_scale_memory
+from core.vision.template_bank import TemplateBank, set_template_bank
+from core.vision.roi_memory import RoiMemory, set_roi_memory
+from tools.sim_scenario import synthetic_trade_platform, export_scenario, LOG_PREFIX
+
+@pytest.fixture
+def repo_cwd(monkeypatch):
+    """识别模板使用相对路径，测试在仓库根目录下运行"""
+    monkeypatch.chdir(ROOT)
+
+@pytest.fixture(autouse=True)
+def scale_memory():
+    """使用不落盘的尺度记忆、模板库和区域记忆，测试结束后恢复"""
+    memory = ScaleMemory(None)
+    previous = set_scale_memory(memory), set_template_bank(TemplateBank(None)), set_roi_memory(RoiMemory(None))
+    yield memory
+    set_scale_memory(previous[0])
+    set_template_bank(previous[1])
+    set_roi_memory(previous[2])
+
+@pytest.fixture
+def use_platform():
+    """设置仿真平台，测试结束后恢复"""
+    previous = []
+    def install(platform):
+        previous.append(set_platform(platform))
+        return platform
+    yield install
+    if previous:
+        set_platform(previous[0])
+
+def make_auto_trade(**config):
+    """创建不写追踪文件的AutoTrade，返回(实例, 历史记录列表)"""
+    auto_trade = AutoTrade()
+    auto_trade.tracer.file_path = None
+    history = []
+    auto_trade.set_callbacks(lambda status: None, history.append)
+    config.setdefault('stash_interval_ms', 0)
+    config.setdefault('trade_interval_ms', 0)
+    auto_trade.set_config(TradeConfig(**config))
+    return auto_trade, history
+
+def test_simulation_chat_command_triggers_scripted_logs(use_platform):
+    """回车-粘贴-回车提交的命令按规则输出日志，输入全部记录"""
+    received = []
+    platform = use_platform(SimulationPlatform(
+        rules=[SimRule(RULE_COMMAND, match=r"^/invite (?P<user>\S+)$", logs=[(0, "{user} 進入了此區域。")])],
+        log_sink=received.append
+    ))
+
+    assert GameCommandModule().run(command_text="/invite Buy.er")
+    assert GameCommandModule().run(command_text="/kick Buy.er")
+    assert received == ["Buy.er 進入了此區域。"]
+    assert platform.events_of('command') == ["/invite Buy.er", "/kick Buy.er"]
+    assert platform.clipboard == "/kick Buy.er"
+    assert not platform.keys_down and not platform.chat_open
+
+def test_full_trade_flow_runs_headless(repo_cwd, use_platform):
+    """完整交易流程在仿真平台上运行：识别仓库按钮、定位网格并按住Ctrl点击目标格子"""
+    auto_trade, history = make_auto_trade(party_timeout_ms=2000)
+    platform, layout = synthetic_trade_platform(log_sink=auto_trade.handle_game_log)
+    use_platform(platform)
+
+    auto_trade._process_trade({'user': 'Buyer', 'p1_num': '3', 'p2_num': '5'}, "")
+
+    assert len(history) == 1 and "交易完成" in history[0]
+    assert platform.events_of('command') == ["/invite Buyer", "/tradewith Buyer"]
+    assert platform.screen == 'game'  # ESC关闭了仓库
+
+    # 双击仓库按钮，然后按住Ctrl点击第3列第5行
+    x1, y1, x2, y2 = layout['stash_region']
+    clicks = platform.events_of('click')
+    assert len(clicks) == 3
+    assert all(x1 <= x < x2 and y1 <= y < y2 for x, y in clicks[:2])
+    gx, gy = layout['grid_origin']
+    cell = layout['cell']
+    col, row = (clicks[2][0] - gx) // cell, (clicks[2][1] - gy) // cell
+    assert (col, row) == (2, 4)
+
+    kinds = [(event.kind, event.detail) for event in platform.events]
+    click = kinds.index(('click', clicks[2]))
+    ctrl_events = [kind for kind, detail in kinds if detail == KEY_CTRL]
+    before = [kind for kind, detail in kinds[:click] if detail == KEY_CTRL]
+    assert before[-1] == 'key_down' and ctrl_events[len(before)] == 'key_up'
+    assert ('key_down', KEY_ESC) in kinds
+
+def test_empty_target_cell_is_not_clicked(repo_cwd, use_platform):
+    """目标格子为空时不按住Ctrl点击，交易失败"""
+    auto_trade, history = make_auto_trade(party_timeout_ms=2000)
+    platform, _ = synthetic_trade_platform(log_sink=auto_trade.handle_game_log)
+    use_platform(platform)
+
+    auto_trade._process_trade({'user': 'Buyer', 'p1_num': '4', 'p2_num': '5'}, "")
+
+    assert "取出物品失败" in history[-1]
+    assert len(platform.events_of('click')) == 2  # 只双击了仓库按钮，没有点击网格
+    assert platform.events_of('command') == ["/invite Buyer", "/kick Buyer"]
+
+def test_item_removed_after_stash_prep_is_not_clicked(repo_cwd, use_platform, monkeypatch):
+    """预备定位网格后物品被移走，取出前重新截图检查格子，不点击空格子"""
+    auto_trade, history = make_auto_trade(party_timeout_ms=2000, pipelined_stash=True)
+    platform, layout = synthetic_trade_platform(log_sink=auto_trade.handle_game_log)
+    use_platform(platform)
+
+    locate_grid = auto_trade.take_out_item.locate_grid
+    def locate_then_remove_item():
+        grid = locate_grid()
+        # 用右侧空格子覆盖第3列第5行的物品
+        (gx, gy), cell = layout['grid_origin'], layout['cell']
+        stash = platform.screens['stash']
+        rows = slice(gy + 4 * cell, gy + 5 * cell)
+        stash[rows, gx + 2 * cell:gx + 3 * cell] = stash[rows, gx + 3 * cell:gx + 4 * cell]
+        get_frame_capture().invalidate()
+        return grid
+    monkeypatch.setattr(auto_trade.take_out_item, 'locate_grid', locate_then_remove_item)
+
+    auto_trade._process_trade({'user': 'Buyer', 'p1_num': '3', 'p2_num': '5'}, "")
+
+    assert "取出物品失败" in history[-1]
+    assert len(platform.events_of('click')) == 2  # 只有预备时双击仓库按钮
+
+def test_unqueued_trade_request_can_be_resent():
+    """队列已满未能排队、或排队后被淘汰的请求，买家重新发送时不被视为重复"""
+    auto_trade, _ = make_auto_trade(queue_max_size=1)
+    auto_trade.enabled = True  # 不启动交易线程，请求留在队列中
+    template = "來自 {@user}: 我想購買 {@item} 標價 {@price} {@currency} (位置: {@p1_num}, {@p2_num})"
+    cheap = "來自 Cheap: 我想購買 Item 標價 1 exalted (位置: 1, 2)"
+    rich = "來自 Rich: 我想購買 Item 標價 1 divine (位置: 3, 4)"
+    low = "來自 Low: 我想購買 Item 標價 2 exalted (位置: 5, 6)"
+
+    auto_trade.handle_trade_message(cheap, template)
+    auto_trade.handle_trade_message(rich, template)  # 淘汰Cheap
+    auto_trade.handle_trade_message(low, template)   # 队列已满，未排队
+    assert auto_trade.pending_trades.get_stats()['dropped'] == 2
+
+    auto_trade.pending_trades.pop(timeout=0)
+    auto_trade.handle_trade_message(cheap, template)
+    assert [entry.buyer for entry in auto_trade.pending_trades.pending.values()] == ['Cheap']
+    auto_trade.pending_trades.pop(timeout=0)
+    auto_trade.handle_trade_message(low, template)
+    assert [entry.buyer for entry in auto_trade.pending_trades.pending.values()] == ['Low']
+
+def test_cleared_trade_request_can_be_resent():
+    """停止交易时清空的排队请求，买家重新发送时不被视为重复"""
+    auto_trade, _ = make_auto_trade()
+    auto_trade.enabled = True  # 不启动交易线程，请求留在队列中
+    template = "來自 {@user}: 我想購買 {@item} 標價 {@price} {@currency} (位置: {@p1_num}, {@p2_num})"
+    message = "來自 Buyer: 我想購買 Item 標價 1 divine (位置: 1, 2)"
+
+    auto_trade.handle_trade_message(message, template)
+    auto_trade.stop_current_trade()
+    assert not auto_trade.pending_trades.pending
+
+    auto_trade.handle_trade_message(message, template)
+    assert [entry.buyer for entry in auto_trade.pending_trades.pending.values()] == ['Buyer']
+
+
+def hang_prep_locate_grid(auto_trade, monkeypatch, seconds):
+    """
+    预备中的网格定位卡住seconds秒（为None时直到返回的事件被设置），串行执行时正常定位
+    用户在预备线程卡住之后才进入，预备超时的计时不受预备前几步耗时的影响
+    """
+    release, released, entered = threading.Event(), threading.Event(), threading.Event()
+    locate_grid = auto_trade.take_out_item.locate_grid
+    calls = []
+    def hung_locate_grid():
+        calls.append(threading.current_thread())
+        if len(calls) > 1:
+            return locate_grid()
+        entered.set()
+        release.wait(10 if seconds is None else seconds)
+        released.set()
+        return None
+    monkeypatch.setattr(auto_trade.take_out_item, 'locate_grid', hung_locate_grid)
+    wait_for_join = auto_trade._wait_for_join
+    monkeypatch.setattr(auto_trade, '_wait_for_join', lambda timeout_ms: entered.wait(5) and wait_for_join(timeout_ms))
+    return calls, release, released
+
+def test_hung_stash_prep_falls_back_to_serial(repo_cwd, use_platform, monkeypatch):
+    """仓库预备超时后取消预备，后台线程退出后改为串行完成交易"""
+    monkeypatch.setattr(core.auto_trade, 'STASH_PREP_GRACE', 0.3)
+    auto_trade, history = make_auto_trade(party_timeout_ms=2000, pipelined_stash=True)
+    platform, _ = synthetic_trade_platform(log_sink=auto_trade.handle_game_log)
+    use_platform(platform)
+    calls, _, released = hang_prep_locate_grid(auto_trade, monkeypatch, 0.8)
+
+    start = time.monotonic()
+    auto_trade._process_trade({'user': 'Buyer', 'p1_num': '3', 'p2_num': '5'}, "")
+    assert time.monotonic() - start < 5
+    assert "交易完成" in history[-1]
+    # 串行执行开始时预备线程已经退出
+    assert released.is_set() and len(calls) == 2 and calls[1] is threading.current_thread()
+    assert len(platform.events_of('click')) == 5  # 预备和串行各双击一次仓库按钮，再按住Ctrl点击
+
+def test_stash_prep_that_cannot_stop_fails_trade(repo_cwd, use_platform, monkeypatch):
+    """取消后预备线程仍未退出时交易失败，不与预备线程同时操作游戏窗口"""
+    monkeypatch.setattr(core.auto_trade, 'STASH_PREP_GRACE', 0.2)
+    monkeypatch.setattr(core.auto_trade, 'STASH_PREP_CANCEL_TIMEOUT', 0.2)
+    auto_trade, history = make_auto_trade(party_timeout_ms=2000, pipelined_stash=True)
+    platform, _ = synthetic_trade_platform(log_sink=auto_trade.handle_game_log)
+    use_platform(platform)
+    calls, release, released = hang_prep_locate_grid(auto_trade, monkeypatch, None)
+
+    try:
+        auto_trade._process_trade({'user': 'Buyer', 'p1_num': '3', 'p2_num': '5'}, "")
+    finally:
+        release.set()
+        released.wait(5)
+    assert "仓库预备超时且未能停止" in history[-1]
+    assert len(calls) == 1
+    assert len(platform.events_of('click')) == 2  # 只有预备时双击仓库按钮
+    assert platform.events_of('command') == ["/invite Buyer", "/kick Buyer"]
+
+def test_trade_fails_when_buyer_never_joins(repo_cwd, use_platform):
+    """买家未进入时交易超时失败并踢出买家，不会打开仓库"""
+    auto_trade, history = make_auto_trade(party_timeout_ms=200)
+    platform = use_platform(SimulationPlatform(log_sink=auto_trade.handle_game_log))
+
+    auto_trade._process_trade({'user': 'Buyer', 'p1_num': '1', 'p2_num': '1'}, "")
+
+    assert "用户加入超时" in history[-1]
+    assert platform.events_of('command') == ["/invite Buyer", "/kick Buyer"]
+    assert not platform.events_of('grab')
+
+def test_scenario_file_round_trip(repo_cwd, use_platform, tmp_path):
+    """导出的场景文件加载后行为一致"""
+    platform, _ = synthetic_trade_platform(join_delay=1.0)
+    path = export_scenario(platform, str(tmp_path / "scenario"))
+
+    received = []
+    loaded = use_platform(SimulationPlatform.from_scenario(path, log_sink=received.append))
+    assert loaded.grab_window(1).shape == platform.screens['game'].shape
+    GameCommandModule().run(command_text="/invite Buyer")
+    assert received == [LOG_PREFIX + "Buyer 進入了此區域。"]
+
+def test_screen_change_probe_waits_for_stable_change(repo_cwd):
+    """画面区域变化并稳定后才确认，其他区域的变化不影响"""
+    platform, _ = synthetic_trade_platform()
+    capture = FrameCapture(PlatformFrameSource(platform, platform.window_title))
+    probe = ScreenChangeProbe(capture, STASH_REGION)
+    inventory = ScreenChangeProbe(capture, INVENTORY_REGION)
+    assert probe.arm() and inventory.arm()
+    assert len(platform.events_of('grab')) == 1  # 两个探针的基准共用一次截图
+    assert not probe()
+
+    platform.screen = 'stash'
+    assert not probe()  # 第一次看到变化，等待画面稳定
+    assert probe()
+    assert not inventory() and not inventory()
+
+    missing = FrameCapture(PlatformFrameSource(platform, "其他窗口"))
+    assert not ScreenChangeProbe(missing).arm()
+
+def test_inventory_probe_confirms_single_item(repo_cwd):
+    """只有一个背包格子变化时也能确认物品入包"""
+    platform, _ = synthetic_trade_platform()
+    platform.screen = 'stash'
+    capture = FrameCapture(PlatformFrameSource(platform, platform.window_title))
+    inventory = ScreenChangeProbe(capture, INVENTORY_REGION)
+    assert inventory.arm()
+    assert not inventory()
+
+    platform.screen = 'taken'
+    height, width = platform.screens['stash'].shape[:2]
+    quadrant = (slice(height // 2, None), slice(width // 2, None))
+    changed = np.abs(platform.screens['taken'][quadrant].astype(np.int16) - platform.screens['stash'][quadrant])
+    assert changed.mean() < inventory.threshold  # 整个区域的平均差异不足以确认
+    assert not inventory()
+    assert inventory()
+
+def test_visual_confirmation_replaces_fixed_waits(repo_cwd, use_platform):
+    """界面就绪后立即继续，节省的时间写入历史记录和统计"""
+    auto_trade, history = make_auto_trade(party_timeout_ms=2000, stash_interval_ms=1500,
+                                          trade_interval_ms=1500, visual_poll_ms=10)
+    platform, _ = synthetic_trade_platform(log_sink=auto_trade.handle_game_log)
+    use_platform(platform)
+
+    auto_trade._process_trade({'user': 'Buyer', 'p1_num': '3', 'p2_num': '5'}, "")
+
+    assert "交易完成" in history[-1] and "画面确认节省" in history[-1]
+    stats = auto_trade.get_wait_stats()
+    for stage in ("等待仓库打开", "等待物品入包", "等待仓库关闭"):
+        assert stats[stage]['confirmed'] == 1, stage
+    assert stats["等待仓库打开"]['saved_ms'] > 1000
+    assert stats["等待物品入包"]['saved_ms'] > 1000
+    assert auto_trade.get_latency_stats()["等待仓库打开"]['p50'] < 500
+    # 识别模块复用画面确认时的截图
+    capture = auto_trade.get_capture_stats()
+    assert capture['hits'] >= 3 and len(platform.events_of('grab')) == capture['captures']
+
+def test_input_macros_are_batched_and_timed(use_platform):
+    """宏中没有等待的输入合并为一批注入，每个动作记录注入耗时"""
+    timing = InputTiming.from_dict({'chat_open_ms': 10, 'paste_ms': 0, 'key_hold_ms': 0, 'unknown_ms': 5})
+    assert timing.chat_open == 0.01 and timing.paste == 0.0 and timing.modifier == 0.03
+
+    batches = chat_command_macro(timing).compile()
+    assert [len(events) for events, _ in batches] == [2, 6]
+    assert [delay for _, delay in batches] == [0.01, 0.0]
+
+    # 默认保持按下，按下和释放不在同一批次中
+    assert InputTiming().key_hold > 0 and InputTiming().click_hold > 0
+    batches = chat_command_macro(InputTiming()).compile()
+    assert [len(events) for events, _ in batches] == [1, 1, 2, 2, 1, 1]
+
+    platform = use_platform(SimulationPlatform(window_rect=(100, 50, 1380, 770)))
+    GameCommandModule().run(command_text="/invite Buyer")
+    assert platform.events_of('command') == ["/invite Buyer"]
+    assert platform.events_of('send_input') == [1, 1, 2, 2, 1, 1]
+
+    platform.run_macro(ctrl_click_macro((300, 200), platform.timing))
+    assert platform.events_of('send_input')[6:] == [2, 1, 1, 1]
+    assert platform.events_of('click') == [(200, 150)]
+    assert KEY_CTRL not in platform.keys_down
+
+    stats = platform.get_input_stats()
+    assert stats["聊天命令"]['count'] == 1 and stats["聊天命令"]['events'] == 8
+    assert stats["Ctrl点击"]['batches'] == 4 and stats["Ctrl点击"]['avg_ms'] >= 0
+
+def test_bgrx_buffer_converts_without_intermediate_copies():
+    """BGRX缓冲区包装为视图不复制数据，转换为BGR时丢弃X通道并支持行填充"""
+    width, height, stride = 3, 2, 16  # 每行末尾有4字节填充
+    buffer = bytearray(stride * height)
+    for y in range(height):
+        for x in range(width):
+            offset = y * stride + x * 4
+            buffer[offset:offset + 4] = bytes((x, y, 100 + x + y, 255))
+
+    view = bgrx_view(buffer, width, height, stride)
+    assert view.shape == (height, width, 4)
+    buffer[0] = 42  # 视图与缓冲区共享内存
+    assert view[0, 0, 0] == 42
+
+    bgr = bgrx_to_bgr(view)
+    assert bgr.shape == (height, width, 3) and bgr.flags.c_contiguous
+    assert tuple(bgr[1, 2]) == (2, 1, 103)
+    assert not np.shares_memory(bgr, view)
+
+    out = np.zeros((height, width, 3), dtype=np.uint8)
+    assert bgrx_to_bgr(view, out) is out and np.array_equal(out, bgr)
+
+    with pytest.raises(ValueError):
+        bgrx_view(buffer, width, height, stride=10)
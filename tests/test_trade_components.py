@@ -0,0 +1,452 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import re
+import threading
+import time
+
+import numpy as np
+
+from core.dedup_cache import DedupCache, make_trade_key
+from core.trade_state import TradeState, TradeStateMachine, FINAL_STATES
+from core.trade_queue import TradeQueue, price_value, PRIORITY_FIFO
+from core.stash_prep import StashPreparation
+from core.log_history import LogHistory
+from core.trade_matcher import TradeLogMatcher, TradeEvent
+from core.trade_trace import TradeTracer, percentile, TOTAL_STAGE
+from core.trade_ledger import TradeLedger
+from core.visual_wait import wait_until
+from core.frame_capture import FrameCapture, ArrayFrameSource
+
+class FakeClock:
+    """可手动推进的时钟"""
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_trade_key_normalization():
+    """相同请求的空白、大小写和价格写法差异不影响去重键"""
+    a = {'user': 'Buyer', 'item': 'Chaos  Orb', 'price': '1', 'currency': 'divine',
+         'tab': 'Sale', 'p1_num': '3', 'p2_num': '5'}
+    b = {'user': ' Buyer ', 'item': 'chaos orb', 'price': '1.0', 'currency': 'Divine',
+         'tab': 'sale', 'p1_num': '3', 'p2_num': '5'}
+    assert make_trade_key(a) == make_trade_key(b)
+    assert make_trade_key(a) != make_trade_key(dict(a, p2_num='6'))
+
+def test_dedup_cache_ttl_and_stats():
+    """有效期内重复消息命中，过期后重新放行"""
+    clock = FakeClock()
+    cache = DedupCache(ttl_seconds=60, max_entries=8, clock=clock)
+
+    assert not cache.seen('a')
+    clock.now += 30
+    assert cache.seen('a')
+    clock.now += 31
+    assert not cache.seen('a')
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['expirations'] == 1
+
+def test_dedup_cache_bounded_lru():
+    """超过上限时淘汰最久未使用的记录"""
+    clock = FakeClock()
+    cache = DedupCache(ttl_seconds=60, max_entries=2, clock=clock)
+
+    cache.seen('a')
+    cache.seen('b')
+    cache.seen('a')  # a变为最近使用
+    cache.seen('c')  # 淘汰b
+
+    assert cache.get_stats()['size'] == 2
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.seen('a')
+    assert not cache.seen('b')
+
+def test_dedup_cache_discard():
+    """移除后相同消息不再视为重复"""
+    cache = DedupCache(ttl_seconds=60)
+    cache.seen('a')
+    cache.discard('a')
+    assert not cache.seen('a')
+
+def test_state_machine_rejects_illegal_transitions():
+    """日志事件只能在对应阶段推进状态"""
+    sm = TradeStateMachine()
+    assert not sm.transition(TradeState.TRADE_CANCELLED)  # 空闲时的交易取消日志与当前交易无关
+    assert sm.transition(TradeState.INVITING)
+    assert not sm.transition(TradeState.TRADE_COMPLETED)
+    assert not sm.transition(TradeState.JOINED, expected=(TradeState.IDLE,))
+    assert sm.transition(TradeState.JOINED, expected=(TradeState.INVITING,))
+    assert not sm.transition(TradeState.JOINED)  # 重复的进入区域日志
+    assert sm.get() == TradeState.JOINED
+
+def test_state_machine_wakes_waiter_on_log_event():
+    """交易线程在日志解析推进状态时立即被唤醒"""
+    sm = TradeStateMachine()
+    for state in (TradeState.INVITING, TradeState.JOINED, TradeState.STASH_OPENED,
+                  TradeState.TRADE_REQUESTED):
+        assert sm.transition(state)
+
+    timer = threading.Timer(0.05, sm.transition, args=(TradeState.TRADE_COMPLETED,))
+    start = time.monotonic()
+    timer.start()
+    assert sm.wait_for(FINAL_STATES, 5) == TradeState.TRADE_COMPLETED
+    assert time.monotonic() - start < 1
+
+    assert sm.transition(TradeState.IDLE)
+    assert sm.wait_for((TradeState.JOINED,), 0.01) is None
+
+def test_state_machine_fail_interrupts_wait():
+    """禁用自动交易时中断任意阶段的等待"""
+    sm = TradeStateMachine()
+    assert not sm.fail("空闲时无需中断")
+    sm.transition(TradeState.INVITING)
+
+    threading.Timer(0.05, sm.fail, args=("自动交易已禁用",)).start()
+    assert sm.wait_for((), 5) == TradeState.TRADE_FAILED
+    assert sm.fail_reason == "自动交易已禁用"
+    assert not sm.fail("重复中断")
+
+    sm.reset()
+    assert sm.get() == TradeState.IDLE and sm.fail_reason is None
+
+def _request(user, price, currency='exalted'):
+    return {'user': user, 'price': str(price), 'currency': currency}
+
+def test_price_value_conversion():
+    """报价按配置的比例折算为基准通货"""
+    rates = {'exalted': 1.0, 'divine': 100.0}
+    assert price_value('2', 'Divine', rates) == 200.0
+    assert price_value('1,500', 'exalted', rates) == 1500.0
+    assert price_value('x', 'divine', rates) == 0.0
+    assert price_value('1', 'unknown', rates) == 0.0
+
+def test_trade_queue_priority_and_merge():
+    """高价请求优先，同一买家的请求合并并保留排队位置"""
+    clock = FakeClock()
+    q = TradeQueue(ttl_seconds=60, currency_rates={'divine': 100}, clock=clock)
+    assert q.push('A', 'm1', 't', _request('A', 50)) == 'added'
+    clock.now += 1
+    assert q.push('B', 'm2', 't', _request('B', 1, 'divine')) == 'added'
+    clock.now += 1
+    assert q.push('C', 'm3', 't', _request('C', 50)) == 'added'
+    clock.now += 1
+    assert q.push('A', 'm1b', 't', _request('A', 60)) == 'merged'
+
+    order = [q.pop(timeout=0) for _ in range(3)]
+    assert [e.buyer for e in order] == ['B', 'A', 'C']
+    assert order[1].message == 'm1b' and order[1].merged == 1
+    assert q.pop(timeout=0) is None
+
+    stats = q.get_stats()
+    assert stats['depth'] == 0 and stats['dequeued'] == 3 and stats['merged'] == 1
+    assert stats['max_wait_ms'] == 3000  # C到达后等待了1秒，A从首次到达算起等待3秒
+
+def test_trade_queue_fifo_ttl_and_capacity():
+    """先到先得模式、过期清理和满队列淘汰"""
+    clock = FakeClock()
+    q = TradeQueue(ttl_seconds=10, max_size=2, priority=PRIORITY_FIFO, clock=clock)
+    q.push('A', 'm', 't', _request('A', 100))
+    clock.now += 1
+    q.push('B', 'm', 't', _request('B', 1))
+    assert q.push('C', 'm', 't', _request('C', 999)) == 'dropped'  # 先到先得时新请求优先级最低
+
+    clock.now += 9.5
+    assert [q.pop(timeout=0).buyer] == ['B']  # A已过期
+    stats = q.get_stats()
+    assert stats['expired'] == 1 and stats['dropped'] == 1
+
+    # 过期后重新发送的请求不受旧堆条目影响
+    q.push('A', 'm', 't', _request('A', 1))
+    assert q.pop(timeout=0).buyer == 'A'
+
+def test_trade_queue_reports_evicted_and_expired_requests():
+    """被淘汰或过期的请求通过回调通知，正常取出的请求不通知"""
+    clock = FakeClock()
+    discarded = []
+    q = TradeQueue(ttl_seconds=10, max_size=2, clock=clock, on_discard=lambda e: discarded.append(e.buyer))
+    q.push('A', 'm', 't', _request('A', 1))
+    q.push('B', 'm', 't', _request('B', 5))
+    assert q.push('C', 'm', 't', _request('C', 10)) == 'added'  # 淘汰最低价的A
+    assert discarded == ['A']
+
+    assert q.pop(timeout=0).buyer == 'C'
+    clock.now += 11
+    assert q.pop(timeout=0) is None  # B已过期
+    assert discarded == ['A', 'B']
+
+    q.push('D', 'm', 't', _request('D', 1))
+    q.push('E', 'm', 't', _request('E', 2))
+    q.clear()
+    assert sorted(discarded[2:]) == ['D', 'E']
+
+def test_trade_queue_pop_wakes_on_push_and_close():
+    """交易线程在新请求入队时立即被唤醒，关闭队列时退出等待"""
+    q = TradeQueue()
+    threading.Timer(0.05, q.push, args=('A', 'm', 't', _request('A', 1))).start()
+    start = time.monotonic()
+    assert q.pop(timeout=5).buyer == 'A'
+    assert time.monotonic() - start < 1
+
+    threading.Timer(0.05, q.close).start()
+    assert q.pop(timeout=5) is None
+
+class FakeStep:
+    """记录调用的流程模块替身"""
+    def __init__(self, result=True, delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    def run(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        return self.result
+
+    def locate_grid(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {'cols': 12} if self.result else None
+
+def test_stash_preparation_completes_in_background():
+    """预备在后台完成打开仓库、选择标签页和定位网格"""
+    open_stash, tab_select, take_out = FakeStep(), FakeStep(), FakeStep(delay=0.05)
+    prep = StashPreparation(open_stash, tab_select, take_out, tab='Sale',
+                            stash_interval=0.01, tab_interval=0.01).start()
+    assert prep.wait(timeout=5)
+    assert prep.ready and prep.grid == {'cols': 12}
+    assert prep.elapsed >= 0.05
+    assert (open_stash.calls, tab_select.calls, take_out.calls) == (1, 1, 1)
+
+def test_stash_preparation_cancel_stops_remaining_steps():
+    """买家未进入时取消预备，不再执行后续步骤"""
+    open_stash, tab_select, take_out = FakeStep(), FakeStep(), FakeStep()
+    prep = StashPreparation(open_stash, tab_select, take_out, tab='Sale',
+                            stash_interval=5).start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    assert prep.cancel(timeout=5)
+    assert time.monotonic() - start < 1
+    assert prep.stash_opened and not prep.ready
+    assert tab_select.calls == 0 and take_out.calls == 0
+
+def test_stash_preparation_reports_partial_failure():
+    """定位失败时保留已完成的步骤，供交易线程继续串行执行"""
+    prep = StashPreparation(FakeStep(), FakeStep(), FakeStep(result=False),
+                            stash_interval=0).start()
+    prep.wait(timeout=5)
+    assert prep.stash_opened and prep.grid is None
+    assert prep.error == "定位仓库网格失败" and not prep.ready
+
+def test_log_history_ring_buffer_wraps_and_expires():
+    """写满后覆盖最旧日志，过期日志在追加时淘汰"""
+    clock = FakeClock(0.0)
+    history = LogHistory(capacity=4, max_age=10, clock=clock)
+    for i in range(6):
+        clock.now = float(i)
+        history.append(f"line {i}")
+    assert len(history) == 4
+    assert [m for _, m in history.since(0)] == ['line 2', 'line 3', 'line 4', 'line 5']
+
+    clock.now = 13.5
+    history.append("line late")
+    assert [m for _, m in history.since(0)] == ['line 4', 'line 5', 'line late']
+
+def test_log_history_time_queries():
+    """二分查找起始时间，支持子串、正则和函数匹配"""
+    clock = FakeClock(100.0)
+    history = LogHistory(capacity=8, max_age=None, clock=clock)
+    for i, line in enumerate(["A 進入了此區域。", "noise", "B 進入了此區域。", "A 已接受交易。"]):
+        clock.now = 100.0 + i
+        history.append(line)
+
+    assert [t for t, _ in history.since(101.5)] == [102.0, 103.0]
+    assert len(history.since(100, "進入了此區域")) == 2
+    assert history.since(101, re.compile(r"^A ")) == [(103.0, "A 已接受交易。")]
+    assert history.latest_since(100, lambda m: m.startswith("A")) == (103.0, "A 已接受交易。")
+    assert history.latest_since(103.5) is None
+
+    # 外部传入的时间戳回退时保持索引单调
+    assert history.append("late", timestamp=50.0) == 103.0
+
+LOG_PREFIX = "2025/03/01 12:00:00 123456 abc [INFO Client 1234] : "
+
+def test_trade_matcher_classifies_events():
+    """一次分类识别进入、接受、完成和取消"""
+    matcher = TradeLogMatcher("Buyer")
+    assert matcher.classify(LOG_PREFIX + "Buyer 進入了此區域。") == TradeEvent.JOINED
+    assert matcher.classify(LOG_PREFIX + "Buyer 已接受交易。\r") == TradeEvent.ACCEPTED
+    assert matcher.classify(LOG_PREFIX + "與 Buyer 的交易完成。") == TradeEvent.COMPLETED
+    assert matcher.classify(LOG_PREFIX + "交易取消。") == TradeEvent.CANCELLED
+    assert matcher.classify(LOG_PREFIX + "Other 進入了此區域。") is None
+    assert matcher.classify(LOG_PREFIX + "XBuyer 進入了此區域。") is None
+    assert matcher.classify(LOG_PREFIX + "與 Other 的交易完成。") is None
+    assert matcher.classify(LOG_PREFIX + "Buyer 進入了此區域。 後面還有內容") is None
+
+def test_trade_matcher_handles_regex_metacharacters():
+    """名称中的正则特殊字符按字面匹配"""
+    name = "D.o(t)+[x]"
+    matcher = TradeLogMatcher(name)
+    line = LOG_PREFIX + f"{name} 進入了此區域。"
+    assert matcher.classify(line) == TradeEvent.JOINED
+    assert matcher.classify(LOG_PREFIX + "DXo(t)+[x] 進入了此區域。") is None
+    assert matcher.classify(LOG_PREFIX + f"與 {name} 的交易完成。") == TradeEvent.COMPLETED
+
+    # 临时触发器使用的正则与分派结果一致
+    assert re.search(matcher.join_regex.pattern, line)
+    assert not re.search(matcher.join_regex.pattern, LOG_PREFIX + f"X{name} 進入了此區域。")
+
+def test_percentile_nearest_rank():
+    values = sorted(float(v) for v in range(1, 101))
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 90) == 90.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([7.0], 99) == 7.0
+    assert percentile([], 50) == 0.0
+
+def test_tracer_records_state_and_module_spans(tmp_path):
+    """状态停留时间和模块调用耗时按阶段记录并写入磁盘"""
+    clock = FakeClock(0.0)
+    trace_file = tmp_path / "traces.jsonl"
+    tracer = TradeTracer(window=10, file_path=str(trace_file), clock=clock)
+    sm = TradeStateMachine(on_change=tracer.on_state_change)
+
+    tracer.begin_trade("Buyer")
+    sm.transition(TradeState.INVITING)
+    clock.now = 2.5
+    sm.transition(TradeState.JOINED)
+    with tracer.span("打开仓库"):
+        clock.now = 3.0
+    sm.transition(TradeState.STASH_OPENED)
+    sm.transition(TradeState.TRADE_REQUESTED)
+    clock.now = 4.0
+    sm.transition(TradeState.TRADE_COMPLETED)
+    trace = tracer.end_trade("completed")
+    sm.reset()
+
+    stats = tracer.get_percentiles()
+    assert stats[TradeState.INVITING.value]['p50'] == 2500.0
+    assert stats["打开仓库"]['p50'] == 500.0
+    assert stats[TradeState.TRADE_REQUESTED.value]['p50'] == 1000.0
+    assert stats[TOTAL_STAGE]['p99'] == 4000.0
+    assert TradeState.TRADE_COMPLETED.value not in stats
+
+    saved = json.loads(trace_file.read_text(encoding='utf-8'))
+    assert saved['outcome'] == 'completed' and saved['user'] == 'Buyer'
+    assert saved['spans'] == trace['spans']
+
+    # 默认只保存在内存中
+    assert TradeTracer().file_path is None
+
+def test_ledger_batches_requests_and_aggregates(tmp_path):
+    """交易请求批量写入后按通货汇总，重置只移动统计起点"""
+    ledger = TradeLedger(str(tmp_path / "ledger.db"), flush_interval=0.05)
+    parsed = {'user': 'Buyer', 'item': 'Mirror', 'price': '5', 'currency': 'divine', 'tab': 'A'}
+    ledger.record_request(parsed, ts=100.0)
+    ledger.record_request(dict(parsed, price='2.5'), ts=101.0)
+    ledger.record_request(dict(parsed, price='30', currency='chaos'), ts=102.0)
+    ledger.record_request(dict(parsed, price='abc'), ts=103.0)
+    assert ledger.flush()
+
+    assert ledger.request_count() == 4
+    assert ledger.currency_totals() == {'divine': 7.5, 'chaos': 30.0}
+    assert ledger.currency_totals(since=101.5) == {'chaos': 30.0}
+
+    ledger.reset_stats()
+    assert ledger.flush()
+    assert ledger.request_count() == 0
+    assert ledger.currency_totals() == {}
+    assert ledger.request_count(since=0) == 4
+    ledger.close()
+
+def test_ledger_imports_legacy_stats_once(tmp_path):
+    """config.json中的旧统计导入为基线并计入汇总，只导入一次，重置统计后不再计入"""
+    db_path = str(tmp_path / "ledger.db")
+    ledger = TradeLedger(db_path, flush_interval=0.05)
+    assert not ledger.import_legacy_stats({}, 0)
+    assert ledger.import_legacy_stats({'divine': 3, 'chaos': '0', 'exalted': 'x'}, 5, ts=50.0)
+    ledger.record_request({'user': 'Buyer', 'price': '2', 'currency': 'divine'}, ts=100.0)
+    assert ledger.flush()
+    assert ledger.currency_totals() == {'divine': 5.0}
+    assert ledger.request_count() == 6
+    assert ledger.currency_totals(since=60.0) == {'divine': 2.0}
+    ledger.close()
+
+    reopened = TradeLedger(db_path)
+    assert not reopened.import_legacy_stats({'divine': 3}, 5)
+    assert reopened.currency_totals() == {'divine': 5.0}
+    reopened.reset_stats()
+    assert reopened.flush()
+    assert reopened.currency_totals() == {} and reopened.request_count() == 0
+    reopened.close()
+
+def test_ledger_records_trades_with_spans(tmp_path):
+    """交易结果和分阶段耗时可按时间查询，关闭时提交剩余写入"""
+    db_path = str(tmp_path / "ledger.db")
+    ledger = TradeLedger(db_path, flush_interval=10)
+    parsed = {'user': 'Buyer', 'item': 'Mirror', 'price': '5', 'currency': 'divine'}
+    spans = [{'stage': '邀请组队', 'kind': 'module', 'offset_ms': 0.0, 'duration_ms': 120.0},
+             {'stage': TOTAL_STAGE, 'kind': 'trade', 'offset_ms': 0.0, 'duration_ms': 4000.0}]
+    ledger.record_trade('t1', parsed, 'completed', started_at=10.0, ended_at=14.0, spans=spans)
+    ledger.record_trade('t2', dict(parsed, user='Other'), 'failed', started_at=20.0, ended_at=21.0,
+                        reason='买家未进入')
+    ledger.close()
+
+    reopened = TradeLedger(db_path)
+    trades = reopened.recent_trades(10)
+    assert [t['uid'] for t in trades] == ['t2', 't1']
+    assert trades[0]['reason'] == '买家未进入'
+    assert trades[1]['duration_ms'] == 4000.0 and trades[1]['price'] == 5.0
+    assert reopened.outcome_counts() == {'completed': 1, 'failed': 1}
+    assert [s['stage'] for s in reopened.trade_spans('t1')] == ['邀请组队', TOTAL_STAGE]
+    reopened.close()
+
+def test_wait_until_returns_on_condition_timeout_and_abort():
+    """条件成立立即返回并计算节省时间，超时按预算返回，中断时停止轮询"""
+    clock = FakeClock(0.0)
+    def sleep(seconds):
+        clock.now += seconds
+
+    ready_at = [0.3]
+    result = wait_until(lambda: clock.now >= ready_at[0], 1.0, interval=0.1, clock=clock, sleep=sleep)
+    assert result.confirmed and result.polls == 4
+    assert abs(result.elapsed - 0.3) < 1e-9 and abs(result.saved - 0.7) < 1e-9
+
+    clock.now = 0.0
+    result = wait_until(lambda: False, 0.25, interval=0.1, clock=clock, sleep=sleep)
+    assert not result.confirmed and not result.aborted
+    assert abs(result.elapsed - 0.25) < 1e-9 and result.saved == 0.0
+
+    clock.now = 0.0
+    result = wait_until(lambda: False, 1.0, interval=0.1, should_abort=lambda: clock.now >= 0.2,
+                        clock=clock, sleep=sleep)
+    assert result.aborted and result.elapsed < 0.3
+
+def test_frame_capture_serves_cached_frames_within_bounds():
+    """时效内且没有新输入时复用截图，超时、有输入或要求最新画面时重新截图"""
+    clock = FakeClock(0.0)
+    frames = [np.full((40, 60, 3), value, dtype=np.uint8) for value in (10, 200)]
+    source = ArrayFrameSource(frames, window_rect=(100, 50, 160, 90))
+    capture = FrameCapture(source, clock=clock)
+
+    first = capture.get_frame()
+    assert first.rect == (100, 50, 160, 90) and first.image.shape == (40, 60, 3)
+    assert not first.image.flags.writeable
+    assert capture.get_frame(max_age=0.5) is first
+    assert capture.get_frame(max_age=0) is not first
+
+    clock.now = 1.0
+    assert capture.get_frame(max_age=0.5).time == 1.0
+    source.advance()  # 输入之后缓存失效
+    assert capture.get_frame(max_age=10).image[0, 0, 0] == 200
+
+    stats = capture.get_stats()
+    assert stats['requests'] == 5 and stats['captures'] == 4 and stats['hits'] == 1
+    assert stats['hit_rate'] == 0.2
+    assert FrameCapture(ArrayFrameSource([])).get_frame() is None
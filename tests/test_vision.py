@@ -0,0 +1,225 @@
+import sys
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import cv2
+import numpy as np
+import pytest
+
+from core.process_modules.take_out_item import select_anchor_corners
+from core.vision.pyramid import pyramid_match, exhaustive_match
+from core.vision.peaks import extract_peaks, non_max_suppression, match_pos, match_size
+from core.vision.scale_memory import ScaleMemory
+from core.vision.grid_cache import GridCache
+from core.vision.parallel_match import MultiScaleMatcher
+from core.vision.template_bank import TemplateBank
+from core.vision.roi_memory import RoiMemory
+from core.vision.occupancy import occupancy_map
+from tools.sim_scenario import synthetic_trade_platform, WISDOM_TEMPLATE_PATH
+
+WISDOM_SCALES = np.linspace(0.2, 2.5, 35)
+
+@pytest.fixture
+def repo_cwd(monkeypatch):
+    """识别模板使用相对路径，测试在仓库根目录下运行"""
+    monkeypatch.chdir(ROOT)
+
+@pytest.fixture
+def wisdom_gray(repo_cwd):
+    return cv2.cvtColor(cv2.imread(WISDOM_TEMPLATE_PATH), cv2.COLOR_BGR2GRAY)
+
+def stash_left_gray(**layout):
+    """合成仓库截图左半部分的灰度图"""
+    platform, _ = synthetic_trade_platform(**layout)
+    stash = platform.screens['stash']
+    return cv2.cvtColor(stash[:, :stash.shape[1] // 2], cv2.COLOR_BGR2GRAY)
+
+def test_pyramid_match_finds_same_anchors_as_full_sweep(wisdom_gray):
+    """金字塔匹配选出的网格锚点与逐尺度全图匹配一致"""
+    gray = stash_left_gray(window_rect=(0, 0, 1920, 1080), wisdom_scale=WISDOM_SCALES[5], grid_origin=(60, 90))
+    height, width = gray.shape
+
+    full = select_anchor_corners(exhaustive_match(gray, wisdom_gray, WISDOM_SCALES, 0.65), width, height)
+    pyramid = select_anchor_corners(pyramid_match(gray, wisdom_gray, WISDOM_SCALES, 0.65), width, height)
+    assert full is not None and pyramid is not None
+    for expected, found in zip(full, pyramid):
+        assert match_pos(found) == match_pos(expected) and found['scale'] == expected['scale']
+
+    blank = np.zeros_like(gray)
+    assert len(pyramid_match(blank, wisdom_gray, WISDOM_SCALES, 0.65)) == 0
+
+def test_scale_memory_tries_remembered_scale_then_falls_back(tmp_path):
+    """记住的尺度附近命中时不再全扫描，置信度不足时退回全扫描，记忆可持久化"""
+    scales = np.linspace(0.5, 2.0, 16)
+    true_index = [5]
+    swept = []
+    def sweep(indices):
+        swept.append(list(indices))
+        score = 0.9 if true_index[0] in indices else 0.2
+        return score, scales[true_index[0]] if score > 0.5 else None
+
+    state_file = str(tmp_path / "scale_memory.json")
+    memory = ScaleMemory(state_file)
+    confident = lambda score: score >= 0.7
+
+    assert memory.search("stash", (1920, 1080), scales, sweep, confident) == 0.9
+    assert memory.search("stash", (1920, 1080), scales, sweep, confident) == 0.9
+    assert swept == [list(range(16)), [4, 5, 6]]
+
+    # 界面缩放变化后记住的尺度失效，退回全扫描并更新记忆
+    true_index[0] = 12
+    assert memory.search("stash", (1920, 1080), scales, sweep, confident) == 0.9
+    assert swept[2:] == [[4, 5, 6], list(range(16))]
+    assert memory.lookup("stash", (1920, 1080)) == pytest.approx(scales[12])
+    assert memory.lookup("stash", (2560, 1440)) is None
+
+    stats = memory.get_stats()["stash"]
+    assert stats["lookups"] == 2 and stats["hits"] == 1 and stats["sweeps"] == 2
+
+    reloaded = ScaleMemory(state_file)
+    assert reloaded.lookup("stash", (1920, 1080)) == pytest.approx(scales[12])
+
+def test_grid_cache_validates_cached_anchors(wisdom_gray):
+    """面板未移动时用缓存锚点命中，锚点位置变化或窗口尺寸不同时未命中"""
+    rect = (0, 0, 1920, 1080)
+    gray = stash_left_gray(window_rect=rect, wisdom_scale=WISDOM_SCALES[5], grid_origin=(60, 90))
+    height, width = gray.shape
+    top_left, bottom_right = select_anchor_corners(
+        exhaustive_match(gray, wisdom_gray, WISDOM_SCALES, 0.65), width, height)
+
+    cache = GridCache()
+    assert cache.validate(gray, wisdom_gray, rect) is None
+    cache.store(rect, {
+        'stash_type': 'normal',
+        'anchors': [match_pos(top_left), match_pos(bottom_right)],
+        'anchor_sizes': [match_size(top_left), match_size(bottom_right)],
+        'cols': 12, 'rows': 12
+    })
+
+    # 窗口移动不影响缓存
+    geometry = cache.validate(gray, wisdom_gray, (100, 50, 2020, 1130))
+    assert geometry is not None and geometry['anchors'][0] == (60, 90)
+    assert cache.validate(gray, wisdom_gray, (0, 0, 2560, 1440)) is None
+
+    moved = stash_left_gray(window_rect=rect, wisdom_scale=WISDOM_SCALES[5], grid_origin=(160, 190))
+    assert cache.validate(moved, wisdom_gray, rect) is None
+
+    stats = cache.get_stats()
+    assert stats['lookups'] == 4 and stats['hits'] == 1 and stats['stores'] == 1
+
+def test_peaks_extracts_structured_candidates_and_suppresses_neighbours():
+    """候选提取为结构化数组，非极大值抑制后每个目标只保留得分最高的位置和尺度"""
+    result = np.zeros((100, 200), np.float32)
+    result[20:25, 30:35] = 0.7
+    result[22, 32] = 0.9
+    result[60, 150] = 0.8
+
+    all_hits = extract_peaks(result, 0.65, scale=1.0, size=(10, 10), offset=(5, 7))
+    assert len(all_hits) == 26
+    assert (int(all_hits[0]['x']), int(all_hits[0]['y'])) == (37, 29)
+    assert all_hits['score'][0] == pytest.approx(0.9)
+
+    peaks = extract_peaks(result, 0.65, size=(10, 10), radius=5)
+    assert [match_pos(peak) for peak in peaks] == [(32, 22), (150, 60)]
+
+    other_scale = extract_peaks(result * 0.9, 0.65, scale=1.2, size=(12, 12), radius=5)
+    merged = non_max_suppression(np.concatenate([other_scale, peaks]))
+    assert [(match_pos(m), float(m['scale'])) for m in merged] == [((32, 22), 1.0), ((150, 60), 1.0)]
+    assert len(non_max_suppression(extract_peaks(result, 0.95))) == 0
+
+def test_parallel_matcher_agrees_with_serial_loop(wisdom_gray):
+    """线程池匹配与串行循环结果一致，出现确定匹配时可提前结束"""
+    gray = stash_left_gray(window_rect=(0, 0, 1280, 720), wisdom_scale=WISDOM_SCALES[3], grid_origin=(40, 60))
+    scales = WISDOM_SCALES[:10]
+    serial, parallel = MultiScaleMatcher(1), MultiScaleMatcher(4)
+    try:
+        expected = serial.best_match(gray, wisdom_gray, scales)
+        assert parallel.best_match(gray, wisdom_gray, scales) == expected
+        assert expected[1] == (40, 60) and expected[2] == scales[3]
+
+        score, pos, _, _ = parallel.best_match(gray, wisdom_gray, scales, certain=0.9)
+        assert score >= 0.9 and pos == (40, 60)
+
+        full = exhaustive_match(gray, wisdom_gray, scales, 0.65)
+        assert np.array_equal(exhaustive_match(gray, wisdom_gray, scales, 0.65, matcher=parallel), full)
+        assert np.array_equal(pyramid_match(gray, wisdom_gray, scales, 0.65, matcher=parallel),
+                              pyramid_match(gray, wisdom_gray, scales, 0.65))
+    finally:
+        parallel.shutdown()
+
+def test_template_bank_memory_maps_scaled_templates(tmp_path):
+    """模板库保存用过的缩放尺寸，重新加载时内存映射且不再缩放，模板内容变化后旧缓存失效"""
+    template_path = str(tmp_path / "anchor.png")
+    image = np.zeros((30, 40, 3), np.uint8)
+    cv2.rectangle(image, (5, 5), (30, 20), (200, 120, 40), -1)
+    cv2.imwrite(template_path, image)
+    bank_dir = str(tmp_path / "bank")
+
+    bank = TemplateBank(bank_dir)
+    template = bank.get(template_path)
+    assert bank.get(template_path) is template and template.shape == (30, 40)
+    resized = template.resize((20, 15))
+    assert np.array_equal(resized, cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), (20, 15)))
+    assert template.resize((20, 15)) is resized
+    template.resize((10, 8), cv2.INTER_AREA)
+    bank.save()
+    assert len(os.listdir(bank_dir)) == 1
+
+    reloaded = TemplateBank(bank_dir).get(template_path)
+    assert isinstance(reloaded.gray, np.memmap) and not reloaded.dirty
+    assert np.array_equal(reloaded.resize((20, 15)), resized) and not reloaded.dirty
+
+    cv2.rectangle(image, (0, 0), (10, 10), (255, 255, 255), -1)
+    cv2.imwrite(template_path, image)
+    changed_bank = TemplateBank(bank_dir)
+    changed = changed_bank.get(template_path)
+    assert not np.array_equal(changed.gray, reloaded.gray) and changed.dirty
+    changed_bank.save()
+    assert len(os.listdir(bank_dir)) == 1
+
+def test_roi_memory_searches_remembered_region_first(tmp_path):
+    """先在记录位置外扩的区域内搜索，目标移出区域时退回整张截图，统计命中率和节省面积"""
+    target = [(900, 300, 100, 40)]
+    searched = []
+    def search(roi):
+        searched.append(roi)
+        x, y, w, h = target[0]
+        inside = roi[0] <= x and roi[1] <= y and x + w <= roi[2] and y + h <= roi[3]
+        return (inside, target[0] if inside else None)
+
+    state_file = str(tmp_path / "roi_memory.json")
+    memory = RoiMemory(state_file, pad_ratio=0.5, min_pad=16)
+    assert memory.search("stash", (1920, 1080), search) is True
+    assert memory.search("stash", (1920, 1080), search) is True
+    assert searched == [(0, 0, 1920, 1080), (850, 280, 1050, 360)]
+    assert memory.region("stash", (1920, 1080), span_x=True) == (0, 280, 1920, 360)
+    assert memory.region("stash", (1280, 720)) is None
+
+    target[0] = (200, 700, 100, 40)
+    assert memory.search("stash", (1920, 1080), search) is True
+    assert searched[2:] == [(850, 280, 1050, 360), (0, 0, 1920, 1080)]
+    assert memory.region("stash", (1920, 1080)) == (150, 280, 1050, 760)
+
+    stats = memory.get_stats()["stash"]
+    assert stats["lookups"] == 3 and stats["hits"] == 1
+    assert stats["saved_px"] == 1920 * 1080 - 2 * 200 * 80
+
+    assert RoiMemory(state_file).region("stash", (1920, 1080)) == (150, 280, 1050, 760)
+
+def test_occupancy_map_marks_item_cells(repo_cwd):
+    """占用图只把放有锚点和物品的格子标记为有物品，大仓库的576格同样适用"""
+    for grid_size, items in ((12, [(3, 5), (12, 1)]), (24, [(7, 20)])):
+        platform, layout = synthetic_trade_platform(window_rect=(0, 0, 1920, 1080), grid_size=grid_size,
+                                                    wisdom_scale=0.2 if grid_size == 24 else 0.4, items=items)
+        gray = cv2.cvtColor(platform.screens['stash'], cv2.COLOR_BGR2GRAY)
+        cell = layout['cell']
+        occupied = occupancy_map(gray, {'start': layout['grid_origin'], 'cell': (cell, cell),
+                                        'cols': grid_size, 'rows': grid_size})
+
+        expected = np.zeros((grid_size, grid_size), dtype=bool)
+        expected[0, 0] = expected[-1, -1] = True
+        for col, row in items:
+            expected[row - 1, col - 1] = True
+        assert occupied.shape == expected.shape
+        assert np.array_equal(occupied, expected)
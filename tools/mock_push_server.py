@@ -0,0 +1,309 @@
+"""本地模拟推送服务器
+
+模拟 WxPusher、Server酱、Qmsg酱 的HTTP接口以及一个SMTP收件服务，
+支持配置延迟和错误注入，用于在不访问真实推送平台的情况下对推送模块进行压测。
+
+用法:
+    python tools/mock_push_server.py --http-port 18080 --smtp-port 18025 --latency-ms 50 --error-rate 0.05
+
+推送配置中把各渠道的 api_url 指向本服务器即可，例如:
+    wxpusher.api_url   = http://127.0.0.1:18080/api/send/message
+    serverchan.api_url = http://127.0.0.1:18080/serverchan/
+    qmsgchan.api_url   = http://127.0.0.1:18080/send/
+    email.smtp_server = 127.0.0.1, email.smtp_port = 18025, email.smtp_ssl = false
+"""
+import argparse
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class FaultInjector:
+    """延迟与错误注入配置"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, http_error_rate=0.0, seed=None):
+        """
+        :param latency_ms: 每个请求的基础延迟（毫秒）
+        :param jitter_ms: 延迟抖动范围（毫秒）
+        :param error_rate: 返回平台业务错误的概率
+        :param http_error_rate: 返回HTTP 500的概率
+        :param seed: 随机种子，便于复现
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self):
+        """按配置休眠"""
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        delay_ms = max(0.0, self.latency_ms + jitter)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+    def roll(self):
+        """决定本次请求的结果: 'ok'、'error' 或 'http_error'"""
+        with self.lock:
+            value = self.random.random()
+        if value < self.http_error_rate:
+            return 'http_error'
+        if value < self.http_error_rate + self.error_rate:
+            return 'error'
+        return 'ok'
+
+
+class MockStats:
+    """按渠道统计收到的请求"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.channels = {}
+
+    def record(self, channel, outcome):
+        with self.lock:
+            stats = self.channels.setdefault(channel, {'requests': 0, 'ok': 0, 'error': 0, 'http_error': 0})
+            stats['requests'] += 1
+            stats[outcome] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {channel: dict(stats) for channel, stats in self.channels.items()}
+
+    def total_requests(self):
+        with self.lock:
+            return sum(stats['requests'] for stats in self.channels.values())
+
+
+class _PushRequestHandler(BaseHTTPRequestHandler):
+    """模拟各推送平台的HTTP接口"""
+
+    server_version = "MockPush/1.0"
+
+    def log_message(self, format, *args):
+        # 压测时不输出访问日志
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/__stats':
+            self._reply(200, self.server.stats.snapshot())
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.path == '/__reset':
+            self.server.stats.reset()
+            self._reply(200, {'ok': True})
+            return
+
+        if self.path.startswith('/api/send/message'):
+            channel = 'wxpusher'
+        elif self.path.startswith('/serverchan/') and self.path.endswith('.send'):
+            channel = 'serverchan'
+        elif self.path.startswith('/send/'):
+            channel = 'qmsgchan'
+        else:
+            self._reply(404, {'error': 'unknown endpoint'})
+            return
+
+        injector = self.server.injector
+        injector.delay()
+        outcome = injector.roll()
+        self.server.stats.record(channel, outcome)
+
+        if outcome == 'http_error':
+            self._reply(500, {'error': 'injected server error'})
+            return
+
+        ok = outcome == 'ok'
+        if channel == 'wxpusher':
+            try:
+                json.loads(body or b'{}')
+            except ValueError:
+                ok = False
+            self._reply(200, {'code': 1000 if ok else 1001, 'msg': '处理成功' if ok else '模拟错误', 'success': ok})
+        elif channel == 'serverchan':
+            parse_qs(body.decode('utf-8', errors='replace'))
+            self._reply(200, {'code': 0 if ok else 40001, 'message': '' if ok else '模拟错误'})
+        else:
+            parse_qs(body.decode('utf-8', errors='replace'))
+            self._reply(200, {'success': ok, 'reason': '操作成功' if ok else '模拟错误', 'code': 0 if ok else 500})
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    """模拟推送HTTP服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, address, injector, stats):
+        self.injector = injector
+        self.stats = stats
+        super().__init__(address, _PushRequestHandler)
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """最小化的SMTP收件实现，接受所有邮件并丢弃"""
+
+    def _send(self, line):
+        self.wfile.write((line + '\r\n').encode('utf-8'))
+
+    def handle(self):
+        injector = self.server.injector
+        self._send('220 mock-push SMTP sink ready')
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode('utf-8', errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self._send('250-mock-push')
+                self._send('250 AUTH PLAIN LOGIN')
+            elif verb == 'AUTH':
+                parts = command.split()
+                if len(parts) >= 2 and parts[1].upper() == 'LOGIN' and len(parts) == 2:
+                    self._send('334 VXNlcm5hbWU6')
+                    self.rfile.readline()
+                    self._send('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                elif len(parts) == 2:
+                    self._send('334 ')
+                    self.rfile.readline()
+                self._send('235 Authentication successful')
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._send('250 OK')
+            elif verb == 'DATA':
+                self._send('354 End data with <CR><LF>.<CR><LF>')
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b'.\r\n', b'.\n'):
+                        break
+                injector.delay()
+                outcome = injector.roll()
+                self.server.stats.record('email', outcome)
+                if outcome == 'ok':
+                    self._send('250 OK: queued')
+                else:
+                    self._send('451 Injected temporary failure')
+            elif verb == 'QUIT':
+                self._send('221 Bye')
+                return
+            else:
+                self._send('502 Command not implemented')
+
+
+class MockSMTPServer(socketserver.ThreadingTCPServer):
+    """模拟SMTP收件服务器"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, injector, stats):
+        self.injector = injector
+        self.stats = stats
+        super().__init__(address, _SMTPSinkHandler)
+
+
+class MockPushServer:
+    """同时运行HTTP和SMTP模拟服务的组合服务器"""
+
+    def __init__(self, host='127.0.0.1', http_port=0, smtp_port=0, injector=None):
+        """
+        :param host: 监听地址
+        :param http_port: HTTP端口，0表示自动分配
+        :param smtp_port: SMTP端口，0表示自动分配
+        :param injector: FaultInjector实例
+        """
+        self.injector = injector or FaultInjector()
+        self.stats = MockStats()
+        self.http_server = MockHTTPServer((host, http_port), self.injector, self.stats)
+        self.smtp_server = MockSMTPServer((host, smtp_port), self.injector, self.stats)
+        self.threads = []
+
+    @property
+    def http_base(self):
+        host, port = self.http_server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def smtp_address(self):
+        return self.smtp_server.server_address[:2]
+
+    def push_config(self):
+        """生成指向本服务器的推送配置"""
+        smtp_host, smtp_port = self.smtp_address
+        return {
+            'wxpusher': {'enabled': True, 'app_token': 'AT_mock', 'uid': 'UID_mock',
+                         'api_url': f"{self.http_base}/api/send/message"},
+            'serverchan': {'enabled': True, 'send_key': 'SCTmock',
+                           'api_url': f"{self.http_base}/serverchan/"},
+            'qmsgchan': {'enabled': True, 'key': 'mock', 'qq': '10000',
+                         'api_url': f"{self.http_base}/send/"},
+            'email': {'enabled': True, 'smtp_server': smtp_host, 'smtp_port': str(smtp_port),
+                      'sender_email': 'bot@mock.local', 'email_password': 'mock',
+                      'receiver_email': 'me@mock.local', 'smtp_ssl': False}
+        }
+
+    def start(self):
+        """在后台线程中启动服务"""
+        for server in (self.http_server, self.smtp_server):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        """停止服务"""
+        for server in (self.http_server, self.smtp_server):
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟推送服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--http-port', type=int, default=18080)
+    parser.add_argument('--smtp-port', type=int, default=18025)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--http-error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    injector = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.http_error_rate)
+    server = MockPushServer(args.host, args.http_port, args.smtp_port, injector).start()
+    print(f"HTTP: {server.http_base}  SMTP: {server.smtp_address[0]}:{server.smtp_address[1]}")
+    print(json.dumps(server.push_config(), ensure_ascii=False, indent=2))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""合成的自动交易仿真场景
+
+用assets中的识别模板合成游戏截图，配合脚本化日志组成一套完整交易流程的场景，
+供仿真平台在没有游戏和Windows的环境下运行AutoTrade，用于测试和离线基准。
+
+用法（导出为场景文件，可用 SimulationPlatform.from_scenario 加载或替换为录制的截图）:
+    python tools/sim_scenario.py --export sim_scenario
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+
+import cv2
+import numpy as np
+
+from core.platforms.base import KEY_ESC, KEY_CTRL
+from core.platforms.simulation import SimulationPlatform, SimRule, RULE_COMMAND, RULE_CLICK, RULE_KEY
+
+STASH_TEMPLATE_PATH = "assets/rec/stash_cn.png"
+WISDOM_TEMPLATE_PATH = "assets/rec/wisdom.png"
+# 仓库格子中的物品图标
+ITEM_ICON_PATH = "assets/orb/GemcutterPrism.png"
+
+# 仿真游戏日志的行首（时间、进程号、日志级别）
+LOG_PREFIX = "2025/03/01 12:00:00 123456 abc [INFO Client 1234] : "
+
+
+def _rule_to_dict(rule):
+    """规则转换为场景文件中的字典"""
+    data = {'on': rule.on}
+    for key in ('match', 'screen', 'goto'):
+        if getattr(rule, key):
+            data[key] = getattr(rule, key)
+    if rule.region:
+        data['region'] = [int(v) for v in rule.region]
+    if rule.modifiers:
+        data['modifiers'] = list(rule.modifiers)
+    if rule.logs:
+        data['logs'] = [list(item) for item in rule.logs]
+    return data
+
+
+def _paste(screen, template, pos, scale):
+    """把按scale缩放后的模板贴到截图的pos处，返回贴图区域 (x1, y1, x2, y2)"""
+    h, w = template.shape[:2]
+    resized = cv2.resize(template, (int(w * scale), int(h * scale)))
+    x, y = pos
+    screen[y:y + resized.shape[0], x:x + resized.shape[1]] = resized
+    return x, y, x + resized.shape[1], y + resized.shape[0]
+
+
+def synthetic_trade_platform(log_sink=None, window_rect=(0, 0, 1280, 720), grid_origin=(40, 60),
+                             grid_size=12, wisdom_scale=0.2 + 3 * 2.3 / 34, items=((3, 5),),
+                             stash_pos=(900, 300), stash_scale=0.3 + 5 * 2.7 / 19,
+                             join_delay=0.0, trade_delay=0.0, time_scale=0.0, seed=0):
+    """
+    用assets中的识别模板合成一套完整交易流程的仿真场景
+
+    game截图中放置仓库按钮，点击后切换到stash截图，其中网格左上角和右下角放置wisdom锚点，
+    items中的格子 (列, 行)（从1开始）放置物品图标；
+    按住Ctrl点击网格后切换到taken截图（背包的一个格子中出现物品），
+    /invite 后输出买家进入区域日志，/tradewith 后输出接受和完成日志，按ESC回到game截图。
+    默认缩放比例取自各模块多尺度匹配的尺度序列，合成图可被原样识别。
+
+    :return: (SimulationPlatform, layout)，layout包含网格原点、格子大小和仓库按钮区域
+    """
+    left, top, right, bottom = window_rect
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 60, size=(bottom - top, right - left, 3), dtype=np.uint8)
+
+    game = background.copy()
+    stash_region = _paste(game, cv2.imread(STASH_TEMPLATE_PATH), stash_pos, stash_scale)
+
+    # 仓库面板覆盖窗口左半部分
+    stash = background.copy()
+    width, height = right - left, bottom - top
+    stash[:, :width // 2] = background[:, :width // 2] // 3 + np.array((20, 45, 70), dtype=np.uint8)
+    wisdom = cv2.imread(WISDOM_TEMPLATE_PATH)
+    cell = int(wisdom.shape[1] * wisdom_scale)
+    x0, y0 = grid_origin
+    _paste(stash, wisdom, (x0, y0), wisdom_scale)
+    far = (grid_size - 1) * cell
+    _paste(stash, wisdom, (x0 + far, y0 + far), wisdom_scale)
+    grid_region = (x0, y0, x0 + grid_size * cell, y0 + grid_size * cell)
+    icon = cv2.imread(ITEM_ICON_PATH)
+    for col, row in items:
+        _paste(stash, icon, (x0 + (col - 1) * cell, y0 + (row - 1) * cell), cell / icon.shape[1])
+
+    # 取出的物品出现在右下角背包的一个格子中
+    taken = stash.copy()
+    _paste(taken, icon, (int(width * 0.75), int(height * 0.75)), cell / icon.shape[1])
+
+    rules = [
+        SimRule(RULE_COMMAND, match=r"^/invite (?P<user>\S+)$",
+                logs=[(join_delay, LOG_PREFIX + "{user} 進入了此區域。")]),
+        SimRule(RULE_CLICK, screen='game', region=stash_region, goto='stash'),
+        SimRule(RULE_CLICK, screen='stash', region=grid_region, modifiers=(KEY_CTRL,), goto='taken'),
+        SimRule(RULE_KEY, match=KEY_ESC, screen='stash', goto='game'),
+        SimRule(RULE_KEY, match=KEY_ESC, screen='taken', goto='game'),
+        SimRule(RULE_COMMAND, match=r"^/tradewith (?P<user>\S+)$",
+                logs=[(trade_delay, LOG_PREFIX + "{user} 已接受交易。"),
+                      (trade_delay, LOG_PREFIX + "與 {user} 的交易完成。")]),
+    ]
+    platform = SimulationPlatform(
+        window_rect=window_rect,
+        screens={'game': game, 'stash': stash, 'taken': taken},
+        initial_screen='game',
+        rules=rules,
+        log_sink=log_sink,
+        time_scale=time_scale
+    )
+    layout = {
+        'grid_origin': grid_origin,
+        'grid_size': grid_size,
+        'cell': cell,
+        'items': list(items),
+        'stash_region': stash_region
+    }
+    return platform, layout
+
+
+def export_scenario(platform, directory):
+    """把仿真场景导出为截图和scenario.json，返回场景文件路径"""
+    os.makedirs(directory, exist_ok=True)
+    screens = {}
+    for name, image in platform.screens.items():
+        filename = f"{name}.png"
+        cv2.imwrite(os.path.join(directory, filename), image)
+        screens[name] = filename
+    scenario = {
+        'window': {'title': platform.window_title, 'rect': list(platform.window_rect)},
+        'screens': screens,
+        'initial_screen': platform.screen,
+        'rules': [_rule_to_dict(rule) for rule in platform.rules]
+    }
+    path = os.path.join(directory, 'scenario.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(scenario, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出合成的自动交易仿真场景")
+    parser.add_argument('--export', required=True, help="导出目录")
+    parser.add_argument('--join-delay', type=float, default=0.0, help="买家进入区域的延迟（秒）")
+    parser.add_argument('--trade-delay', type=float, default=0.0, help="买家完成交易的延迟（秒）")
+    args = parser.parse_args()
+
+    platform, _ = synthetic_trade_platform(join_delay=args.join_delay, trade_delay=args.trade_delay)
+    print(f"场景已导出: {export_scenario(platform, args.export)}")
+
+
+if __name__ == '__main__':
+    main()